@@ -8,6 +8,9 @@ class AuditConfig(AppConfig):
     name = "audit"
 
     def ready(self):
-        """Подключение сигналов при инициализации приложения"""
+        """Подключение сигналов и снимков загруженных значений при инициализации приложения"""
         import audit.signals  # noqa: F401
+        from audit.capture import install_snapshot_hooks
+
+        install_snapshot_hooks()
 
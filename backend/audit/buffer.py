@@ -0,0 +1,188 @@
+"""
+Буфер записей аудита.
+
+Записи копятся до конца транзакции (transaction.on_commit, с учётом отката
+точек сохранения) или запроса (audit_request_scope в AuditLogMiddleware) и
+пишутся одним bulk_create.
+В асинхронном режиме (settings.AUDIT_WRITER["mode"] = "async") пакет
+передаётся Celery-задаче audit.tasks.write_audit_batch.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from audit.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Буфер текущего запроса (None — вне audit_request_scope)
+_request_buffer: contextvars.ContextVar[list[AuditLog] | None] = contextvars.ContextVar(
+    "audit_request_buffer", default=None
+)
+
+PENDING_ATTR = "_audit_pending"
+
+
+@dataclass
+class _Batch:
+    entries: list[AuditLog] = field(default_factory=list)
+    committed: list[AuditLog] = field(default_factory=list)
+
+
+def _config() -> dict:
+    return getattr(settings, "AUDIT_WRITER", {})
+
+
+def batch_size() -> int:
+    return int(_config().get("batch_size", 500))
+
+
+def async_enabled() -> bool:
+    return _config().get("mode", "sync") == "async"
+
+
+def add(entry: AuditLog, using: str | None = None) -> None:
+    """
+    Ставит запись в очередь на запись.
+
+    Внутри транзакции запись попадает в буфер транзакции и отбрасывается при откате,
+    вне транзакции — в буфер запроса; вне запроса пишется сразу.
+    """
+    entry._event_at = timezone.now()
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.in_atomic_block:
+        _add_to_transaction(connection, entry)
+        return
+    request_buffer = _request_buffer.get()
+    if request_buffer is not None:
+        request_buffer.append(entry)
+        return
+    flush([entry])
+
+
+def _add_to_transaction(connection, entry: AuditLog) -> None:
+    """
+    Пакет копится по уровню точки сохранения (connection.savepoint_ids).
+
+    На каждую запись регистрируется свой on_commit: откат транзакции или точки
+    сохранения Django отбрасывает вместе с её колбэками. Колбэки выполняются по
+    порядку, поэтому колбэк последней записи пакета пишет все записи, чьи колбэки
+    уже отработали; записи отменённой транзакции с тем же ключом не попадают в запись.
+    Пакеты отменённых точек сохранения (их колбэки не придут) убираются при доставке.
+    """
+    batches: dict[tuple, _Batch] | None = getattr(connection, PENDING_ATTR, None)
+    if batches is None:
+        batches = {}
+        setattr(connection, PENDING_ATTR, batches)
+    key = tuple(connection.savepoint_ids)
+    batch = batches.setdefault(key, _Batch())
+    batch.entries.append(entry)
+
+    def on_commit() -> None:
+        batch.committed.append(entry)
+        if batch.entries and batch.entries[-1] is entry:
+            committed = batch.committed
+            if batches.get(key) is batch:
+                del batches[key]
+            _drop_closed_batches(batches, tuple(connection.savepoint_ids))
+            batch.entries, batch.committed = [], []
+            _deliver(committed)
+
+    transaction.on_commit(on_commit, using=connection.alias)
+
+
+def _drop_closed_batches(batches: dict[tuple, _Batch], current: tuple) -> None:
+    # Ключ, не являющийся префиксом текущего стека, принадлежит уже закрытой точке сохранения.
+    # Колбэки отпущенных точек держат свой пакет сами, отменённых — не придут никогда
+    for key in [key for key in batches if key != current[: len(key)]]:
+        del batches[key]
+
+
+def _deliver(entries: list[AuditLog]) -> None:
+    # После коммита транзакции внутри запроса откладываем запись до конца запроса
+    request_buffer = _request_buffer.get()
+    if request_buffer is not None:
+        request_buffer.extend(entries)
+    else:
+        flush(entries)
+
+
+def flush(entries: list[AuditLog]) -> None:
+    """Записывает пакет (или отправляет его в Celery). Ошибки логируются, а не пробрасываются."""
+    if not entries:
+        return
+    if async_enabled():
+        from audit.tasks import write_audit_batch
+
+        try:
+            write_audit_batch.delay([serialize(entry) for entry in entries])
+            return
+        except Exception as exc:  # noqa: BLE001 - брокер недоступен: пишем синхронно
+            logger.warning("Audit batch could not be queued, writing synchronously: %s", exc)
+    try:
+        write(entries)
+    except Exception as exc:  # noqa: BLE001 - аудит не должен ломать бизнес-операцию
+        logger.error("Failed to write %s audit entries: %s", len(entries), exc, exc_info=True)
+
+
+def write(entries: list[AuditLog], preserve_time: bool = False) -> list[AuditLog]:
+    """
+    Пишет записи одним bulk_create.
+
+    preserve_time восстанавливает время события, которое auto_now_add заменяет временем
+    записи (нужно для асинхронного режима, где запись может отставать от события).
+    """
+    created = AuditLog.objects.bulk_create(entries, batch_size=batch_size())
+    if preserve_time:
+        stamped = [entry for entry in created if entry.pk and getattr(entry, "_event_at", None)]
+        for entry in stamped:
+            entry.created_at = entry._event_at
+        if stamped:
+            AuditLog.objects.bulk_update(stamped, ["created_at"], batch_size=batch_size())
+    return created
+
+
+def serialize(entry: AuditLog) -> dict[str, Any]:
+    return {
+        "actor_id": entry.actor_id,
+        "action": str(entry.action),
+        "entity_type": entry.entity_type,
+        "entity_id": entry.entity_id,
+        "payload": entry.payload,
+        "ip_address": entry.ip_address,
+        "user_agent": entry.user_agent,
+        "request_id": entry.request_id,
+        "event_at": entry._event_at.isoformat(),
+    }
+
+
+def deserialize(data: dict[str, Any]) -> AuditLog:
+    data = dict(data)
+    event_at = parse_datetime(data.pop("event_at"))
+    entry = AuditLog(**data)
+    entry._event_at = event_at
+    return entry
+
+
+@contextmanager
+def audit_request_scope() -> Iterator[None]:
+    """Копит записи аудита до конца блока и пишет их одним пакетом."""
+    if _request_buffer.get() is not None:
+        yield
+        return
+    buffer: list[AuditLog] = []
+    token = _request_buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _request_buffer.reset(token)
+        flush(buffer)
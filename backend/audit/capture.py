@@ -0,0 +1,184 @@
+"""
+Движок захвата изменений моделей для аудита.
+
+Старые значения берутся из снимка, сделанного при загрузке экземпляра из БД
+(Model.from_db), поэтому перед сохранением не нужен дополнительный SELECT.
+Набор моделей и полей настраивается через settings.AUDIT_CAPTURE.
+"""
+from __future__ import annotations
+
+import copy
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model
+from django.db.models.base import DEFERRED
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ATTR = "_audit_snapshot"
+
+DEFAULT_EXCLUDED_APPS = ("admin", "auth", "contenttypes", "sessions", "audit")
+DEFAULT_EXCLUDED_FIELDS = ("created_at", "updated_at", "last_login")
+# Производные данные, которые пересчитываются из других моделей
+DEFAULT_DISABLED_MODELS = (
+    "finance.OrderRevenueFact",
+    "finance.ReportDailyFact",
+    "finance.OrderReceipt",
+    "orders.OrderTombstone",
+)
+
+# Наличие таблицы аудита по алиасам БД: проверяется один раз, сбрасывается после migrate
+_table_ready: dict[str, bool] = {}
+
+
+@dataclass(frozen=True)
+class ModelAuditConfig:
+    enabled: bool
+    # attname -> имя поля для payload
+    fields: dict[str, str]
+
+
+_model_configs: dict[type[Model], ModelAuditConfig] = {}
+
+
+def _settings() -> dict:
+    return getattr(settings, "AUDIT_CAPTURE", {})
+
+
+def get_model_config(model: type[Model]) -> ModelAuditConfig:
+    """
+    Конфигурация аудита модели (кэшируется на процесс).
+
+    settings.AUDIT_CAPTURE["models"]["app_label.ModelName"] может содержать
+    enabled, fields (только эти поля) и exclude (дополнительно исключаемые поля).
+    """
+    config = _model_configs.get(model)
+    if config is not None:
+        return config
+
+    options = _settings()
+    label = model._meta.label
+    model_options = {
+        **({"enabled": False} if label in DEFAULT_DISABLED_MODELS else {}),
+        **options.get("models", {}).get(label, {}),
+    }
+    excluded_apps = options.get("exclude_apps", DEFAULT_EXCLUDED_APPS)
+    enabled = model_options.get("enabled", model._meta.app_label not in excluded_apps)
+
+    excluded = set(options.get("exclude_fields", DEFAULT_EXCLUDED_FIELDS)) | set(model_options.get("exclude", ()))
+    only = set(model_options.get("fields", ()))
+    fields = {
+        field.attname: field.name
+        for field in model._meta.concrete_fields
+        if field.name not in excluded and (not only or field.name in only)
+    }
+    config = ModelAuditConfig(enabled=enabled and not model._meta.proxy, fields=fields)
+    _model_configs[model] = config
+    return config
+
+
+def is_audited(model: type[Model]) -> bool:
+    return get_model_config(model).enabled
+
+
+def audit_table_ready(using: str | None = None) -> bool:
+    """Есть ли таблица аудита (во время миграций её может ещё не быть)."""
+    using = using or DEFAULT_DB_ALIAS
+    ready = _table_ready.get(using)
+    if ready is None:
+        from audit.models import AuditLog
+
+        try:
+            ready = AuditLog._meta.db_table in connections[using].introspection.table_names()
+        except Exception:
+            return False
+        _table_ready[using] = ready
+    return ready
+
+
+def reset_table_state(**kwargs) -> None:
+    """Сбрасывает кэш проверки таблицы (подключается к post_migrate)."""
+    _table_ready.clear()
+
+
+def install_snapshot_hooks() -> None:
+    """Подменяет from_db у аудируемых моделей, чтобы сохранять загруженные значения."""
+    for model in apps.get_models():
+        if is_audited(model) and not getattr(model, "_audit_from_db_installed", False):
+            model.from_db = _make_from_db(model)
+            model._audit_from_db_installed = True
+
+
+def _make_from_db(model: type[Model]):
+    own = model.__dict__.get("from_db")
+
+    def from_db(cls, db, field_names, values):
+        if own is not None:
+            instance = own.__func__(cls, db, field_names, values)
+        else:
+            instance = super(model, cls).from_db(db, field_names, values)
+        set_snapshot(instance, dict(zip(field_names, values)))
+        return instance
+
+    return classmethod(from_db)
+
+
+def set_snapshot(instance: Model, values: dict[str, Any]) -> None:
+    tracked = get_model_config(type(instance)).fields
+    setattr(
+        instance,
+        SNAPSHOT_ATTR,
+        {
+            # JSON-значения копируем: изменение на месте не должно менять снимок
+            attname: copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+            for attname, value in values.items()
+            if attname in tracked and value is not DEFERRED
+        },
+    )
+
+
+def refresh_snapshot(instance: Model) -> None:
+    """Запоминает текущее состояние как сохранённое (после save)."""
+    deferred = instance.get_deferred_fields()
+    set_snapshot(
+        instance,
+        {
+            attname: getattr(instance, attname, None)
+            for attname in get_model_config(type(instance)).fields
+            if attname not in deferred
+        },
+    )
+
+
+def has_snapshot(instance: Model) -> bool:
+    return hasattr(instance, SNAPSHOT_ATTR)
+
+
+def current_fields(instance: Model) -> dict[str, str]:
+    """Текущие значения отслеживаемых полей (для записи о создании)."""
+    deferred = instance.get_deferred_fields()
+    return {
+        name: str(getattr(instance, attname, None))
+        for attname, name in get_model_config(type(instance)).fields.items()
+        if attname not in deferred
+    }
+
+
+def diff(instance: Model, update_fields=None) -> dict[str, dict[str, str]]:
+    """Изменённые поля относительно снимка: {поле: {"old": ..., "new": ...}}."""
+    snapshot = getattr(instance, SNAPSHOT_ATTR, {})
+    fields = get_model_config(type(instance)).fields
+    changed = {}
+    for attname, old_value in snapshot.items():
+        name = fields[attname]
+        if update_fields is not None and name not in update_fields and attname not in update_fields:
+            continue
+        new_value = getattr(instance, attname, None)
+        if old_value != new_value:
+            changed[name] = {"old": str(old_value), "new": str(new_value)}
+    return changed
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from typing import Any
 
+from audit import buffer
 from audit.models import AuditAction, AuditLog
+from ringo_backend.request_context import get_context
 
 
 def log_action(
@@ -18,6 +20,11 @@ def log_action(
     """
     Универсальная функция для логирования действий в AuditLog.
 
+    Запись не сохраняется сразу: она попадает в буфер (audit.buffer) и пишется
+    пакетом после коммита транзакции или в конце запроса.
+    Не переданные actor, ip_address, user_agent и request_id берутся из контекста
+    текущего запроса (ringo_backend.request_context).
+
     Args:
         actor: Пользователь (User instance или None для системных действий)
         action: Тип действия (AuditAction enum или строка)
@@ -29,7 +36,7 @@ def log_action(
         request_id: Request ID для трейсинга
 
     Returns:
-        AuditLog: Созданная запись лога
+        AuditLog: Запись лога (ещё не сохранённая, если буфер не сброшен)
     """
     if isinstance(action, str):
         # Проверяем что это валидный action
@@ -39,14 +46,17 @@ def log_action(
             # Если не валидный, используем как есть (для расширяемости)
             pass
 
-    return AuditLog.objects.create(
-        actor=actor,
+    context = get_context()
+    entry = AuditLog(
+        actor_id=actor.pk if actor is not None else context.get_actor_id(),
         action=action,
         entity_type=entity_type,
         entity_id=str(entity_id),
         payload=payload or {},
-        ip_address=ip_address,
-        user_agent=user_agent or "",
-        request_id=request_id or "",
+        ip_address=ip_address or context.ip_address,
+        user_agent=user_agent or context.user_agent or "",
+        request_id=request_id or context.request_id or "",
     )
+    buffer.add(entry)
+    return entry
 
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import logging
+
+from celery import shared_task
+
+from . import buffer
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=10)
+def write_audit_batch(self, entries: list[dict]) -> None:
+    """Пишет пакет записей аудита (режим AUDIT_WRITER["mode"] = "async")."""
+    try:
+        buffer.write([buffer.deserialize(data) for data in entries], preserve_time=True)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Failed to write audit batch of %s entries, retrying: %s", len(entries), exc)
+        raise self.retry(exc=exc)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from audit import buffer
+from audit.models import AuditAction, AuditLog
+from audit.services import log_action
+
+
+class AuditBufferTests(TestCase):
+    def _log(self, entity_id):
+        return log_action(actor=None, action=AuditAction.VIEW, entity_type="Order", entity_id=entity_id)
+
+    def test_transaction_entries_are_written_with_one_insert_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for entity_id in range(5):
+                self._log(entity_id)
+            self.assertFalse(AuditLog.objects.exists())
+
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_rolled_back_entries_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self._log(1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self._log(2)
+
+        self.assertEqual(list(AuditLog.objects.values_list("entity_id", flat=True)), ["2"])
+
+    def test_rolled_back_savepoint_entries_are_dropped_from_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._log(1)
+                try:
+                    with transaction.atomic():
+                        self._log(2)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self._log(3)
+
+        inserts = [query for query in queries.captured_queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(sorted(AuditLog.objects.values_list("entity_id", flat=True)), ["1", "3"])
+
+    def test_rolled_back_savepoint_batches_do_not_accumulate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for entity_id in range(3):
+                try:
+                    with transaction.atomic():
+                        self._log(entity_id)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            self._log(3)
+
+        self.assertEqual(getattr(connection, buffer.PENDING_ATTR), {})
+        self.assertEqual(list(AuditLog.objects.values_list("entity_id", flat=True)), ["3"])
+
+    def test_request_scope_collects_committed_transactions(self):
+        with CaptureQueriesContext(connection) as queries:
+            with buffer.audit_request_scope():
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._log(1)
+                    self._log(2)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._log(3)
+                self.assertEqual(len(queries), 0)
+
+        inserts = [query for query in queries.captured_queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    @override_settings(AUDIT_WRITER={"mode": "async"})
+    def test_async_mode_hands_batch_to_celery(self):
+        with mock.patch("audit.tasks.write_audit_batch.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._log(1)
+                self._log(2)
+
+        delay.assert_called_once()
+        batch = delay.call_args.args[0]
+        self.assertEqual([entry["entity_id"] for entry in batch], ["1", "2"])
+        self.assertFalse(AuditLog.objects.exists())
+
+        buffer.write([buffer.deserialize(data) for data in batch], preserve_time=True)
+        self.assertEqual(AuditLog.objects.count(), 2)
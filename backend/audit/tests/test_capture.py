@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from audit.models import AuditAction, AuditLog
+from crm.models import Client
+
+
+class AuditCaptureTests(TestCase):
+    def test_update_is_diffed_against_loaded_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(name="ACME", phone="+1000000000")
+            client = Client.objects.get(name="ACME")
+            client.phone = "+2000000000"
+
+            with CaptureQueriesContext(connection) as queries:
+                client.save()
+
+        selects = [query["sql"] for query in queries.captured_queries if query["sql"].lstrip().upper().startswith("SELECT")]
+        self.assertEqual(selects, [])
+        log = AuditLog.objects.filter(action=AuditAction.UPDATE, entity_type="Client").get()
+        self.assertEqual(log.payload["changed_fields"], {"phone": {"old": "+1000000000", "new": "+2000000000"}})
+
+    def test_unchanged_save_is_not_logged(self):
+        client = Client.objects.create(name="ACME", phone="+1000000000")
+        client.save()
+        client = Client.objects.get(pk=client.pk)
+        client.save()
+
+        self.assertFalse(AuditLog.objects.filter(action=AuditAction.UPDATE).exists())
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit.models import AuditAction, AuditLog
+from orders.models import Order
+from users.models import User
+
+
+class RequestContextAuditTests(TestCase):
+    def test_signal_entries_are_attributed_to_request(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            manager = User.objects.create_user(username="manager", password="pass", role="manager")
+            api = APIClient()
+            api.force_authenticate(manager)
+            response = api.post(
+                "/api/v1/clients/",
+                {"name": "ACME", "phone": "+1000000000"},
+                format="json",
+                HTTP_X_REQUEST_ID="req-1",
+                HTTP_USER_AGENT="tests",
+                REMOTE_ADDR="10.0.0.5",
+            )
+
+        self.assertEqual(response.status_code, 201, response.content)
+        log = AuditLog.objects.get(action=AuditAction.CREATE, entity_type="Client")
+        self.assertEqual(log.actor_id, manager.pk)
+        self.assertEqual(log.request_id, "req-1")
+        self.assertEqual(log.ip_address, "10.0.0.5")
+        self.assertEqual(log.user_agent, "tests")
+
+    def test_status_change_is_audited_with_comment(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            manager = User.objects.create_user(username="manager", password="pass", role="manager")
+            order = Order.objects.create(number="000001", address="Test address", start_dt=timezone.now(), manager=manager)
+            api = APIClient()
+            api.force_authenticate(manager)
+            response = api.patch(
+                f"/api/v1/orders/{order.id}/status/",
+                {"status": "APPROVED", "comment": "Согласовано"},
+                format="json",
+                HTTP_X_REQUEST_ID="req-2",
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        log = AuditLog.objects.get(action=AuditAction.STATUS_CHANGE, entity_id=str(order.id))
+        self.assertEqual(log.payload, {"from_status": "CREATED", "to_status": "APPROVED", "comment": "Согласовано"})
+        self.assertEqual(log.actor_id, manager.pk)
+        self.assertEqual(log.request_id, "req-2")
@@ -8,3 +8,7 @@ class CatalogConfig(AppConfig):
     name = "catalog"
     verbose_name = "Catalog"
 
+
+    def ready(self):
+        """Подключение сигналов при инициализации приложения"""
+        import catalog.signals  # noqa: F401
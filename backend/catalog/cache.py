@@ -0,0 +1,235 @@
+"""
+Двухуровневый кэш справочника: LRU в памяти процесса и общий кэш Django (CACHES, например Redis).
+
+У каждой модели справочника есть счётчик версии в общем кэше. post_save/post_delete
+увеличивают его (catalog.signals), версия входит во все ключи, поэтому старые
+записи обоих уровней просто перестают читаться. Версии процесс перечитывает не
+чаще раза в CATALOG_CACHE["version_check_interval"] секунд.
+
+Для кода orders и finance: get_equipment_many / get_materials_many / get_services_many /
+get_attachments_many вместо выборок по id. Возвращаемые объекты общие для процесса:
+их нельзя изменять и сохранять.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model
+
+from .models import Attachment, Equipment, MaterialItem, ServiceCategory, ServiceItem
+
+logger = logging.getLogger(__name__)
+
+VERSION_PREFIX = "catalog:version"
+
+# Пространства имён кэша; подклассы MaterialItem (SoilItem и т.д.) относятся к material
+NAMESPACES: dict[type[Model], str] = {
+    Equipment: "equipment",
+    ServiceItem: "service",
+    ServiceCategory: "service_category",
+    MaterialItem: "material",
+    Attachment: "attachment",
+}
+
+
+def _config() -> dict:
+    return getattr(settings, "CATALOG_CACHE", {})
+
+
+def cache_timeout() -> int:
+    """TTL записей в общем кэше (версия делает их недействительными раньше)."""
+    return int(_config().get("timeout", 60 * 60))
+
+
+def namespace_for(model: type[Model]) -> str | None:
+    for cached_model, namespace in NAMESPACES.items():
+        if issubclass(model, cached_model):
+            return namespace
+    return None
+
+
+# --- версии ---------------------------------------------------------------------
+
+_versions_lock = threading.Lock()
+_versions: dict[str, int] = {}
+_versions_checked_at = 0.0
+
+
+def versions(*namespaces: str) -> tuple[int, ...]:
+    """Текущие версии пространств имён (локальная копия обновляется не чаще check interval)."""
+    global _versions, _versions_checked_at
+    interval = float(_config().get("version_check_interval", 1.0))
+    if time.monotonic() - _versions_checked_at >= interval:
+        keys = {f"{VERSION_PREFIX}:{namespace}": namespace for namespace in NAMESPACES.values()}
+        try:
+            found = cache.get_many(list(keys))
+        except Exception as exc:
+            logger.warning("Failed to read catalog cache versions: %s", exc)
+            found = None
+        if found is not None:
+            missing = [key for key in keys if key not in found]
+            if missing:
+                # Начальная версия от времени: после сброса кэша версии не повторяют прежние
+                # (иначе ETag и ключи, выданные до сброса, снова совпали бы)
+                seed = _seed()
+                try:
+                    for key in missing:
+                        cache.add(key, seed, timeout=None)
+                    found.update(cache.get_many(missing))
+                except Exception as exc:
+                    logger.warning("Failed to initialize catalog cache versions: %s", exc)
+            with _versions_lock:
+                _versions = {namespace: found.get(key, 0) for key, namespace in keys.items()}
+                _versions_checked_at = time.monotonic()
+    return tuple(_versions.get(namespace, 0) for namespace in namespaces)
+
+
+def _seed() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def bump_version(namespace: str) -> None:
+    """Инвалидирует пространство имён во всех процессах (и сразу в текущем)."""
+    global _versions_checked_at
+    key = f"{VERSION_PREFIX}:{namespace}"
+    try:
+        if not cache.add(key, _seed(), timeout=None):
+            cache.incr(key)
+    except ValueError:
+        # Ключ версии истёк между add и incr
+        cache.set(key, _seed(), timeout=None)
+    except Exception as exc:
+        logger.warning("Failed to bump catalog cache version for %s: %s", namespace, exc)
+    # Текущий процесс перечитает версии при следующем обращении
+    with _versions_lock:
+        _versions_checked_at = 0.0
+    _local.clear()
+
+
+# --- LRU процесса ---------------------------------------------------------------
+
+
+class _LocalLRU:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._data: OrderedDict[str, Any] = OrderedDict()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+        return found
+
+    def set_many(self, values: dict[str, Any]) -> None:
+        size = int(_config().get("local_size", 2048))
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_local = _LocalLRU()
+
+
+def clear_local() -> None:
+    """Очищает LRU текущего процесса (тесты, ручное восстановление)."""
+    global _versions_checked_at
+    _local.clear()
+    _versions_checked_at = 0.0
+
+
+# --- чтение ---------------------------------------------------------------------
+
+
+def get_many(model: type[Model], ids: Iterable[Any]) -> dict[Any, Model]:
+    """
+    Строки справочника по id: LRU процесса, затем общий кэш, затем один запрос в БД.
+
+    Отсутствующие в БД id в результат не попадают.
+    """
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return {}
+    namespace = NAMESPACES[model]
+    (version,) = versions(namespace)
+    keys = {f"catalog:{namespace}:{version}:{pk}": pk for pk in ids}
+
+    found = _local.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        try:
+            shared = cache.get_many(missing)
+        except Exception as exc:
+            logger.warning("Failed to read catalog cache: %s", exc)
+            shared = {}
+        found.update(shared)
+        _local.set_many(shared)
+        missing = [key for key in missing if key not in shared]
+    if missing:
+        loaded = model.objects.in_bulk([keys[key] for key in missing])
+        fresh = {f"catalog:{namespace}:{version}:{pk}": obj for pk, obj in loaded.items()}
+        try:
+            cache.set_many(fresh, timeout=cache_timeout())
+        except Exception as exc:
+            logger.warning("Failed to write catalog cache: %s", exc)
+        _local.set_many(fresh)
+        found.update(fresh)
+    return {keys[key]: obj for key, obj in found.items()}
+
+
+def get_equipment_many(ids: Iterable[int]) -> dict[int, Equipment]:
+    return get_many(Equipment, ids)
+
+
+def get_materials_many(ids: Iterable[int]) -> dict[int, MaterialItem]:
+    return get_many(MaterialItem, ids)
+
+
+def get_services_many(ids: Iterable[int]) -> dict[int, ServiceItem]:
+    return get_many(ServiceItem, ids)
+
+
+def get_attachments_many(ids: Iterable[int]) -> dict[int, Attachment]:
+    return get_many(Attachment, ids)
+
+
+def get_cached(key: str, namespaces: Iterable[str], build, timeout: int | None = None):
+    """
+    Произвольное значение (например, сериализованный список) с версиями пространств имён в ключе.
+
+    build() вызывается при промахе обоих уровней.
+    """
+    namespaces = tuple(namespaces)
+    token = ",".join(f"{namespace}={version}" for namespace, version in zip(namespaces, versions(*namespaces)))
+    full_key = f"catalog:value:{token}:{key}"
+    found = _local.get_many([full_key])
+    if full_key in found:
+        return found[full_key]
+    try:
+        value = cache.get(full_key)
+    except Exception as exc:
+        logger.warning("Failed to read catalog cache: %s", exc)
+        value = None
+    if value is None:
+        value = build()
+        try:
+            cache.set(full_key, value, timeout=timeout or cache_timeout())
+        except Exception as exc:
+            logger.warning("Failed to write catalog cache: %s", exc)
+    _local.set_many({full_key: value})
+    return value
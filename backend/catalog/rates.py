@@ -0,0 +1,107 @@
+"""
+Процессный кэш ставок справочника для расчёта стоимости без обращений к БД.
+
+Таблица ставок (техника, услуги, материалы, навески) загружается целиком
+четырьмя запросами и живёт в памяти процесса, пока не изменятся версии
+справочника в catalog.cache (их увеличивают post_save/post_delete во всех
+процессах), но не дольше CATALOG_RATES["ttl"] секунд.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+
+from . import cache as catalog_cache
+from .models import Attachment, Equipment, MaterialItem, ServiceItem
+
+# Пространства имён catalog.cache, от которых зависит таблица ставок
+RATE_NAMESPACES = ("equipment", "service", "material", "attachment")
+
+
+@dataclass(frozen=True)
+class EquipmentRate:
+    name: str
+    hourly_rate: Decimal
+    daily_rate: Decimal | None
+
+
+@dataclass(frozen=True)
+class PriceRate:
+    name: str
+    unit: str
+    price: Decimal | None
+    category: str = ""
+
+
+@dataclass
+class RateTable:
+    equipment: dict[int, EquipmentRate] = field(default_factory=dict)
+    services: dict[int, PriceRate] = field(default_factory=dict)
+    materials: dict[int, PriceRate] = field(default_factory=dict)
+    attachments: dict[int, PriceRate] = field(default_factory=dict)
+    loaded_at: float = 0.0
+    versions: tuple[int, ...] = ()
+
+
+_lock = threading.Lock()
+_table: RateTable | None = None
+
+
+def _ttl() -> float:
+    return float(getattr(settings, "CATALOG_RATES", {}).get("ttl", 300))
+
+
+def load_rates() -> RateTable:
+    """Читает ставки из БД (по запросу на модель, только нужные поля)."""
+    versions = catalog_cache.versions(*RATE_NAMESPACES)
+    return RateTable(
+        equipment={
+            pk: EquipmentRate(name=name, hourly_rate=hourly_rate, daily_rate=daily_rate)
+            for pk, name, hourly_rate, daily_rate in Equipment.objects.values_list(
+                "id", "name", "hourly_rate", "daily_rate"
+            )
+        },
+        services={
+            pk: PriceRate(name=name, unit=unit, price=price)
+            for pk, name, unit, price in ServiceItem.objects.values_list("id", "name", "unit", "price")
+        },
+        materials={
+            pk: PriceRate(name=name, unit=unit, price=price, category=category)
+            for pk, name, unit, price, category in MaterialItem.objects.values_list(
+                "id", "name", "unit", "price", "category"
+            )
+        },
+        attachments={
+            pk: PriceRate(name=name, unit="pcs", price=price)
+            for pk, name, price in Attachment.objects.values_list("id", "name", "price")
+        },
+        loaded_at=time.monotonic(),
+        versions=versions,
+    )
+
+
+def _is_current(table: RateTable | None) -> bool:
+    if table is None or time.monotonic() - table.loaded_at >= _ttl():
+        return False
+    return table.versions == catalog_cache.versions(*RATE_NAMESPACES)
+
+
+def get_rates() -> RateTable:
+    """Таблица ставок процесса; перечитывается при смене версий справочника или после TTL."""
+    global _table
+    table = _table
+    if _is_current(table):
+        return table
+    with _lock:
+        if not _is_current(_table):
+            _table = load_rates()
+        return _table
+
+
+def invalidate_rates() -> None:
+    global _table
+    _table = None
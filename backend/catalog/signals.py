@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_version, namespace_for
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_catalog_cache(sender, raw=False, **kwargs):
+    """
+    Увеличивает версию справочника: кэши всех процессов перестают её читать.
+
+    Версия увеличивается сразу и ещё раз после коммита: строку, прочитанную
+    другим процессом до коммита, второе увеличение тоже делает недействительной.
+    """
+    namespace = namespace_for(sender)
+    if raw or namespace is None:
+        return
+    bump_version(namespace)
+    transaction.on_commit(lambda: bump_version(namespace))
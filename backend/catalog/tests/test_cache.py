@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from catalog import cache as catalog_cache
+from catalog.models import Equipment
+from users.models import User
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        catalog_cache.clear_local()
+        self.addCleanup(catalog_cache.clear_local)
+        self.equipment = Equipment.objects.create(code="EQ-1", name="Excavator", hourly_rate=Decimal("100.00"))
+
+    def test_repeated_lookup_is_served_from_cache(self):
+        catalog_cache.get_equipment_many([self.equipment.id])
+        with self.assertNumQueries(0):
+            found = catalog_cache.get_equipment_many([self.equipment.id, None])
+
+        self.assertEqual(found[self.equipment.id].name, "Excavator")
+
+    def test_save_invalidates_cached_rows(self):
+        catalog_cache.get_equipment_many([self.equipment.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipment.name = "Loader"
+            self.equipment.save()
+
+        self.assertEqual(catalog_cache.get_equipment_many([self.equipment.id])[self.equipment.id].name, "Loader")
+
+    def test_missing_ids_are_omitted(self):
+        self.assertEqual(catalog_cache.get_equipment_many([self.equipment.id + 1000]), {})
+
+    def test_list_is_cached_until_catalog_changes(self):
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username="manager", password="pass", role="manager"))
+        first = api.get("/api/v1/equipment/")
+        Equipment.objects.filter(pk=self.equipment.pk).update(name="Renamed")  # без сигналов
+        cached = api.get("/api/v1/equipment/")
+        self.assertEqual(cached.json(), first.json())
+
+        Equipment.objects.create(code="EQ-2", name="Loader", hourly_rate=Decimal("50.00"))
+        response = api.get("/api/v1/equipment/")
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertIn("Renamed", [row["name"] for row in response.json()["results"]])
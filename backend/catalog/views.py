@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+from hashlib import md5
+
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import viewsets
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.response import Response
+
+from ringo_backend.conditional import ConditionalGetMixin
 
+from . import cache as catalog_cache
 from .models import Attachment, Equipment, MaterialItem, ServiceItem
 from .serializers import (
     AttachmentSerializer,
@@ -14,6 +20,29 @@ from .serializers import (
 )
 
 
+class CachedListMixin:
+    """Ответ list кэшируется в catalog.cache с версиями cache_namespaces в ключе."""
+
+    cache_namespaces: tuple[str, ...] = ()
+
+    def list(self, request, *args, **kwargs):
+        parent_list = super().list
+        digest = md5(request.build_absolute_uri().encode("utf-8")).hexdigest()
+        data = catalog_cache.get_cached(
+            f"list:{type(self).__name__}:{digest}",
+            self.cache_namespaces,
+            lambda: parent_list(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+
+class CatalogCacheMixin(ConditionalGetMixin, CachedListMixin):
+    """ETag списка строится из версий справочника, поэтому 304 и попадание в кэш обходятся без БД."""
+
+    def get_list_version(self, queryset):
+        return catalog_cache.versions(*self.cache_namespaces)
+
+
 @extend_schema_view(
     list=extend_schema(
         summary="Список техники",
@@ -26,10 +55,11 @@ from .serializers import (
         tags=["Catalog"],
     ),
 )
-class EquipmentViewSet(viewsets.ModelViewSet):
+class EquipmentViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     # Оптимизация: используем select_related/prefetch_related для уменьшения количества запросов
     queryset = Equipment.objects.all().select_related().prefetch_related()
     serializer_class = EquipmentSerializer
+    cache_namespaces = ("equipment",)
     filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
     filterset_fields = ("status",)
     search_fields = ("code", "name", "description")
@@ -40,9 +70,11 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     list=extend_schema(summary="Список услуг", description="Получить список услуг", tags=["Catalog"]),
     retrieve=extend_schema(summary="Детали услуги", description="Получить детальную информацию об услуге", tags=["Catalog"]),
 )
-class ServiceItemViewSet(viewsets.ModelViewSet):
+class ServiceItemViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = ServiceItem.objects.select_related("category").all()
     serializer_class = ServiceItemSerializer
+    cache_namespaces = ("service", "service_category")
+    etag_related = ("category__updated_at",)
     filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
     filterset_fields = ("category", "is_active")
     search_fields = ("name", "category__name")
@@ -53,10 +85,11 @@ class ServiceItemViewSet(viewsets.ModelViewSet):
     list=extend_schema(summary="Список материалов", description="Получить список материалов", tags=["Catalog"]),
     retrieve=extend_schema(summary="Детали материала", description="Получить детальную информацию о материале", tags=["Catalog"]),
 )
-class MaterialItemViewSet(viewsets.ModelViewSet):
+class MaterialItemViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     # Оптимизация: используем select_related/prefetch_related для уменьшения количества запросов
     queryset = MaterialItem.objects.all().select_related().prefetch_related()
     serializer_class = MaterialItemSerializer
+    cache_namespaces = ("material",)
     filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
     filterset_fields = ("is_active", "category")
     search_fields = ("name", "supplier")
@@ -85,9 +118,11 @@ class MaterialItemViewSet(viewsets.ModelViewSet):
         tags=["Catalog"],
     ),
 )
-class AttachmentViewSet(viewsets.ModelViewSet):
+class AttachmentViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Attachment.objects.select_related("equipment").all()
     serializer_class = AttachmentSerializer
+    cache_namespaces = ("attachment", "equipment")
+    etag_related = ("equipment__updated_at",)
     filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
     filterset_fields = ("status", "equipment")
     search_fields = ("name", "equipment__code", "equipment__name")
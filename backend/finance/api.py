@@ -1,7 +1,6 @@
 from __future__ import annotations
 
-from hashlib import md5
-from typing import Optional
+import time
 
 from django.core.cache import cache
 from django.http import HttpResponse
@@ -10,52 +9,23 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .exporters import build_dataset, export_dataset
-from .reports import employees_report, equipment_report, summary_report
+from ringo_backend.conditional import etag_matches, not_modified, weak_etag, with_etag
+from ringo_backend.prometheus import report_cache_requests_total, report_regeneration_duration_seconds
+
+from .exporters import STREAMING_FORMATS, build_dataset, export_dataset, streaming_export_response
+from .reports import period_dates, employees_report, equipment_report, summary_report
+from .services import report_cache
 
 
 def clear_reports_cache():
-    """Очищает весь кэш отчетов при изменении данных (завершение заявки и т.д.)"""
-    try:
-        # Получаем бэкенд кэша
-        cache_backend = cache
-        
-        # Пытаемся использовать delete_pattern если доступен (django-redis)
-        if hasattr(cache_backend, 'delete_pattern'):
-            cache_backend.delete_pattern("report:*")
-        elif hasattr(cache_backend, '_cache'):
-            # Пытаемся получить доступ к Redis клиенту напрямую
-            try:
-                # Для django-redis
-                if hasattr(cache_backend._cache, 'delete_pattern'):
-                    cache_backend._cache.delete_pattern("report:*")
-                elif hasattr(cache_backend._cache, 'client'):
-                    # Прямой доступ к Redis клиенту
-                    client = cache_backend._cache.client
-                    # Используем SCAN для поиска всех ключей с префиксом
-                    keys = []
-                    cursor = 0
-                    while True:
-                        cursor, partial_keys = client.scan(cursor, match="report:*", count=100)
-                        keys.extend(partial_keys)
-                        if cursor == 0:
-                            break
-                    if keys:
-                        client.delete(*keys)
-            except (AttributeError, Exception):
-                # Если не удалось очистить через pattern, используем версионирование
-                # Устанавливаем новую версию кэша, что инвалидирует старые ключи
-                # Для этого можно использовать отдельный ключ версии
-                cache.set("report:cache_version", cache.get("report:cache_version", 0) + 1, timeout=None)
-    except Exception as e:
-        # Логируем ошибку, но не прерываем выполнение
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.warning(f"Failed to clear reports cache: {e}")
+    """Сбрасывает весь кэш отчетов (для точечной инвалидации используйте invalidate_order_reports)."""
+    report_cache.clear_all_reports()
 
 
 class BaseReportView(APIView):
     cache_namespace = "report"
+    # False - отчёт не кэшируется
+    cache_enabled = True
     
     def check_permissions(self, request):
         """Проверка прав доступа к отчетам"""
@@ -74,22 +44,24 @@ class BaseReportView(APIView):
             )
         try:
             params = request.query_params
-            cache_key = self._build_cache_key(request.path, params)
-            data = cache.get(cache_key)
-            if data is None:
-                try:
-                    data = self.generate_data(params)
-                    cache.set(cache_key, data, timeout=60)
-                except Exception as e:
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.error(f"Error generating report data: {e}", exc_info=True)
-                    # Возвращаем пустые данные вместо ошибки, чтобы не ломать UI
-                    data = self._get_empty_data()
             export_format = params.get("export")
+            etag = None if export_format else self.get_etag(request.path, params)
+            if etag and etag_matches(request, etag) and self._has_current_data(request.path, params):
+                return not_modified(etag)
+            fresh = False
+            try:
+                data, fresh = self.lookup_report_data(request.path, params)
+            except Exception as e:
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.error(f"Error generating report data: {e}", exc_info=True)
+                # Возвращаем пустые данные вместо ошибки, чтобы не ломать UI
+                data = self._get_empty_data()
             if export_format:
                 return self.export_response(data, export_format)
-            return Response(data)
+            response = Response(data)
+            # Устаревшие (stale) и пустые данные ETag не получают: иначе клиент закэширует их как актуальные
+            return with_etag(response, etag) if etag and fresh else response
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -103,6 +75,90 @@ class BaseReportView(APIView):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
     
+    def get_report_data(self, path: str, params):
+        """
+        Данные отчёта из кэша в режиме stale-while-revalidate.
+
+        Свежее значение отдаётся сразу. Если оно истекло или инвалидировано, отдаётся
+        последнее успешно построенное значение, а пересчёт уходит в Celery (очередь finance).
+        Без кэша отчёт строится синхронно, причём только одним процессом на ключ.
+        """
+        return self.lookup_report_data(path, params)[0]
+
+    def lookup_report_data(self, path: str, params):
+        """Как get_report_data, но возвращает (данные, актуальны ли они для текущих версий кэша)."""
+        if not self.cache_enabled:
+            return self.generate_data(params), True
+
+        cache_key = self._build_cache_key(path, params)
+        data = cache.get(cache_key)
+        if data is not None:
+            report_cache_requests_total.labels(report=self.cache_namespace, result="hit").inc()
+            return data, True
+
+        stale_key = self._build_stale_key(path, params)
+        stale = cache.get(stale_key)
+        if stale is not None:
+            report_cache_requests_total.labels(report=self.cache_namespace, result="stale").inc()
+            if report_cache.acquire_lock(cache_key):
+                self._schedule_regeneration(cache_key, path, params)
+            return stale, False
+
+        report_cache_requests_total.labels(report=self.cache_namespace, result="miss").inc()
+        if not report_cache.acquire_lock(cache_key):
+            data = report_cache.wait_for(cache_key)
+            if data is not None:
+                return data, True
+            return self.generate_data(params), True
+        try:
+            return self.regenerate(path, params, mode="sync"), True
+        finally:
+            report_cache.release_lock(cache_key)
+
+    def get_etag(self, path: str, params) -> str:
+        """
+        Слабый ETag отчёта без построения данных.
+
+        Ключ кэша уже содержит версии месяцев периода, поэтому меняется при любой
+        инвалидации; даты периода учитываются для отчётов без явных from/to.
+        """
+        day_from, day_to = period_dates(params.get("from"), params.get("to"))
+        return weak_etag(self._build_cache_key(path, params), day_from, day_to)
+
+    def _has_current_data(self, path: str, params) -> bool:
+        """304 допустим, только если для текущих версий есть построенный отчёт (или кэш отключён)."""
+        if not self.cache_enabled:
+            return True
+        return cache.has_key(self._build_cache_key(path, params))
+
+    def regenerate(self, path: str, params, mode: str = "background"):
+        """Строит отчёт и сохраняет его как свежее и как последнее успешное значение."""
+        started = time.monotonic()
+        data = self.generate_data(params)
+        report_regeneration_duration_seconds.labels(report=self.cache_namespace, mode=mode).observe(
+            time.monotonic() - started
+        )
+        day_from, day_to = period_dates(params.get("from"), params.get("to"))
+        report_cache.store(
+            self._build_cache_key(path, params),
+            self._build_stale_key(path, params),
+            data,
+            report_cache.range_timeout(day_from, day_to),
+        )
+        return data
+
+    def _schedule_regeneration(self, cache_key: str, path: str, params) -> None:
+        from .tasks import regenerate_report
+
+        try:
+            regenerate_report.delay(self.cache_namespace, path, dict(params.items()), cache_key)
+        except Exception as e:
+            # Брокер недоступен: отпускаем блокировку, следующий запрос попробует снова
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Failed to schedule report regeneration: {e}")
+            report_cache.release_lock(cache_key)
+
     def _get_empty_data(self):
         """Возвращает пустые данные для отчета"""
         raise NotImplementedError("Subclasses must implement _get_empty_data")
@@ -111,19 +167,26 @@ class BaseReportView(APIView):
         raise NotImplementedError
 
     def export_response(self, data, export_format: str):
-        dataset, filename = self.dataset_from_data(data)
-        binary, content_type, ext = export_dataset(dataset, export_format)
+        headers, rows, filename = self.export_table(data)
+        if export_format in STREAMING_FORMATS:
+            return streaming_export_response(headers, rows, export_format, filename)
+        binary, content_type, ext = export_dataset(build_dataset(headers, rows), export_format)
         response = HttpResponse(binary, content_type=content_type)
         response["Content-Disposition"] = f'attachment; filename="{filename}.{ext}"'
         return response
 
-    def dataset_from_data(self, data):
+    def export_table(self, data):
+        """Возвращает (заголовки, строки, имя файла) для экспорта отчёта."""
         raise NotImplementedError
 
     def _build_cache_key(self, path: str, params) -> str:
+        """Ключ зависит от параметров запроса и версий месяцев, которые покрывает период отчёта."""
         raw = f"{path}:{sorted(params.items())}"
-        digest = md5(raw.encode("utf-8")).hexdigest()
-        return f"{self.cache_namespace}:{digest}"
+        day_from, day_to = period_dates(params.get("from"), params.get("to"))
+        return report_cache.build_key(self.cache_namespace, raw, report_cache.range_buckets(day_from, day_to))
+
+    def _build_stale_key(self, path: str, params) -> str:
+        return report_cache.build_stale_key(self.cache_namespace, f"{path}:{sorted(params.items())}")
 
 
 @extend_schema(
@@ -141,6 +204,8 @@ class BaseReportView(APIView):
 )
 class SummaryReportView(BaseReportView):
     cache_namespace = "report:summary"
+    # Отчёт читает дневные показатели (O(дней в периоде)), кэш не нужен
+    cache_enabled = False
 
     def generate_data(self, params):
         return summary_report(params.get("from"), params.get("to"))
@@ -171,7 +236,7 @@ class SummaryReportView(BaseReportView):
             "period": {"from": None, "to": None},
         }
 
-    def dataset_from_data(self, data):
+    def export_table(self, data):
         headers = ["metric", "value", "details"]
         rows = [
             ("Revenue", data["revenue"], ""),
@@ -187,8 +252,7 @@ class SummaryReportView(BaseReportView):
             ("Margin", data["margin"], ""),
             ("Orders", data["orders_count"], ""),
         ]
-        dataset = build_dataset(headers, rows)
-        return dataset, "summary-report"
+        return headers, rows, "summary-report"
 
 
 @extend_schema(
@@ -214,7 +278,7 @@ class EquipmentReportView(BaseReportView):
         """Возвращает пустые данные для отчета по технике"""
         return []
 
-    def dataset_from_data(self, data):
+    def export_table(self, data):
         headers = ["equipment_id", "name", "code", "status", "total_hours", "revenue", "expenses", "fuel_expenses"]
         rows = [
             (
@@ -229,8 +293,7 @@ class EquipmentReportView(BaseReportView):
             )
             for entry in data
         ]
-        dataset = build_dataset(headers, rows)
-        return dataset, "equipment-report"
+        return headers, rows, "equipment-report"
 
 
 @extend_schema(
@@ -256,7 +319,7 @@ class EmployeesReportView(BaseReportView):
         """Возвращает пустые данные для отчета по сотрудникам"""
         return []
 
-    def dataset_from_data(self, data):
+    def export_table(self, data):
         headers = ["user_id", "full_name", "total_amount", "total_hours", "assignments"]
         rows = [
             (
@@ -268,6 +331,9 @@ class EmployeesReportView(BaseReportView):
             )
             for entry in data
         ]
-        dataset = build_dataset(headers, rows)
-        return dataset, "employees-report"
+        return headers, rows, "employees-report"
+
+
 
+# Отчёты, которые может пересчитать фоновая задача finance.tasks.regenerate_report
+REPORT_VIEWS = {view.cache_namespace: view for view in (EquipmentReportView, EmployeesReportView)}
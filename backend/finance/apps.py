@@ -8,3 +8,7 @@ class FinanceConfig(AppConfig):
     name = "finance"
     verbose_name = "Finance"
 
+    def ready(self):
+        """Подключение сигналов при инициализации приложения"""
+        import finance.signals  # noqa: F401
+
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import csv
 import io
+import tempfile
 from datetime import datetime
 from decimal import Decimal
-from typing import Iterable, Sequence
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Sequence
 
 import tablib
+from django.http import StreamingHttpResponse
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -48,62 +52,113 @@ def build_dataset(headers: Sequence[str], rows: Iterable[Sequence[str]]) -> tabl
     return dataset
 
 
-def generate_order_receipt_pdf(order) -> bytes:
-    """Генерирует PDF чек для завершенной заявки."""
+STREAMING_FORMATS = ("csv", "xlsx")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """Отдаёт CSV построчно, не собирая файл в памяти."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers).encode("utf-8")
+    for row in rows:
+        yield writer.writerow(row).encode("utf-8")
+
+
+def stream_xlsx(headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """
+    Пишет XLSX в write-only книгу openpyxl и отдаёт файл частями.
+
+    Write-only режим сбрасывает строки на диск по мере записи, поэтому память
+    не зависит от числа строк; сам файл собирается во временном файле.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(headers))
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+def _xlsx_value(value: Any) -> Any:
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # Excel не поддерживает часовые пояса
+        return value.replace(tzinfo=None)
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return value
+
+
+def streaming_export_response(
+    headers: Sequence[str], rows: Iterable[Sequence[Any]], export_format: str, filename: str
+) -> StreamingHttpResponse:
+    """StreamingHttpResponse с CSV/XLSX; строки читаются из rows по мере отправки."""
+    if export_format == "csv":
+        content, content_type = stream_csv(headers, rows), "text/csv"
+    elif export_format == "xlsx":
+        content = stream_xlsx(headers, rows)
+        content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        raise ValueError("Unsupported export format")
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+RECEIPT_FONT_CANDIDATES = (
+    {
+        'regular': '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        'bold': '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+    },
+    {
+        'regular': '/usr/share/fonts/TTF/DejaVuSans.ttf',
+        'bold': '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf',
+    },
+    {
+        'regular': 'C:/Windows/Fonts/arial.ttf',
+        'bold': 'C:/Windows/Fonts/arialbd.ttf',
+    },
+    {
+        'regular': 'C:/Windows/Fonts/arialuni.ttf',
+        'bold': 'C:/Windows/Fonts/arialuni.ttf',  # Arial Unicode может не иметь отдельного жирного
+    },
+    {
+        'regular': '/System/Library/Fonts/Supplemental/Arial.ttf',
+        'bold': '/System/Library/Fonts/Supplemental/Arial Bold.ttf',
+    },
+)
+
+
+@lru_cache(maxsize=1)
+def register_receipt_fonts() -> tuple[str, str]:
+    """
+    Регистрирует шрифты с поддержкой кириллицы и возвращает (обычный, жирный).
+
+    Поиск файлов и разбор TTF выполняются один раз на процесс.
+    """
     import logging
     import os
-    from orders.models import OrderItem, OrderStatusLog
-    from catalog.models import Equipment
     from reportlab.pdfbase import pdfmetrics
     from reportlab.pdfbase.ttfonts import TTFont
-    
+
     logger = logging.getLogger(__name__)
-    
-    # Проверяем, что заказ существует и имеет необходимые данные
-    if not order:
-        raise ValueError("Заказ не найден")
-    
-    if not order.number:
-        raise ValueError("У заказа отсутствует номер")
-    
-    try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20*mm, leftMargin=20*mm, topMargin=20*mm, bottomMargin=20*mm)
-        story = []
-        styles = getSampleStyleSheet()
-    except Exception as e:
-        logger.error(f"Failed to initialize PDF components: {e}", exc_info=True)
-        raise ValueError(f"Ошибка инициализации PDF: {str(e)}")
-    
-    # Регистрируем шрифты с поддержкой кириллицы
+
     font_name = 'Helvetica'  # По умолчанию
     font_bold_name = 'Helvetica-Bold'  # По умолчанию для жирного текста
     try:
-        # Пробуем найти системные шрифты с поддержкой кириллицы
-        font_configs = [
-            {
-                'regular': '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                'bold': '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
-            },
-            {
-                'regular': '/usr/share/fonts/TTF/DejaVuSans.ttf',
-                'bold': '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf',
-            },
-            {
-                'regular': 'C:/Windows/Fonts/arial.ttf',
-                'bold': 'C:/Windows/Fonts/arialbd.ttf',
-            },
-            {
-                'regular': 'C:/Windows/Fonts/arialuni.ttf',
-                'bold': 'C:/Windows/Fonts/arialuni.ttf',  # Arial Unicode может не иметь отдельного жирного
-            },
-            {
-                'regular': '/System/Library/Fonts/Supplemental/Arial.ttf',
-                'bold': '/System/Library/Fonts/Supplemental/Arial Bold.ttf',
-            },
-        ]
-        
-        for config in font_configs:
+        for config in RECEIPT_FONT_CANDIDATES:
             regular_path = config['regular']
             bold_path = config.get('bold', regular_path)  # Если жирный не указан, используем обычный
             
@@ -133,7 +188,35 @@ def generate_order_receipt_pdf(order) -> bytes:
                     continue
     except Exception as e:
         logger.warning(f"Font registration failed, using default: {e}")
-        pass  # Используем стандартный шрифт
+    return font_name, font_bold_name
+
+
+def generate_order_receipt_pdf(order) -> bytes:
+    """Генерирует PDF чек для завершенной заявки."""
+    import logging
+    from orders.models import OrderItem, OrderStatusLog
+    from catalog.models import Equipment
+    
+    logger = logging.getLogger(__name__)
+    
+    # Проверяем, что заказ существует и имеет необходимые данные
+    if not order:
+        raise ValueError("Заказ не найден")
+    
+    if not order.number:
+        raise ValueError("У заказа отсутствует номер")
+    
+    try:
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20*mm, leftMargin=20*mm, topMargin=20*mm, bottomMargin=20*mm)
+        story = []
+        styles = getSampleStyleSheet()
+    except Exception as e:
+        logger.error(f"Failed to initialize PDF components: {e}", exc_info=True)
+        raise ValueError(f"Ошибка инициализации PDF: {str(e)}")
+    
+    # Шрифты с поддержкой кириллицы регистрируются один раз на процесс
+    font_name, font_bold_name = register_receipt_fonts()
     
     # Функция для безопасного создания Paragraph с экранированием HTML
     def safe_paragraph(text, style):
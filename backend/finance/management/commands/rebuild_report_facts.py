@@ -0,0 +1,17 @@
+"""
+Пересборка предрасчитанных показателей отчётов (OrderRevenueFact / ReportDailyFact).
+Использование: python manage.py rebuild_report_facts
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from finance.services.facts import rebuild_all_facts
+
+
+class Command(BaseCommand):
+    help = "Пересчитать показатели отчётов по всем завершённым заявкам"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_all_facts()
+        self.stdout.write(self.style.SUCCESS(f"Показатели пересчитаны для {count} заявок"))
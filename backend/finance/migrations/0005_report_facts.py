@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-17 16:01
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_alter_order_status_alter_orderstatuslog_from_status_and_more'),
+        ('finance', '0004_alter_documenttemplate_options_alter_expense_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDailyFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('service_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('service_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('equipment_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('equipment_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('equipment_shifts', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses_fuel', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses_repair', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('salaries', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unattached_expenses', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unattached_expenses_fuel', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unattached_expenses_repair', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Дневные показатели',
+                'verbose_name_plural': 'Дневные показатели',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRevenueFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, help_text='Дата создания заявки (локальное время)', verbose_name='День')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('service_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('service_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('equipment_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('equipment_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('equipment_shifts', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses_fuel', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses_repair', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('salaries', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('order', models.OneToOneField(help_text='Завершённая заявка, по которой рассчитаны показатели', on_delete=django.db.models.deletion.CASCADE, related_name='revenue_fact', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Показатели заявки',
+                'verbose_name_plural': 'Показатели заявок',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_alter_order_status_alter_orderstatuslog_from_status_and_more'),
+        ('finance', '0005_report_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pdf_file', models.FileField(help_text='PDF файл чека', upload_to='receipts/', verbose_name='PDF файл')),
+                ('snapshot_hash', models.CharField(help_text='SHA-256 снимка расчёта, по которому построен чек', max_length=64, verbose_name='Хеш снимка расчёта')),
+                ('size', models.PositiveIntegerField(default=0, help_text='Размер PDF в байтах', verbose_name='Размер')),
+                ('generated_at', models.DateTimeField(auto_now=True, help_text='Дата и время генерации чека', verbose_name='Дата генерации')),
+                ('order', models.OneToOneField(help_text='Заказ, для которого сформирован чек', on_delete=django.db.models.deletion.CASCADE, related_name='receipt', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Чек заказа',
+                'verbose_name_plural': 'Чеки заказов',
+            },
+        ),
+    ]
@@ -191,3 +191,89 @@ class DocumentTemplate(TimeStampedModel):
     def __str__(self) -> str:
         return f"{self.get_template_type_display()} {self.slug} v{self.version}"
 
+
+
+class OrderRevenueFact(models.Model):
+    """Предрасчитанные показатели завершённой заявки для отчётов."""
+
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="revenue_fact",
+        verbose_name="Заказ",
+        help_text="Завершённая заявка, по которой рассчитаны показатели",
+    )
+    day = models.DateField(db_index=True, verbose_name="День", help_text="Дата создания заявки (локальное время)")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    service_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    service_quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    equipment_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    equipment_hours = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    equipment_shifts = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses_fuel = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses_repair = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    salaries = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Показатели заявки"
+        verbose_name_plural = "Показатели заявок"
+
+    def __str__(self) -> str:
+        return f"{self.order_id} {self.day} {self.revenue}"
+
+
+class ReportDailyFact(models.Model):
+    """Дневная свёртка показателей для общего отчёта (одна строка на день)."""
+
+    day = models.DateField(unique=True, verbose_name="День")
+    orders_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    service_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    service_quantity = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    equipment_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    equipment_hours = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    equipment_shifts = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses_fuel = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses_repair = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    salaries = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    # Расходы без привязки к заявке учитываются по дате расхода и только при заданном периоде
+    unattached_expenses = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    unattached_expenses_fuel = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    unattached_expenses_repair = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Дневные показатели"
+        verbose_name_plural = "Дневные показатели"
+        ordering = ["-day"]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.revenue}"
+
+
+class OrderReceipt(models.Model):
+    """Сохранённый PDF чек завершённой заявки; перегенерируется при изменении снимка расчёта."""
+
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="receipt",
+        verbose_name="Заказ",
+        help_text="Заказ, для которого сформирован чек",
+    )
+    pdf_file = models.FileField(upload_to="receipts/", verbose_name="PDF файл", help_text="PDF файл чека")
+    snapshot_hash = models.CharField(
+        max_length=64, verbose_name="Хеш снимка расчёта", help_text="SHA-256 снимка расчёта, по которому построен чек"
+    )
+    size = models.PositiveIntegerField(default=0, verbose_name="Размер", help_text="Размер PDF в байтах")
+    generated_at = models.DateTimeField(auto_now=True, verbose_name="Дата генерации", help_text="Дата и время генерации чека")
+
+    class Meta:
+        verbose_name = "Чек заказа"
+        verbose_name_plural = "Чеки заказов"
+
+    def __str__(self) -> str:
+        return f"Чек {self.order_id}"
@@ -1,16 +1,15 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 
-from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
-from django.db import models
+from django.db.models import Sum
 
-from catalog.models import Equipment, MaterialItem
-from finance.models import Expense, SalaryRecord
+from catalog.cache import get_equipment_many
+from finance.models import Expense, ReportDailyFact, SalaryRecord
+from finance.services.aggregation import aggregate_item_totals
 from orders.models import Order, OrderItem, OrderStatus
-from orders.services.pricing import _get_duration_hours
 
 
 def _parse_date(value: Optional[str]) -> Optional[datetime]:
@@ -55,172 +54,73 @@ def filter_range(queryset, field: str, date_from: Optional[str], date_to: Option
     return queryset
 
 
-def summary_report(date_from: Optional[str], date_to: Optional[str]) -> dict:
-    # Для доходов учитываем только завершенные заказы (COMPLETED)
-    # Удаленные заявки больше не существуют в БД (hard delete)
-    # Не завершенные заявки не должны учитываться в отчетах
-    orders = Order.objects.filter(status=OrderStatus.COMPLETED)
-    
-    # Применяем фильтр по дате создания заказа
-    # Если период указан, фильтруем по created_at
-    # Если период не указан, показываем все заказы
-    if date_from or date_to:
-        orders = filter_range(orders, "created_at", date_from, date_to)
-    
-    # Для расходов и зарплат учитываем только те, что связаны с заказами из периода
-    # Расходы: учитываем расходы, привязанные к заказам из периода, И расходы без привязки, но в периоде по дате
-    expense_q = Q(order__in=orders)
-    if date_from or date_to:
-        # Также добавляем расходы без привязки к заказу, но в периоде по дате
-        expenses_without_orders = filter_range(Expense.objects.filter(order__isnull=True), "date", date_from, date_to)
-        expense_q |= Q(id__in=expenses_without_orders.values_list('id', flat=True))
-    expenses = Expense.objects.filter(expense_q)
-    
-    # Зарплаты: учитываем только зарплаты за заказы из периода
-    salaries = SalaryRecord.objects.filter(order__in=orders)
+def period_dates(date_from: Optional[str], date_to: Optional[str]) -> tuple[Optional[date], Optional[date]]:
+    """Переводит границы периода в локальные календарные даты (включительно)."""
+    from django.utils import timezone
 
-    # Суммируем total_amount всех заказов
-    # Sum возвращает None если нет записей или все значения NULL
-    revenue_result = orders.aggregate(total=Sum("total_amount"))
-    revenue = revenue_result["total"] if revenue_result["total"] is not None else Decimal("0")
-    
-    # Рассчитываем доходы по услугам и технике с детализацией
-    # Доходы с услуг: включаем услуги (SERVICE) и материалы с категориями грунт и инструменты (SOIL, TOOL)
-    
-    # Получаем услуги
-    service_items = OrderItem.objects.filter(
-        order__in=orders,
-        item_type=OrderItem.ItemType.SERVICE
+    df = _parse_date(date_from)
+    dt = _parse_date(date_to)
+    return (
+        timezone.localtime(df).date() if df else None,
+        timezone.localtime(dt).date() if dt else None,
     )
-    
-    # Получаем материалы с категориями грунт и инструменты
-    material_items = OrderItem.objects.filter(
-        order__in=orders,
-        item_type=OrderItem.ItemType.MATERIAL,
+
+
+def summary_report(date_from: Optional[str], date_to: Optional[str]) -> dict:
+    """
+    Общий отчёт по предрасчитанным дневным показателям (ReportDailyFact).
+
+    Показатели поддерживаются finance.services.facts при завершении, изменении
+    и удалении заявок, поэтому стоимость отчёта зависит только от числа дней в периоде.
+    """
+    # Для доходов учитываются только завершенные заказы (COMPLETED) по дате создания заказа.
+    # Расходы без привязки к заказу учитываются по дате расхода и только при заданном периоде.
+    facts = ReportDailyFact.objects.all()
+    has_period = bool(date_from or date_to)
+    if has_period:
+        day_from, day_to = period_dates(date_from, date_to)
+        if day_from:
+            facts = facts.filter(day__gte=day_from)
+        if day_to:
+            facts = facts.filter(day__lte=day_to)
+
+    totals = facts.aggregate(
+        orders_count=Sum("orders_count"),
+        revenue=Sum("revenue"),
+        service_revenue=Sum("service_revenue"),
+        service_quantity=Sum("service_quantity"),
+        equipment_revenue=Sum("equipment_revenue"),
+        equipment_hours=Sum("equipment_hours"),
+        equipment_shifts=Sum("equipment_shifts"),
+        expenses=Sum("expenses"),
+        expenses_fuel=Sum("expenses_fuel"),
+        expenses_repair=Sum("expenses_repair"),
+        salaries=Sum("salaries"),
+        unattached_expenses=Sum("unattached_expenses"),
+        unattached_expenses_fuel=Sum("unattached_expenses_fuel"),
+        unattached_expenses_repair=Sum("unattached_expenses_repair"),
     )
-    
-    # Фильтруем материалы: только грунт (SOIL) и инструменты (TOOL)
-    # Избегаем N+1 запросов к MaterialItem, заранее подтягивая все нужные записи.
-    material_items_soil_tool = []
-    # Собираем ref_id для тех позиций, где категория не проставлена в metadata
-    ref_ids_to_resolve = {
-        item.ref_id
-        for item in material_items
-        if item.ref_id and not (item.metadata or {}).get("material_category")
-    }
-    material_map = {}
-    if ref_ids_to_resolve:
-        material_map = {
-            m.id: m
-            for m in MaterialItem.objects.filter(id__in=ref_ids_to_resolve)
-        }
-    
-    for item in material_items:
-        metadata = item.metadata or {}
-        material_category = metadata.get("material_category")
-        # Если категория не указана в metadata, пытаемся получить из заранее загруженных MaterialItem
-        if not material_category and item.ref_id:
-            material = material_map.get(item.ref_id)
-            if not material:
-                continue
-            material_category = material.category
-        
-        # Включаем только грунт и инструменты
-        if material_category in [
-            MaterialItem.MaterialCategory.SOIL,
-            MaterialItem.MaterialCategory.TOOL,
-        ]:
-            material_items_soil_tool.append(item)
-    
-    # Объединяем услуги и материалы (грунт и инструменты) для расчета доходов
-    all_service_items = list(service_items) + material_items_soil_tool
-    
-    # Рассчитываем общую сумму доходов от услуг и материалов
-    service_revenue = Decimal("0")
-    service_total_quantity = Decimal("0")
-    
-    for item in all_service_items:
-        quantity = Decimal(str(item.quantity or 0))
-        unit_price = Decimal(str(item.unit_price or 0))
-        discount = Decimal(str(item.discount or 0))
-        tax_rate = Decimal(str(item.tax_rate or 0))
-        
-        # Рассчитываем стоимость с учетом скидки
-        total_cost = quantity * unit_price
-        discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-        line_total = total_cost - discount_amount
-        
-        # Применяем налог
-        tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
-        service_revenue += line_total + tax_amount
-        service_total_quantity += quantity
-    
+    totals = {key: (value if value is not None else Decimal("0")) for key, value in totals.items()}
+
+    revenue = totals["revenue"]
+    service_revenue = totals["service_revenue"]
+    service_total_quantity = totals["service_quantity"]
     service_avg_price = service_revenue / service_total_quantity if service_total_quantity > 0 else Decimal("0")
-    
-    # Доходы с техники - правильный расчет через смены и часы
-    equipment_items = OrderItem.objects.filter(
-        order__in=orders,
-        item_type=OrderItem.ItemType.EQUIPMENT
-    ).select_related("order")
-    
-    # Рассчитываем доходы правильно: смены * daily_rate + часы * hourly_rate
-    equipment_revenue = Decimal("0")
-    equipment_total_hours = Decimal("0")
-    equipment_total_shifts = Decimal("0")
-    
-    for item in equipment_items:
-        metadata = item.metadata or {}
-        shifts = Decimal(str(metadata.get("shifts", 0) or 0))
-        hours = Decimal(str(metadata.get("hours", 0) or 0))
-        daily_rate = Decimal(str(metadata.get("daily_rate", 0) or 0))
-        hourly_rate = Decimal(str(item.unit_price or 0))
-        discount = Decimal(str(item.discount or 0))
-        tax_rate = Decimal(str(item.tax_rate or 0))
-        
-        if shifts > 0 or hours > 0:
-            # Правильный расчет: смены * daily_rate + часы * hourly_rate
-            shifts_cost = shifts * daily_rate if daily_rate > 0 else Decimal("0")
-            hours_cost = hours * hourly_rate
-            total_cost = shifts_cost + hours_cost
-            
-            # Применяем скидку (процент)
-            discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-            line_total = total_cost - discount_amount
-            
-            # Применяем налог
-            tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
-            equipment_revenue += line_total + tax_amount
-            
-            # Для статистики считаем общее количество часов и смен
-            equipment_total_hours += hours
-            equipment_total_shifts += shifts
-        else:
-            # Если нет информации о сменах/часах, используем старую логику для совместимости
-            quantity = Decimal(str(item.quantity or 0))
-            unit_price = Decimal(str(item.unit_price or 0))
-            discount = Decimal(str(item.discount or 0))
-            tax_rate = Decimal(str(item.tax_rate or 0))
-            
-            total_cost = unit_price * quantity
-            discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-            line_total = total_cost - discount_amount
-            tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
-            equipment_revenue += line_total + tax_amount
-            equipment_total_hours += quantity
-    
+
+    equipment_revenue = totals["equipment_revenue"]
+    equipment_total_hours = totals["equipment_hours"]
+    equipment_total_shifts = totals["equipment_shifts"]
     equipment_avg_price_per_hour = equipment_revenue / equipment_total_hours if equipment_total_hours > 0 else Decimal("0")
-    
-    expense_total = expenses.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-    
-    # Рассчитываем расходы на топливо отдельно
-    fuel_expenses = expenses.filter(category="fuel")
-    fuel_expense_total = fuel_expenses.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-    
-    # Рассчитываем расходы на ремонт отдельно
-    repair_expenses = expenses.filter(category="repair")
-    repair_expense_total = repair_expenses.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-    
-    salaries_total = salaries.aggregate(total=Sum("amount"))["total"] or Decimal("0")
+
+    expense_total = totals["expenses"]
+    fuel_expense_total = totals["expenses_fuel"]
+    repair_expense_total = totals["expenses_repair"]
+    if has_period:
+        expense_total += totals["unattached_expenses"]
+        fuel_expense_total += totals["unattached_expenses_fuel"]
+        repair_expense_total += totals["unattached_expenses_repair"]
+
+    salaries_total = totals["salaries"]
     margin = revenue - expense_total - salaries_total
 
     summary = {
@@ -243,80 +143,26 @@ def summary_report(date_from: Optional[str], date_to: Optional[str]) -> dict:
         "expenses_repair": str(repair_expense_total),  # Суммирующий расход по ремонту
         "salaries": str(salaries_total),
         "margin": str(margin),
-        "orders_count": orders.count(),
+        "orders_count": int(totals["orders_count"]),
         "period": {"from": date_from, "to": date_to},
     }
     return summary
 
 
 def equipment_report(date_from: Optional[str], date_to: Optional[str]) -> list[dict]:
-    """Отчет по технике с правильным расчетом часов работы из start_dt и end_dt заказов."""
+    """Отчет по технике: выручка и часы считаются одним агрегирующим запросом по позициям заявок."""
     # Фильтруем только завершенные заявки (COMPLETED)
     # Удаленные заявки автоматически исключены через CASCADE
     items = filter_range(
-        OrderItem.objects.filter(item_type=OrderItem.ItemType.EQUIPMENT)
-        .filter(order__status=OrderStatus.COMPLETED)
-        .select_related("order"),
+        OrderItem.objects.filter(item_type=OrderItem.ItemType.EQUIPMENT, order__status=OrderStatus.COMPLETED),
         "order__start_dt",
         date_from,
         date_to,
     )
-    
-    # Группируем по технике и рассчитываем реальное время работы
-    equipment_data = {}
-    for item in items:
-        eq_id = item.ref_id
-        if not eq_id:
-            continue
-        
-        # Используем правильный расчет через metadata (смены и часы)
-        metadata = item.metadata or {}
-        shifts = Decimal(str(metadata.get("shifts", 0) or 0))
-        hours = Decimal(str(metadata.get("hours", 0) or 0))
-        daily_rate = Decimal(str(metadata.get("daily_rate", 0) or 0))
-        hourly_rate = Decimal(str(item.unit_price or 0))
-        discount = Decimal(str(item.discount or 0))
-        tax_rate = Decimal(str(item.tax_rate or 0))
-        
-        # Рассчитываем реальное время работы и доход
-        if shifts > 0 or hours > 0:
-            # Правильный расчет: смены * daily_rate + часы * hourly_rate
-            shifts_cost = shifts * daily_rate if daily_rate > 0 else Decimal("0")
-            hours_cost = hours * hourly_rate
-            total_cost = shifts_cost + hours_cost
-            
-            # Применяем скидку (процент)
-            discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-            line_total = total_cost - discount_amount
-            
-            # Применяем налог
-            tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
-            line_total = line_total + tax_amount
-            
-            # Для статистики используем реальное время
-            actual_hours = hours  # Только часы, смены учитываем отдельно
-        else:
-            # Если нет информации о сменах/часах, используем старую логику
-            order = item.order
-            if order.start_dt and order.end_dt:
-                actual_hours = _get_duration_hours(order)
-            else:
-                actual_hours = Decimal(item.quantity or 0)
-            
-            # Рассчитываем доход с учетом скидки
-            line_total = (Decimal(item.unit_price or 0) * actual_hours) * (1 - Decimal(item.discount or 0) / Decimal("100"))
-        
-        if eq_id not in equipment_data:
-            equipment_data[eq_id] = {
-                "total_hours": Decimal("0"),
-                "revenue": Decimal("0"),
-            }
-        
-        equipment_data[eq_id]["total_hours"] += actual_hours
-        equipment_data[eq_id]["revenue"] += line_total
+    equipment_data = aggregate_item_totals(items).by_equipment
 
     equipment_ids = list(equipment_data.keys())
-    equipment_map = {eq.id: eq for eq in Equipment.objects.filter(id__in=equipment_ids)}
+    equipment_map = get_equipment_many(equipment_ids)
 
     # Получаем расходы по технике, включая расходы на топливо
     expenses = filter_range(
@@ -357,7 +203,7 @@ def equipment_report(date_from: Optional[str], date_to: Optional[str]) -> list[d
 
         # В отчёте по технике показываем "выручку" как чистый результат:
         # доходы по заявкам минус расходы на топливо и ремонт.
-        gross_revenue = data["revenue"]
+        gross_revenue = data.revenue
         net_revenue = gross_revenue - fuel_total - repair_total
 
         report.append(
@@ -366,7 +212,7 @@ def equipment_report(date_from: Optional[str], date_to: Optional[str]) -> list[d
                 "equipment_name": equipment.name,
                 "code": equipment.code,
                 "status": equipment.status,
-                "total_hours": str(data["total_hours"]),
+                "total_hours": str(data.hours),
                 "revenue": str(net_revenue.quantize(Decimal("0.01"))),
                 "expenses": str(total_expenses),
                 "fuel_expenses": str(fuel_total),  # Расходы на топливо для данной техники
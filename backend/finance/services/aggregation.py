@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import QuerySet, Sum
+
+from orders.models import OrderItem
+from orders.services.line_totals import (
+    calculate_line_total,
+    equipment_hours,
+    equipment_hours_expression,
+    equipment_usage,
+    line_total_expression,
+    metadata_decimal_expression,
+)
+
+DECIMAL_ZERO = Decimal("0.00")
+
+
+@dataclass
+class RevenueTotals:
+    """Суммы по группе позиций заявок."""
+
+    revenue: Decimal = DECIMAL_ZERO
+    quantity: Decimal = DECIMAL_ZERO
+    hours: Decimal = DECIMAL_ZERO
+    shifts: Decimal = DECIMAL_ZERO
+
+    def add(self, revenue: Decimal, quantity: Decimal, hours: Decimal, shifts: Decimal) -> None:
+        self.revenue += revenue
+        self.quantity += quantity
+        self.hours += hours
+        self.shifts += shifts
+
+
+@dataclass
+class ItemTotals:
+    """Итоги по типам позиций и по единицам техники (ref_id)."""
+
+    by_type: dict[str, RevenueTotals] = field(default_factory=dict)
+    by_equipment: dict[int, RevenueTotals] = field(default_factory=dict)
+
+    def for_type(self, item_type: str) -> RevenueTotals:
+        return self.by_type.get(item_type, RevenueTotals())
+
+
+def supports_sql_aggregation(items: QuerySet[OrderItem]) -> bool:
+    """Формула считается в БД на PostgreSQL; на SQLite (тесты, локальная разработка) — в Python."""
+    return connections[items.db].vendor == "postgresql"
+
+
+def aggregate_item_totals(items: QuerySet[OrderItem]) -> ItemTotals:
+    """
+    Считает выручку, количество, часы и смены по типам позиций и по технике.
+
+    На PostgreSQL выполняется один GROUP BY (item_type, ref_id) с формулой стоимости
+    в виде SQL-выражения, поэтому в процесс попадает не больше строк, чем единиц техники.
+    """
+    if supports_sql_aggregation(items):
+        rows = _aggregate_in_database(items)
+    else:
+        rows = _aggregate_in_python(items)
+
+    totals = ItemTotals()
+    for item_type, ref_id, revenue, quantity, hours, shifts in rows:
+        values = (revenue or DECIMAL_ZERO, quantity or DECIMAL_ZERO, hours or DECIMAL_ZERO, shifts or DECIMAL_ZERO)
+        totals.by_type.setdefault(item_type, RevenueTotals()).add(*values)
+        if item_type == OrderItem.ItemType.EQUIPMENT and ref_id:
+            totals.by_equipment.setdefault(ref_id, RevenueTotals()).add(*values)
+    return totals
+
+
+def _aggregate_in_database(items: QuerySet[OrderItem]):
+    grouped = (
+        items.order_by()
+        .values("item_type", "ref_id")
+        .annotate(
+            revenue=Sum(line_total_expression()),
+            total_quantity=Sum("quantity"),
+            total_hours=Sum(equipment_hours_expression()),
+            total_shifts=Sum(metadata_decimal_expression("shifts")),
+        )
+    )
+    for row in grouped:
+        yield (
+            row["item_type"],
+            row["ref_id"],
+            row["revenue"],
+            row["total_quantity"],
+            row["total_hours"],
+            row["total_shifts"],
+        )
+
+
+def _aggregate_in_python(items: QuerySet[OrderItem]):
+    grouped: dict[tuple[str, int | None], RevenueTotals] = {}
+    for item in items.only(
+        "item_type", "ref_id", "quantity", "unit_price", "discount", "tax_rate", "metadata"
+    ).iterator():
+        shifts, _, _ = equipment_usage(item.metadata)
+        grouped.setdefault((item.item_type, item.ref_id), RevenueTotals()).add(
+            calculate_line_total(item),
+            Decimal(str(item.quantity or 0)),
+            equipment_hours(item.item_type, item.quantity, item.metadata),
+            shifts,
+        )
+    for (item_type, ref_id), totals in grouped.items():
+        yield item_type, ref_id, totals.revenue, totals.quantity, totals.hours, totals.shifts
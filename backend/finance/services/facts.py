@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, Q, QuerySet, Sum
+from django.utils import timezone
+
+from catalog.cache import get_materials_many
+from catalog.models import MaterialItem
+from orders.models import Order, OrderItem, OrderStatus
+from orders.services.line_totals import (
+    calculate_line_total,
+    equipment_hours as item_equipment_hours,
+    equipment_usage,
+)
+
+from ..models import Expense, OrderRevenueFact, ReportDailyFact, SalaryRecord
+
+logger = logging.getLogger(__name__)
+
+DECIMAL_ZERO = Decimal("0.00")
+
+# Показатели, которые суммируются из OrderRevenueFact в ReportDailyFact
+ORDER_FACT_FIELDS = (
+    "revenue",
+    "service_revenue",
+    "service_quantity",
+    "equipment_revenue",
+    "equipment_hours",
+    "equipment_shifts",
+    "expenses",
+    "expenses_fuel",
+    "expenses_repair",
+    "salaries",
+)
+
+SERVICE_MATERIAL_CATEGORIES = (
+    MaterialItem.MaterialCategory.SOIL,
+    MaterialItem.MaterialCategory.TOOL,
+)
+
+
+def fact_day(order: Order) -> date:
+    """День, к которому относится заявка в отчётах (дата создания в локальной зоне)."""
+    return timezone.localtime(order.created_at).date()
+
+
+def refresh_order_facts(order: Order) -> None:
+    """
+    Пересчитывает показатели одной заявки и дневную свёртку её дня.
+
+    Вызывается внутри транзакции, в которой меняется заявка (завершение,
+    обновление зарплат, редактирование завершённой заявки).
+    """
+    day = fact_day(order)
+    if order.status != OrderStatus.COMPLETED:
+        OrderRevenueFact.objects.filter(order=order).delete()
+    else:
+        values = _compute_order_fact(order)
+        OrderRevenueFact.objects.update_or_create(order=order, defaults={"day": day, **values})
+    refresh_daily_fact(day)
+
+
+def refresh_orders_facts(orders: Iterable[Order]) -> set[date]:
+    """
+    Пересчитывает показатели набора заявок; свёртка каждого затронутого дня пересобирается один раз.
+
+    Возвращает затронутые дни (для инвалидации кэша отчётов).
+    """
+    days: set[date] = set()
+    for order in orders:
+        if order.status == OrderStatus.COMPLETED:
+            OrderRevenueFact.objects.update_or_create(
+                order=order, defaults={"day": fact_day(order), **_compute_order_fact(order)}
+            )
+        else:
+            OrderRevenueFact.objects.filter(order=order).delete()
+        days.add(fact_day(order))
+    for day in sorted(days):
+        refresh_daily_fact(day)
+    return days
+
+
+def remove_order_facts(order: Order) -> None:
+    """Удаляет показатели заявки перед её удалением и обновляет свёртку дня."""
+    OrderRevenueFact.objects.filter(order=order).delete()
+    refresh_daily_fact(fact_day(order))
+
+
+def refresh_daily_fact(day: date) -> ReportDailyFact | None:
+    """
+    Пересобирает строку ReportDailyFact за день из показателей заявок и расходов без заявки.
+
+    Строка дня блокируется до агрегации: параллельный пересчёт того же дня ждёт
+    коммита и агрегирует уже с его изменениями, а не перезаписывает их старыми суммами.
+    """
+    with transaction.atomic():
+        ReportDailyFact.objects.get_or_create(day=day)
+        fact = ReportDailyFact.objects.select_for_update().get(day=day)
+
+        order_totals = OrderRevenueFact.objects.filter(day=day).aggregate(
+            orders_count=Count("id"),
+            **{field: Sum(field) for field in ORDER_FACT_FIELDS},
+        )
+        unattached = Expense.objects.filter(order__isnull=True, date=day).aggregate(
+            total=Sum("amount"),
+            fuel=Sum("amount", filter=Q(category="fuel")),
+            repair=Sum("amount", filter=Q(category="repair")),
+        )
+
+        values = {field: order_totals[field] or DECIMAL_ZERO for field in ORDER_FACT_FIELDS}
+        values["orders_count"] = order_totals["orders_count"] or 0
+        values["unattached_expenses"] = unattached["total"] or DECIMAL_ZERO
+        values["unattached_expenses_fuel"] = unattached["fuel"] or DECIMAL_ZERO
+        values["unattached_expenses_repair"] = unattached["repair"] or DECIMAL_ZERO
+
+        if not values["orders_count"] and not values["unattached_expenses"]:
+            fact.delete()
+            return None
+        for field, value in values.items():
+            setattr(fact, field, value)
+        fact.save(update_fields=list(values))
+        return fact
+
+
+def rebuild_all_facts(orders: QuerySet[Order] | None = None) -> int:
+    """Полная пересборка таблиц показателей (первичное заполнение и ручное восстановление)."""
+    if orders is None:
+        orders = Order.objects.filter(status=OrderStatus.COMPLETED)
+    days: set[date] = set()
+    count = 0
+    for order in orders.iterator():
+        OrderRevenueFact.objects.update_or_create(
+            order=order,
+            defaults={"day": fact_day(order), **_compute_order_fact(order)},
+        )
+        days.add(fact_day(order))
+        count += 1
+
+    # Удаляем показатели заявок, которые больше не завершены
+    stale = OrderRevenueFact.objects.exclude(order__status=OrderStatus.COMPLETED)
+    days.update(stale.values_list("day", flat=True))
+    stale.delete()
+
+    days.update(ReportDailyFact.objects.values_list("day", flat=True))
+    days.update(Expense.objects.filter(order__isnull=True).values_list("date", flat=True).distinct())
+    for day in sorted(days):
+        refresh_daily_fact(day)
+    logger.info("Rebuilt report facts for %s orders and %s days", count, len(days))
+    return count
+
+
+def _compute_order_fact(order: Order) -> dict[str, Decimal]:
+    # Читаем позиции напрямую: prefetch-кэш заявки может быть устаревшим после пересоздания позиций
+    items = list(OrderItem.objects.filter(order=order))
+
+    service_revenue = DECIMAL_ZERO
+    service_quantity = DECIMAL_ZERO
+    equipment_revenue = DECIMAL_ZERO
+    equipment_hours_total = DECIMAL_ZERO
+    equipment_shifts = DECIMAL_ZERO
+
+    unresolved = {
+        item.ref_id
+        for item in items
+        if item.item_type == OrderItem.ItemType.MATERIAL
+        and item.ref_id
+        and not (item.metadata or {}).get("material_category")
+    }
+    material_categories = {pk: material.category for pk, material in get_materials_many(unresolved).items()}
+
+    for item in items:
+        metadata = item.metadata or {}
+        if item.item_type == OrderItem.ItemType.EQUIPMENT:
+            equipment_revenue += calculate_line_total(item)
+            equipment_hours_total += item_equipment_hours(item.item_type, item.quantity, metadata)
+            equipment_shifts += equipment_usage(metadata)[0]
+        elif item.item_type == OrderItem.ItemType.SERVICE:
+            service_revenue += calculate_line_total(item)
+            service_quantity += Decimal(str(item.quantity or 0))
+        elif item.item_type == OrderItem.ItemType.MATERIAL:
+            category = metadata.get("material_category") or material_categories.get(item.ref_id)
+            if category in SERVICE_MATERIAL_CATEGORIES:
+                service_revenue += calculate_line_total(item)
+                service_quantity += Decimal(str(item.quantity or 0))
+
+    expense_totals = Expense.objects.filter(order=order).aggregate(
+        total=Sum("amount"),
+        fuel=Sum("amount", filter=Q(category="fuel")),
+        repair=Sum("amount", filter=Q(category="repair")),
+    )
+    salaries_total = SalaryRecord.objects.filter(order=order).aggregate(total=Sum("amount"))["total"]
+
+    return {
+        "revenue": order.total_amount or DECIMAL_ZERO,
+        "service_revenue": service_revenue,
+        "service_quantity": service_quantity,
+        "equipment_revenue": equipment_revenue,
+        "equipment_hours": equipment_hours_total,
+        "equipment_shifts": equipment_shifts,
+        "expenses": expense_totals["total"] or DECIMAL_ZERO,
+        "expenses_fuel": expense_totals["fuel"] or DECIMAL_ZERO,
+        "expenses_repair": expense_totals["repair"] or DECIMAL_ZERO,
+        "salaries": salaries_total or DECIMAL_ZERO,
+    }
+
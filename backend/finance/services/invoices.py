@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.template.loader import get_template
+from django.utils import timezone
+
+from ..models import DocumentTemplate, Invoice
+from . import pdf_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_PATH = "invoices/default.html"
+
+
+def _config() -> dict:
+    return getattr(settings, "INVOICE_RENDERING", {})
+
+
+def resolve_template_path(template_slug: str) -> str:
+    """Путь к активной версии шаблона счёта (один запрос на пакет)."""
+    template = (
+        DocumentTemplate.objects.filter(slug=template_slug, is_active=True)
+        .order_by("-version")
+        .values_list("template_path", flat=True)
+        .first()
+    )
+    return template or DEFAULT_TEMPLATE_PATH
+
+
+@lru_cache(maxsize=32)
+def compiled_template(template_path: str):
+    """Скомпилированный шаблон Django, кэшируется на процесс."""
+    return get_template(template_path)
+
+
+def company_context() -> dict[str, Any]:
+    return {
+        "name": settings.APP_CONFIG.get("company_name", "Ringo Uchet"),
+        "address": settings.APP_CONFIG.get("company_address", "—"),
+        "phone": settings.APP_CONFIG.get("company_phone", "—"),
+        "email": settings.APP_CONFIG.get("company_email", "—"),
+        "representative": settings.APP_CONFIG.get("company_representative", "—"),
+    }
+
+
+def build_invoice_context(invoice: Invoice, company: dict[str, Any] | None = None) -> dict[str, Any]:
+    order = invoice.order
+    snapshot = order.price_snapshot or {}
+    return {
+        "invoice": invoice,
+        "client": order.client,
+        "order": order,
+        "positions": snapshot.get("positions", []),
+        "summary": snapshot.get("summary", {}),
+        "issued_at": invoice.issued_at.strftime("%d.%m.%Y"),
+        "company": company or company_context(),
+        "payment_link": settings.APP_CONFIG.get("payment_link", "https://example.com/pay"),
+    }
+
+
+def render_invoices(
+    invoice_ids: Iterable[int], template_slug: str = "invoice-default", workers: int | None = None
+) -> dict[str, Any]:
+    """
+    Рендерит PDF для пакета счетов.
+
+    HTML строится в текущем процессе (шаблон и контекст компании — один раз на пакет),
+    PDF — в пуле процессов с прогретым WeasyPrint. Файлы сохраняются по мере готовности,
+    поля счетов обновляются одним bulk_update (и при прерывании пакета — для уже сохранённых). Возвращает время рендеринга по каждому счёту.
+    """
+    invoice_ids = list(invoice_ids)
+    if workers is None:
+        workers = int(_config().get("workers", 4))
+    stylesheet_paths = tuple(_config().get("stylesheets", ()))
+
+    invoices = {
+        invoice.id: invoice
+        for invoice in Invoice.objects.select_related("order__client").filter(id__in=invoice_ids)
+    }
+    template = compiled_template(resolve_template_path(template_slug))
+    company = company_context()
+
+    html_timings: dict[int, float] = {}
+    documents = []
+    for invoice_id, invoice in invoices.items():
+        started = time.perf_counter()
+        documents.append((invoice_id, template.render(build_invoice_context(invoice, company))))
+        html_timings[invoice_id] = time.perf_counter() - started
+
+    rendered: list[dict[str, Any]] = []
+    failed: list[dict[str, Any]] = []
+    updated: list[Invoice] = []
+    generated_at = timezone.now().isoformat()
+    try:
+        for result in pdf_pool.render_many(documents, workers, stylesheet_paths):
+            invoice = invoices[result.key]
+            timing = {
+                "invoice_id": invoice.id,
+                "html_ms": round(html_timings[invoice.id] * 1000, 1),
+                "pdf_ms": round(result.seconds * 1000, 1),
+            }
+            if result.pdf is None:
+                logger.error("Failed to render invoice %s: %s", invoice.id, result.error)
+                failed.append({**timing, "error": result.error})
+                continue
+            filename = f"{invoice.number or Invoice.generate_number()}.pdf"
+            invoice.pdf_file.save(filename, ContentFile(result.pdf), save=False)
+            invoice.pdf_url = invoice.pdf_file.url if invoice.pdf_file else invoice.pdf_url
+            invoice.payment_status = invoice.payment_status or "pending"
+            invoice.metadata = {**(invoice.metadata or {}), "generated_at": generated_at, "render_ms": timing["pdf_ms"]}
+            updated.append(invoice)
+            rendered.append({**timing, "pdf_url": invoice.pdf_url})
+    finally:
+        # Сохранённые файлы фиксируются в счетах, даже если пакет прерван
+        if updated:
+            Invoice.objects.bulk_update(updated, ["pdf_file", "pdf_url", "payment_status", "metadata"], batch_size=500)
+
+    missing = sorted(set(invoice_ids) - set(invoices))
+    logger.info("Rendered %s invoices (%s failed) with %s workers", len(rendered), len(failed), workers)
+    return {"rendered": rendered, "failed": failed, "missing": missing}
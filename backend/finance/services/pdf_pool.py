@@ -0,0 +1,101 @@
+"""
+Пул процессов для рендеринга PDF через WeasyPrint.
+
+Модуль не импортирует Django: дочерние процессы получают готовый HTML и
+возвращают байты PDF, а работа с БД и хранилищем остаётся в родительском процессе.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Состояние процесса: WeasyPrint, конфигурация шрифтов и скомпилированные CSS создаются один раз
+_html_class = None
+_font_config = None
+_stylesheets: list = []
+
+
+class RenderResult(NamedTuple):
+    key: int
+    pdf: bytes | None
+    seconds: float
+    error: str | None
+
+
+def warm_up(stylesheet_paths: Sequence[str] = ()) -> None:
+    """Импортирует WeasyPrint, готовит шрифты и CSS и рендерит пустой документ."""
+    global _html_class, _font_config, _stylesheets
+    if _html_class is not None:
+        return
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    _font_config = FontConfiguration()
+    _stylesheets = [CSS(filename=path, font_config=_font_config) for path in stylesheet_paths]
+    HTML(string="<p></p>").write_pdf(font_config=_font_config)
+    _html_class = HTML
+
+
+def _init_worker(stylesheet_paths: Sequence[str]) -> None:
+    # Ошибка прогрева не должна ломать пул: она будет возвращена в RenderResult каждого документа
+    try:
+        warm_up(stylesheet_paths)
+    except Exception:  # noqa: BLE001
+        pass
+
+
+def render_pdf(key: int, html: str, stylesheet_paths: Sequence[str] = ()) -> RenderResult:
+    started = time.perf_counter()
+    try:
+        warm_up(stylesheet_paths)
+        pdf = _html_class(string=html, base_url="").write_pdf(stylesheets=_stylesheets, font_config=_font_config)
+        return RenderResult(key, pdf, time.perf_counter() - started, None)
+    except Exception as exc:  # noqa: BLE001 - ошибка одного документа не должна ронять пакет
+        return RenderResult(key, None, time.perf_counter() - started, f"{type(exc).__name__}: {exc}")
+
+
+def can_fork_workers() -> bool:
+    """
+    Демонические процессы (prefork-воркеры Celery) не могут создавать дочерние.
+
+    Поэтому generate_invoice_pdfs направлен в очередь pdf воркера --pool=solo.
+    """
+    return not multiprocessing.current_process().daemon
+
+
+def render_many(
+    documents: Iterable[tuple[int, str]], workers: int, stylesheet_paths: Sequence[str] = ()
+) -> Iterator[RenderResult]:
+    """
+    Рендерит документы (key, html) и отдаёт результаты по мере готовности.
+
+    При workers <= 1 или внутри демонического процесса рендерит в текущем процессе,
+    сохраняя прогретый WeasyPrint между документами. Падение процесса пула
+    (OOM, segfault WeasyPrint) возвращается ошибкой для каждого незавершённого документа.
+    """
+    documents = list(documents)
+    if workers > 1 and len(documents) > 1 and not can_fork_workers():
+        logger.warning("PDF pool unavailable in daemonic process, rendering %s documents sequentially", len(documents))
+    if workers <= 1 or len(documents) <= 1 or not can_fork_workers():
+        for key, html in documents:
+            yield render_pdf(key, html, stylesheet_paths)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(documents)),
+        initializer=_init_worker,
+        initargs=(tuple(stylesheet_paths),),
+    ) as executor:
+        futures = {
+            executor.submit(render_pdf, key, html, tuple(stylesheet_paths)): key for key, html in documents
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as exc:  # noqa: BLE001 - падение процесса пула (BrokenProcessPool) — ошибка документа
+                yield RenderResult(futures[future], None, 0.0, f"{type(exc).__name__}: {exc}")
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from orders.models import Order
+
+from ..exporters import generate_order_receipt_pdf
+from ..models import OrderReceipt
+
+logger = logging.getLogger(__name__)
+
+
+def receipt_hash(order: Order) -> str:
+    """Хеш содержимого чека: снимок расчёта и итоговая сумма заявки."""
+    payload = json.dumps(
+        {"snapshot": order.price_snapshot or {}, "total": str(order.total_amount)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_stored_receipt(order: Order) -> OrderReceipt | None:
+    """Сохранённый чек, если он построен по актуальному снимку расчёта."""
+    receipt = OrderReceipt.objects.filter(order=order).first()
+    if receipt and receipt.snapshot_hash == receipt_hash(order) and receipt.pdf_file:
+        return receipt
+    return None
+
+
+def render_receipt(order: Order) -> OrderReceipt:
+    """
+    Генерирует PDF чек и сохраняет его вместе с хешем снимка расчёта.
+
+    Чек строят параллельно задача после завершения и GET receipt: строка чека
+    блокируется, второй процесс получает уже сохранённый чек. Прежний файл
+    удаляется только после коммита, когда строка указывает на новый.
+    """
+    snapshot_hash = receipt_hash(order)
+    pdf_content = generate_order_receipt_pdf(order)
+    if not pdf_content:
+        raise ValueError("Сгенерированный PDF пуст")
+
+    with transaction.atomic():
+        receipt, _ = OrderReceipt.objects.get_or_create(order=order)
+        receipt = OrderReceipt.objects.select_for_update().get(pk=receipt.pk)
+        if receipt.snapshot_hash == snapshot_hash and receipt.pdf_file:
+            return receipt
+
+        previous = receipt.pdf_file.name
+        receipt.snapshot_hash = snapshot_hash
+        receipt.size = len(pdf_content)
+        receipt.pdf_file.save(f"receipt_{order.number}_{snapshot_hash[:12]}.pdf", ContentFile(pdf_content), save=False)
+        receipt.save()
+        if previous and previous != receipt.pdf_file.name:
+            storage = receipt.pdf_file.storage
+            transaction.on_commit(lambda: storage.delete(previous))
+    logger.info("Rendered receipt for order %s (%s bytes)", order.number, receipt.size)
+    return receipt
+
+
+def ensure_receipt(order: Order) -> OrderReceipt:
+    """Возвращает актуальный чек, перегенерируя его только при изменении снимка расчёта."""
+    return get_stored_receipt(order) or render_receipt(order)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import date, datetime
+from hashlib import md5
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_PREFIX = "report:version"
+# Тег всего кэша отчётов: сбрасывается clear_reports_cache()
+GLOBAL_TAG = "all"
+# Тег отчётов с открытым периодом (без "from" или "to"): зависят от любой даты
+OPEN_RANGE_TAG = "open"
+
+
+def _config() -> dict:
+    return getattr(settings, "REPORTS_CACHE", {})
+
+
+def current_timeout() -> int:
+    """TTL для отчётов, период которых затрагивает текущий месяц."""
+    return int(_config().get("current_timeout", 60))
+
+
+def historical_timeout() -> int:
+    """TTL для отчётов, период которых целиком в прошедших месяцах."""
+    return int(_config().get("historical_timeout", 6 * 60 * 60))
+
+
+def month_bucket(value: date | datetime) -> str:
+    """Тег месяца (YYYY-MM) для даты; datetime переводится в локальную зону."""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def range_buckets(day_from: Optional[date], day_to: Optional[date]) -> list[str]:
+    """Теги, от которых зависит отчёт за период [day_from, day_to]."""
+    if not day_from or not day_to:
+        return [GLOBAL_TAG, OPEN_RANGE_TAG]
+    if day_from > day_to:
+        return [GLOBAL_TAG]
+    buckets = [GLOBAL_TAG]
+    year, month = day_from.year, day_from.month
+    while (year, month) <= (day_to.year, day_to.month):
+        buckets.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
+def range_timeout(day_from: Optional[date], day_to: Optional[date]) -> int:
+    """Отчёты за закрытые прошедшие месяцы меняются редко и живут в кэше дольше."""
+    if day_from and day_to and month_bucket(day_to) < month_bucket(timezone.localdate()):
+        return historical_timeout()
+    return current_timeout()
+
+
+def build_key(namespace: str, raw: str, buckets: Iterable[str]) -> str:
+    """
+    Ключ кэша отчёта с учётом версий тегов.
+
+    Инвалидация увеличивает версию тега, поэтому ключи всех зависящих от него
+    отчётов меняются, а старые записи просто истекают по TTL.
+    """
+    buckets = list(buckets)
+    version_keys = [f"{VERSION_PREFIX}:{bucket}" for bucket in buckets]
+    versions = cache.get_many(version_keys)
+    token = ",".join(f"{bucket}={versions.get(key, 0)}" for bucket, key in zip(buckets, version_keys))
+    digest = md5(f"{raw}|{token}".encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def invalidate_buckets(buckets: Iterable[str]) -> None:
+    for bucket in set(buckets):
+        key = f"{VERSION_PREFIX}:{bucket}"
+        try:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+        except ValueError:
+            # Ключ версии истёк между add и incr
+            cache.set(key, 1, timeout=None)
+
+
+def invalidate_report_dates(*values: date | datetime | None) -> None:
+    """Инвалидирует отчёты, период которых содержит хотя бы одну из дат."""
+    buckets = {month_bucket(value) for value in values if value}
+    if not buckets:
+        return
+    try:
+        invalidate_buckets([OPEN_RANGE_TAG, *buckets])
+    except Exception as exc:
+        logger.warning("Failed to invalidate report cache for %s: %s", sorted(buckets), exc)
+
+
+def invalidate_order_reports(order) -> None:
+    """Инвалидирует отчёты, зависящие от заявки (по дате создания и дате начала работ)."""
+    invalidate_report_dates(order.created_at, order.start_dt)
+
+
+def clear_all_reports() -> None:
+    try:
+        invalidate_buckets([GLOBAL_TAG])
+    except Exception as exc:
+        logger.warning("Failed to clear reports cache: %s", exc)
+
+
+# --- stale-while-revalidate -------------------------------------------------------
+
+
+def stale_timeout() -> int:
+    """Сколько хранится последнее успешно построенное значение отчёта для отдачи «устаревшим»."""
+    return int(_config().get("stale_timeout", 24 * 60 * 60))
+
+
+def lock_timeout() -> int:
+    """Максимальное время удержания блокировки генерации (защита от зависших воркеров)."""
+    return int(_config().get("lock_timeout", 120))
+
+
+def lock_wait() -> float:
+    """Сколько запрос без блокировки ждёт результата генерации другого процесса."""
+    return float(_config().get("lock_wait", 5))
+
+
+def build_stale_key(namespace: str, raw: str) -> str:
+    """Ключ последнего значения отчёта: не зависит от версий тегов и переживает инвалидацию."""
+    return f"{namespace}:stale:{md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def acquire_lock(key: str) -> bool:
+    """Single-flight: только один процесс генерирует отчёт для ключа."""
+    return cache.add(f"{key}:lock", 1, timeout=lock_timeout())
+
+
+def release_lock(key: str) -> None:
+    cache.delete(f"{key}:lock")
+
+
+def wait_for(key: str):
+    """Ожидает, пока другой процесс положит значение в кэш; None, если не дождались."""
+    deadline = time.monotonic() + lock_wait()
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    return None
+
+
+def store(key: str, stale_key: str, data, timeout: int) -> None:
+    cache.set(key, data, timeout=timeout)
+    cache.set(stale_key, data, timeout=max(stale_timeout(), timeout))
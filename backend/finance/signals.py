@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from orders.models import Order
+
+from .models import Expense, SalaryRecord
+from .services.facts import refresh_daily_fact, refresh_order_facts
+from .services.report_cache import invalidate_order_reports, invalidate_report_dates
+
+# Поля, от которых зависит, чьи показатели пересчитывать
+FACT_FIELDS = {Expense: ("order_id", "date"), SalaryRecord: ("order_id",)}
+
+
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=SalaryRecord)
+def remember_previous_fact_target(sender, instance, **kwargs):
+    """Запоминает прежние заявку и дату: при переносе записи пересчитываются и они."""
+    previous = None
+    if instance.pk is not None and not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).values(*FACT_FIELDS[sender]).first()
+    instance._fact_previous = previous
+
+
+def _targets(sender, values: dict) -> tuple[set, set]:
+    """(заявки, дни без заявки), показатели которых зависят от записи."""
+    if values.get("order_id") is not None:
+        return {values["order_id"]}, set()
+    if sender is Expense and values.get("date"):
+        return set(), {values["date"]}
+    return set(), set()
+
+
+def _refresh_order_facts(order_id) -> None:
+    # Заявку перечитываем: к коммиту она может быть удалена (её показатели уже сняты при удалении)
+    with transaction.atomic():
+        order = Order.objects.filter(pk=order_id).first()
+        if order is not None:
+            refresh_order_facts(order)
+    if order is not None:
+        invalidate_order_reports(order)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def invalidate_expense_reports(sender, instance: Expense, **kwargs):
+    """Расходы по технике учитываются в отчётах по дате расхода (прежней и новой)."""
+    previous = getattr(instance, "_fact_previous", None) or {}
+    days = {day for day in (instance.date, previous.get("date")) if day}
+    if days:
+        transaction.on_commit(lambda: invalidate_report_dates(*days))
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=SalaryRecord)
+@receiver(post_delete, sender=SalaryRecord)
+def refresh_fact_targets(sender, instance, **kwargs):
+    """
+    Расход или зарплата заявки пересчитывают показатели заявки, расход без заявки
+    (аренда, прочее) — дневные показатели по дате расхода. При переносе записи на
+    другую заявку или дату пересчитываются и прежние.
+    """
+    order_ids, days = _targets(sender, {field: getattr(instance, field) for field in FACT_FIELDS[sender]})
+    previous = getattr(instance, "_fact_previous", None)
+    if previous:
+        previous_orders, previous_days = _targets(sender, previous)
+        order_ids |= previous_orders
+        days |= previous_days
+    for order_id in order_ids:
+        transaction.on_commit(lambda order_id=order_id: _refresh_order_facts(order_id))
+    for day in sorted(days):
+        transaction.on_commit(lambda day=day: refresh_daily_fact(day))
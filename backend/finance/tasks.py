@@ -1,15 +1,12 @@
 from __future__ import annotations
 
 import logging
-
-from django.conf import settings
-from django.core.files.base import ContentFile
-from django.template.loader import render_to_string
-from django.utils import timezone
+import time
 
 from celery import shared_task
 
-from .models import DocumentTemplate, Invoice
+from .models import Invoice
+from .services.invoices import render_invoices
 
 logger = logging.getLogger(__name__)
 
@@ -31,40 +28,61 @@ def generate_invoice_pdf(self, invoice_id: int, template_slug: str = "invoice-de
         logger.error(error_msg)
         raise RuntimeError(error_msg)
 
-    invoice = Invoice.objects.select_related("order__client").get(id=invoice_id)
-    template = (
-        DocumentTemplate.objects.filter(slug=template_slug, is_active=True)
-        .order_by("-version")
+    result = render_invoices([invoice_id], template_slug, workers=1)
+    if result["missing"]:
+        raise Invoice.DoesNotExist(f"Invoice {invoice_id} does not exist")
+    if result["failed"]:
+        raise RuntimeError(result["failed"][0]["error"])
+    return {"invoice_id": invoice_id, "pdf_url": result["rendered"][0]["pdf_url"]}
+
+
+@shared_task(bind=True)
+def generate_invoice_pdfs(self, invoice_ids: list[int], template_slug: str = "invoice-default") -> dict:
+    """Пакетный рендеринг счетов (закрытие месяца): пул WeasyPrint и одно bulk_update."""
+    if not WEASYPRINT_AVAILABLE:
+        error_msg = "WeasyPrint is not available. Please install system dependencies."
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
+
+    started = time.perf_counter()
+    result = render_invoices(invoice_ids, template_slug)
+    result["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+@shared_task(bind=True, ignore_result=True)
+def regenerate_report(self, namespace: str, path: str, params: dict[str, str], lock_key: str) -> None:
+    """Фоновый пересчёт отчёта для stale-while-revalidate (блокировку ставит BaseReportView)."""
+    from .api import REPORT_VIEWS
+    from .services import report_cache
+
+    view_class = REPORT_VIEWS.get(namespace)
+    if view_class is None:
+        logger.warning("Unknown report namespace for regeneration: %s", namespace)
+        report_cache.release_lock(lock_key)
+        return
+    try:
+        view_class().regenerate(path, params)
+    finally:
+        report_cache.release_lock(lock_key)
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=30)
+def generate_order_receipt(self, order_id: str) -> None:
+    """Строит и сохраняет PDF чек завершённой заявки (вызывается после завершения)."""
+    from orders.models import Order, OrderStatus
+
+    from .services.receipts import ensure_receipt
+
+    order = (
+        Order.objects.select_related("client").prefetch_related("items", "status_logs")
+        .filter(id=order_id, status=OrderStatus.COMPLETED)
         .first()
     )
-    template_path = template.template_path if template else "invoices/default.html"
-
-    order = invoice.order
-    snapshot = order.price_snapshot or {}
-    context = {
-        "invoice": invoice,
-        "client": order.client,
-        "order": order,
-        "positions": snapshot.get("positions", []),
-        "summary": snapshot.get("summary", {}),
-        "issued_at": invoice.issued_at.strftime("%d.%m.%Y"),
-        "company": {
-            "name": settings.APP_CONFIG.get("company_name", "Ringo Uchet"),
-            "address": settings.APP_CONFIG.get("company_address", "—"),
-            "phone": settings.APP_CONFIG.get("company_phone", "—"),
-            "email": settings.APP_CONFIG.get("company_email", "—"),
-            "representative": settings.APP_CONFIG.get("company_representative", "—"),
-        },
-        "payment_link": settings.APP_CONFIG.get("payment_link", "https://example.com/pay"),
-    }
-
-    html = render_to_string(template_path, context)
-    pdf_bytes = HTML(string=html, base_url="").write_pdf()
-    filename = f"{invoice.number or Invoice.generate_number()}.pdf"
-    invoice.pdf_file.save(filename, ContentFile(pdf_bytes), save=True)
-    invoice.pdf_url = invoice.pdf_file.url if invoice.pdf_file else invoice.pdf_url
-    invoice.payment_status = invoice.payment_status or "pending"
-    invoice.metadata["generated_at"] = timezone.now().isoformat()
-    invoice.save(update_fields=["pdf_file", "pdf_url", "payment_status", "metadata"])
-    return {"invoice_id": invoice.id, "pdf_url": invoice.pdf_url}
-
+    if order is None:
+        return
+    try:
+        ensure_receipt(order)
+    except Exception as exc:
+        logger.warning("Failed to render receipt for order %s: %s", order_id, exc)
+        raise self.retry(exc=exc)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from finance.services.aggregation import _aggregate_in_database, _aggregate_in_python, aggregate_item_totals
+from orders.models import Order, OrderItem, OrderStatus
+
+
+class ItemAggregationTests(TestCase):
+    def setUp(self):
+        order = Order.objects.create(
+            number="000001", address="Test address", start_dt=timezone.now(), status=OrderStatus.COMPLETED
+        )
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.EQUIPMENT,
+            ref_id=5,
+            name_snapshot="Excavator",
+            unit_price=Decimal("100.00"),
+            quantity=Decimal("3.5"),
+            discount=Decimal("10"),
+            tax_rate=Decimal("20"),
+            metadata={"shifts": 1.0, "hours": 2.5, "daily_rate": 800.0},
+        )
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.EQUIPMENT,
+            ref_id=5,
+            name_snapshot="Excavator",
+            unit_price=Decimal("100.00"),
+            quantity=Decimal("3"),
+        )
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.SERVICE,
+            name_snapshot="Work",
+            unit_price=Decimal("33.33"),
+            quantity=Decimal("3"),
+            tax_rate=Decimal("7"),
+            metadata={"shifts": ""},
+        )
+
+    def test_totals_by_type_and_equipment(self):
+        totals = aggregate_item_totals(OrderItem.objects.all())
+
+        # (800 + 2.5 * 100) * 0.9 * 1.2 + 3 * 100
+        self.assertEqual(totals.by_equipment[5].revenue, Decimal("1434.00"))
+        self.assertEqual(totals.by_equipment[5].hours, Decimal("5.5"))
+        self.assertEqual(totals.by_equipment[5].shifts, Decimal("1"))
+        self.assertEqual(totals.for_type(OrderItem.ItemType.SERVICE).revenue, Decimal("106.99"))
+        self.assertEqual(totals.for_type(OrderItem.ItemType.MATERIAL).revenue, Decimal("0"))
+
+    def test_sql_expression_matches_python_formula(self):
+        items = OrderItem.objects.all()
+        python_rows = sorted(_aggregate_in_python(items), key=lambda row: row[0])
+        sql_rows = sorted(_aggregate_in_database(items), key=lambda row: row[0])
+
+        self.assertEqual(len(python_rows), len(sql_rows))
+        for python_row, sql_row in zip(python_rows, sql_rows):
+            self.assertEqual(python_row[:2], sql_row[:2])
+            for python_value, sql_value in zip(python_row[2:], sql_row[2:]):
+                self.assertEqual(Decimal(python_value).quantize(Decimal("0.01")), Decimal(sql_value).quantize(Decimal("0.01")))
+
+    def test_tax_half_cent_is_rounded_the_same_in_python_and_sql(self):
+        OrderItem.objects.all().delete()
+        order = Order.objects.get()
+        # Налог 0.025 — ровно половина копейки
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.SERVICE,
+            name_snapshot="Work",
+            unit_price=Decimal("0.25"),
+            quantity=Decimal("1"),
+            tax_rate=Decimal("10"),
+        )
+        items = OrderItem.objects.all()
+
+        [python_row] = _aggregate_in_python(items)
+        [sql_row] = _aggregate_in_database(items)
+        self.assertEqual(python_row[2], Decimal("0.28"))
+        self.assertEqual(Decimal(str(sql_row[2])), Decimal("0.28"))
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib import admin
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from finance import tasks
+from finance.models import Invoice
+from finance.services import pdf_pool
+from finance.services.invoices import render_invoices
+from orders.admin import OrderAdmin
+from orders.models import Order
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def _render_or_crash(key, html, stylesheet_paths=()):
+    # Выполняется в процессе пула: документ 2 имитирует падение процесса (OOM, segfault)
+    if key == 2:
+        os._exit(1)
+    return pdf_pool.RenderResult(key, f"pdf-{key}".encode(), 0.0, None)
+
+
+class PdfPoolTests(SimpleTestCase):
+    def test_sequential_render_reports_errors_per_document(self):
+        with mock.patch.object(pdf_pool, "warm_up", side_effect=RuntimeError("no weasyprint")):
+            results = list(pdf_pool.render_many([(1, "<p>1</p>"), (2, "<p>2</p>")], workers=1))
+
+        self.assertEqual([result.key for result in results], [1, 2])
+        self.assertTrue(all(result.pdf is None and "no weasyprint" in result.error for result in results))
+
+    def test_crashed_pool_process_becomes_error_results(self):
+        documents = [(key, f"<p>{key}</p>") for key in range(1, 5)]
+        with mock.patch.object(pdf_pool, "render_pdf", _render_or_crash):
+            results = {result.key: result for result in pdf_pool.render_many(documents, workers=2)}
+
+        self.assertEqual(set(results), {1, 2, 3, 4})
+        self.assertIsNone(results[2].pdf)
+        self.assertIn("BrokenProcessPool", results[2].error)
+        for result in results.values():
+            self.assertTrue(result.pdf is not None or result.error)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch("finance.services.invoices.compiled_template", return_value=mock.Mock(render=mock.Mock(return_value="<p></p>")))
+class RenderInvoicesTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.invoices = [
+            Invoice.objects.create(
+                order=Order.objects.create(number=f"00000{i}", address="Test address", start_dt=timezone.now()),
+                number=f"INV-{i}",
+                amount=Decimal("100.00"),
+            )
+            for i in (1, 2)
+        ]
+
+    def test_rendered_invoices_are_saved_and_failures_reported(self, template):
+        first, second = self.invoices
+        results = [
+            pdf_pool.RenderResult(first.id, b"%PDF first", 0.01, None),
+            pdf_pool.RenderResult(second.id, None, 0.01, "BrokenProcessPool: crashed"),
+        ]
+        with mock.patch.object(pdf_pool, "render_many", return_value=iter(results)):
+            result = render_invoices([first.id, second.id, 999], workers=2)
+
+        self.assertEqual([row["invoice_id"] for row in result["rendered"]], [first.id])
+        self.assertEqual([row["invoice_id"] for row in result["failed"]], [second.id])
+        self.assertEqual(result["missing"], [999])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.pdf_file)
+        self.assertIn("render_ms", first.metadata)
+        self.assertFalse(second.pdf_file)
+
+    def test_interrupted_batch_keeps_saved_files_on_invoices(self, template):
+        first, second = self.invoices
+
+        def interrupted(*args, **kwargs):
+            yield pdf_pool.RenderResult(first.id, b"%PDF first", 0.01, None)
+            raise RuntimeError("storage unavailable")
+
+        with mock.patch.object(pdf_pool, "render_many", interrupted):
+            with self.assertRaises(RuntimeError):
+                render_invoices([first.id, second.id], workers=2)
+
+        first.refresh_from_db()
+        self.assertTrue(first.pdf_file)
+
+    def test_batch_task_returns_render_summary(self, template):
+        summary = {"rendered": [], "failed": [], "missing": []}
+        with mock.patch.object(tasks, "WEASYPRINT_AVAILABLE", True), mock.patch.object(
+            tasks, "render_invoices", return_value=summary
+        ) as render:
+            result = tasks.generate_invoice_pdfs.apply(args=([self.invoices[0].id],)).get()
+
+        render.assert_called_once_with([self.invoices[0].id], "invoice-default")
+        self.assertIn("total_ms", result)
+
+    def test_admin_action_queues_one_batch(self, template):
+        Order.objects.create(number="000003", address="Test address", start_dt=timezone.now())
+        model_admin = OrderAdmin(Order, admin.site)
+        request = RequestFactory().post("/admin/orders/order/")
+
+        with mock.patch("orders.admin.generate_invoice_pdfs.delay") as delay, mock.patch.object(model_admin, "message_user"):
+            model_admin.generate_invoice_pdf(request, Order.objects.all())
+
+        delay.assert_called_once()
+        self.assertEqual(sorted(delay.call_args.args[0]), sorted(Invoice.objects.values_list("id", flat=True)))
+        self.assertEqual(Invoice.objects.count(), 3)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from finance.models import OrderReceipt
+from finance.services.receipts import ensure_receipt, receipt_hash, render_receipt
+from orders.models import Order, OrderStatus
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch("finance.services.receipts.generate_order_receipt_pdf", return_value=b"%PDF-1.4 receipt")
+class OrderReceiptTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.order = Order.objects.create(
+            number="000001",
+            address="Test address",
+            start_dt=timezone.now(),
+            status=OrderStatus.COMPLETED,
+            total_amount=Decimal("100.00"),
+        )
+
+    def test_stored_receipt_is_reused(self, generate):
+        first = ensure_receipt(self.order)
+        second = ensure_receipt(self.order)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(generate.call_count, 1)
+
+    def test_snapshot_change_regenerates_and_removes_previous_file(self, generate):
+        first = ensure_receipt(self.order)
+        previous_name = first.pdf_file.name
+        storage = first.pdf_file.storage
+
+        self.order.total_amount = Decimal("150.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            second = ensure_receipt(self.order)
+
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(OrderReceipt.objects.count(), 1)
+        self.assertEqual(second.snapshot_hash, receipt_hash(self.order))
+        self.assertNotEqual(second.pdf_file.name, previous_name)
+        self.assertFalse(storage.exists(previous_name))
+        self.assertTrue(storage.exists(second.pdf_file.name))
+
+    def test_receipt_stored_concurrently_is_returned(self, generate):
+        stored = render_receipt(self.order)
+
+        # Второй процесс построил PDF по тому же снимку, пока первый сохранял чек
+        again = render_receipt(self.order)
+
+        self.assertEqual(again.pk, stored.pk)
+        self.assertEqual(again.pdf_file.name, stored.pdf_file.name)
+        self.assertEqual(OrderReceipt.objects.count(), 1)
+
+    def test_receipt_endpoint_returns_304_for_matching_etag(self, generate):
+        manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        api = APIClient()
+        api.force_authenticate(manager)
+        url = f"/api/v1/orders/{self.order.id}/receipt/"
+
+        response = api.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{receipt_hash(self.order)}"')
+
+        response = api.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(generate.call_count, 1)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from finance.services import report_cache
+
+
+class ReportCacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _key(self, day_from, day_to):
+        return report_cache.build_key("report:test", "params", report_cache.range_buckets(day_from, day_to))
+
+    def test_invalidation_only_touches_covering_ranges(self):
+        march = self._key(date(2024, 3, 1), date(2024, 3, 31))
+        first_quarter = self._key(date(2024, 1, 1), date(2024, 3, 31))
+        may = self._key(date(2024, 5, 1), date(2024, 5, 31))
+        open_range = self._key(None, None)
+
+        report_cache.invalidate_report_dates(date(2024, 3, 15))
+
+        self.assertNotEqual(self._key(date(2024, 3, 1), date(2024, 3, 31)), march)
+        self.assertNotEqual(self._key(date(2024, 1, 1), date(2024, 3, 31)), first_quarter)
+        self.assertNotEqual(self._key(None, None), open_range)
+        self.assertEqual(self._key(date(2024, 5, 1), date(2024, 5, 31)), may)
+
+    def test_clear_all_reports_changes_every_key(self):
+        may = self._key(date(2024, 5, 1), date(2024, 5, 31))
+        report_cache.clear_all_reports()
+        self.assertNotEqual(self._key(date(2024, 5, 1), date(2024, 5, 31)), may)
+
+    def test_historical_ranges_use_long_timeout(self):
+        self.assertEqual(
+            report_cache.range_timeout(date(2020, 1, 1), date(2020, 1, 31)), report_cache.historical_timeout()
+        )
+        self.assertEqual(report_cache.range_timeout(date(2020, 1, 1), None), report_cache.current_timeout())
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from catalog.models import Equipment, MaterialItem
+from crm.models import Client
+from finance.models import Expense, ReportDailyFact, SalaryRecord
+from finance.reports import summary_report
+from finance.services.facts import fact_day, refresh_order_facts, remove_order_facts
+from orders.models import Order, OrderItem, OrderStatus
+from users.models import User
+
+
+class ReportFactsTests(TestCase):
+    def setUp(self):
+        self.client_obj = Client.objects.create(name="ACME", phone="+1000000000")
+        self.operator = User.objects.create_user(username="operator", password="pass", role="operator")
+        self.equipment = Equipment.objects.create(code="EQ-1", name="Excavator", hourly_rate=Decimal("100.00"))
+        self.soil = MaterialItem.objects.create(name="Sand", price=Decimal("50.00"))
+
+    def _create_completed_order(self, number: str = "000001") -> Order:
+        order = Order.objects.create(
+            number=number,
+            client=self.client_obj,
+            address="Test address",
+            start_dt=timezone.now() - timedelta(hours=4),
+            end_dt=timezone.now(),
+            status=OrderStatus.COMPLETED,
+            total_amount=Decimal("2300.00"),
+        )
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.EQUIPMENT,
+            ref_id=self.equipment.id,
+            name_snapshot="Excavator",
+            unit_price=Decimal("100.00"),
+            quantity=Decimal("3"),
+            metadata={"shifts": 1, "hours": 2, "daily_rate": 800},
+        )
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.MATERIAL,
+            ref_id=self.soil.id,
+            name_snapshot="Sand",
+            unit_price=Decimal("50.00"),
+            quantity=Decimal("4"),
+        )
+        OrderItem.objects.create(
+            order=order,
+            item_type=OrderItem.ItemType.SERVICE,
+            name_snapshot="Work",
+            unit_price=Decimal("1100.00"),
+            quantity=Decimal("1"),
+        )
+        Expense.objects.create(order=order, category="fuel", amount=Decimal("150.00"), date=timezone.now().date())
+        SalaryRecord.objects.create(order=order, user=self.operator, amount=Decimal("500.00"))
+        return order
+
+    def test_summary_report_reads_daily_facts(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+
+        report = summary_report(None, None)
+        self.assertEqual(report["orders_count"], 1)
+        self.assertEqual(Decimal(report["revenue"]), Decimal("2300.00"))
+        # 1 смена * 800 + 2 ч * 100
+        self.assertEqual(Decimal(report["revenue_from_equipment"]), Decimal("1000.00"))
+        # услуга 1100 + грунт 4 * 50
+        self.assertEqual(Decimal(report["revenue_from_services"]), Decimal("1300.00"))
+        self.assertEqual(Decimal(report["expenses_fuel"]), Decimal("150.00"))
+        self.assertEqual(Decimal(report["salaries"]), Decimal("500.00"))
+        self.assertEqual(Decimal(report["margin"]), Decimal("1650.00"))
+
+    def test_unattached_expenses_only_counted_for_period(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+        today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(category="rent", amount=Decimal("300.00"), date=today)
+
+        self.assertEqual(Decimal(summary_report(None, None)["expenses"]), Decimal("150.00"))
+        period_report = summary_report(today.isoformat(), today.isoformat())
+        self.assertEqual(Decimal(period_report["expenses"]), Decimal("450.00"))
+
+    def test_removed_order_leaves_report(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+        remove_order_facts(order)
+        order.delete()
+
+        self.assertFalse(ReportDailyFact.objects.exists())
+        self.assertEqual(summary_report(None, None)["orders_count"], 0)
+
+    def test_order_expense_refreshes_order_facts(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(order=order, category="repair", amount=Decimal("50.00"), date=timezone.localdate())
+
+        fact = ReportDailyFact.objects.get()
+        self.assertEqual(fact.expenses, Decimal("200.00"))
+        self.assertEqual(fact.expenses_repair, Decimal("50.00"))
+        self.assertEqual(fact.unattached_expenses, Decimal("0.00"))
+
+    def test_api_delete_removes_order_facts(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+        manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        api = APIClient()
+        api.force_authenticate(manager)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api.delete(f"/api/v1/orders/{order.id}/")
+
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertFalse(ReportDailyFact.objects.exists())
+        self.assertFalse(Expense.objects.exists())
+
+    def test_moved_expense_refreshes_previous_order(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+        expense = Expense.objects.get(order=order)
+        yesterday = timezone.localdate() - timedelta(days=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.order = None
+            expense.date = yesterday
+            expense.save()
+
+        self.assertEqual(ReportDailyFact.objects.get(day=fact_day(order)).expenses, Decimal("0.00"))
+        self.assertEqual(ReportDailyFact.objects.get(day=yesterday).unattached_expenses, Decimal("150.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.date = timezone.localdate()
+            expense.save()
+
+        self.assertFalse(ReportDailyFact.objects.filter(day=yesterday).exists())
+
+    def test_salary_changes_refresh_order_facts(self):
+        order = self._create_completed_order()
+        refresh_order_facts(order)
+        salary = SalaryRecord.objects.get(order=order)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            salary.amount = Decimal("700.00")
+            salary.save()
+        self.assertEqual(Decimal(summary_report(None, None)["salaries"]), Decimal("700.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            salary.delete()
+        self.assertEqual(Decimal(summary_report(None, None)["salaries"]), Decimal("0.00"))
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from datetime import date
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase
+
+from finance.api import EquipmentReportView
+from finance.services import report_cache
+
+
+class StaleWhileRevalidateTests(TestCase):
+    path = "/api/v1/reports/equipment/"
+
+    def setUp(self):
+        cache.clear()
+        self.params = QueryDict("from=2024-01-01&to=2024-01-31")
+        self.view = EquipmentReportView()
+
+    def test_miss_generates_once_and_then_hits(self):
+        with mock.patch.object(EquipmentReportView, "generate_data", return_value=[{"v": 1}]) as generate:
+            self.assertEqual(self.view.get_report_data(self.path, self.params), [{"v": 1}])
+            self.assertEqual(self.view.get_report_data(self.path, self.params), [{"v": 1}])
+        self.assertEqual(generate.call_count, 1)
+
+    def test_invalidated_entry_is_served_stale_and_regenerated_once(self):
+        with mock.patch.object(EquipmentReportView, "generate_data", return_value=[{"v": 1}]):
+            self.view.get_report_data(self.path, self.params)
+        report_cache.invalidate_report_dates(date(2024, 1, 10))
+
+        with mock.patch("finance.tasks.regenerate_report.delay") as delay, mock.patch.object(
+            EquipmentReportView, "generate_data", return_value=[{"v": 2}]
+        ) as generate:
+            self.assertEqual(self.view.get_report_data(self.path, self.params), [{"v": 1}])
+            self.assertEqual(self.view.get_report_data(self.path, self.params), [{"v": 1}])
+        generate.assert_not_called()
+        self.assertEqual(delay.call_count, 1)
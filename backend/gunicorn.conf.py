@@ -0,0 +1,26 @@
+"""
+Настройки gunicorn, общие для всех запусков (gunicorn читает ./gunicorn.conf.py сам).
+
+Параметры командной строки (bind, workers, timeout) по-прежнему задаются в
+Dockerfile и docker-compose; здесь - только хуки мультипроцессных метрик
+Prometheus. Мастер-процесс не импортирует Django: метрики пишут только воркеры.
+"""
+import os
+from pathlib import Path
+
+
+def on_starting(server):
+    """Каталог PROMETHEUS_MULTIPROC_DIR очищается до запуска воркеров."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        for stale in directory.glob("*.db"):
+            stale.unlink(missing_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,199 @@
+"""
+Push-события заказов через Server-Sent Events.
+
+События публикуются после коммита транзакции в брокер: Redis pub/sub в
+продакшене (несколько воркеров ASGI) или in-memory брокер процесса для тестов
+и локальной разработки. Поток SSE фильтрует события по роли так же, как
+OrderViewSet.get_queryset.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, AsyncIterator, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+ORDER_COMPLETED = "order.completed"
+ORDER_DELETED = "order.deleted"
+
+
+def _config() -> dict:
+    return getattr(settings, "REALTIME", {})
+
+
+def channel_name() -> str:
+    return _config().get("channel", "ringo:orders")
+
+
+class InMemoryBroker:
+    """Брокер в пределах процесса: публикация из любого потока, подписка из event loop."""
+
+    class Subscription:
+        def __init__(self, broker: "InMemoryBroker"):
+            self.broker = broker
+            self.loop = asyncio.get_running_loop()
+            self.queue: asyncio.Queue[str] = asyncio.Queue()
+
+        async def get(self) -> str:
+            return await self.queue.get()
+
+        async def close(self) -> None:
+            with self.broker._lock:
+                self.broker._subscribers.discard(self)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: set[InMemoryBroker.Subscription] = set()
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.queue.put_nowait, message)
+
+    async def subscribe(self, channel: str) -> "InMemoryBroker.Subscription":
+        subscription = self.Subscription(self)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+
+class RedisBroker:
+    """Fan-out через Redis pub/sub между процессами и серверами."""
+
+    class Subscription:
+        def __init__(self, client, pubsub):
+            self.client = client
+            self.pubsub = pubsub
+
+        async def get(self) -> str:
+            while True:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+                if message and message.get("type") == "message":
+                    data = message["data"]
+                    return data.decode() if isinstance(data, bytes) else data
+
+        async def close(self) -> None:
+            await self.pubsub.close()
+            await self.client.close()
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    def publish(self, channel: str, message: str) -> None:
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> "RedisBroker.Subscription":
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        return self.Subscription(client, pubsub)
+
+
+_broker: InMemoryBroker | RedisBroker | None = None
+
+
+def get_broker() -> InMemoryBroker | RedisBroker:
+    global _broker
+    if _broker is None:
+        config = _config()
+        if config.get("backend", "redis") == "memory":
+            _broker = InMemoryBroker()
+        else:
+            _broker = RedisBroker(config.get("url") or settings.CELERY_BROKER_URL)
+    return _broker
+
+
+def reset_broker() -> None:
+    """Сбрасывает брокер (после изменения settings.REALTIME, например в тестах)."""
+    global _broker
+    _broker = None
+
+
+def order_operator_ids(order) -> list[int]:
+    ids = {user_id for user_id in order.operators.values_list("id", flat=True)}
+    if order.operator_id:
+        ids.add(order.operator_id)
+    return sorted(ids)
+
+
+def build_order_event(order, event_type: str, operator_ids: Iterable[int] | None = None) -> dict[str, Any]:
+    """Компактное событие: клиенту достаточно id и статуса, детали он догружает сам."""
+    return {
+        "type": event_type,
+        "order": {
+            "id": str(order.pk),
+            "number": order.number,
+            "status": order.status,
+            "updated_at": (order.updated_at or timezone.now()).isoformat(),
+        },
+        "operator_ids": list(operator_ids if operator_ids is not None else order_operator_ids(order)),
+    }
+
+
+def publish_order_event(order, event_type: str, operator_ids: Iterable[int] | None = None) -> None:
+    """Публикует событие после коммита текущей транзакции (при откате событие не уходит)."""
+    message = json.dumps(build_order_event(order, event_type, operator_ids), ensure_ascii=False)
+    # После delete() у заказа нет pk: id запоминаем до коммита
+    order_id = order.pk
+
+    def publish() -> None:
+        try:
+            get_broker().publish(channel_name(), message)
+        except Exception as exc:  # noqa: BLE001 - push не должен ломать бизнес-операцию
+            logger.warning("Failed to publish %s for order %s: %s", event_type, order_id, exc)
+
+    transaction.on_commit(publish)
+
+
+def can_receive(user, event: dict[str, Any]) -> bool:
+    """Те же правила видимости, что и в OrderViewSet.get_queryset."""
+    if getattr(user, "is_superuser", False) or getattr(user, "role", None) in ("admin", "manager"):
+        return True
+    if getattr(user, "role", None) == "operator":
+        return user.id in event.get("operator_ids", ())
+    return False
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    payload = {key: value for key, value in event.items() if key != "operator_ids"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def stream_order_events(user, keepalive: float | None = None) -> AsyncIterator[str]:
+    """Поток SSE для пользователя: события заказов и комментарии keepalive."""
+    keepalive = keepalive or float(_config().get("keepalive_seconds", 15))
+    subscription = await get_broker().subscribe(channel_name())
+    try:
+        yield f"retry: {int(_config().get('retry_ms', 5000))}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            try:
+                event = json.loads(message)
+            except (TypeError, ValueError):
+                logger.warning("Skipping malformed realtime message: %r", message)
+                continue
+            if can_receive(user, event):
+                yield format_sse(event)
+    finally:
+        await subscription.close()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from notifications.services import realtime
+from orders.models import Order
+from users.models import User
+
+MEMORY_REALTIME = {"backend": "memory", "channel": "test:orders", "keepalive_seconds": 1, "retry_ms": 1000}
+
+
+def _event(order_id: str, operator_ids: list[int]) -> str:
+    return json.dumps(
+        {"type": realtime.ORDER_STATUS_CHANGED, "order": {"id": order_id, "status": "APPROVED"}, "operator_ids": operator_ids}
+    )
+
+
+@override_settings(REALTIME=MEMORY_REALTIME)
+class OrderEventStreamTests(SimpleTestCase):
+    def setUp(self):
+        realtime.reset_broker()
+        self.addCleanup(realtime.reset_broker)
+
+    def _receive(self, user, *messages: str) -> list[str]:
+        async def scenario():
+            stream = realtime.stream_order_events(user)
+            chunks = [await stream.__anext__()]
+            for message in messages:
+                realtime.get_broker().publish(realtime.channel_name(), message)
+            chunks.append(await asyncio.wait_for(stream.__anext__(), timeout=2))
+            await stream.aclose()
+            return chunks
+
+        return asyncio.run(scenario())
+
+    def test_operator_receives_only_own_orders(self):
+        operator = SimpleNamespace(id=7, role="operator", is_superuser=False)
+        retry, event = self._receive(operator, _event("foreign", [8]), _event("own", [7]))
+
+        self.assertEqual(retry, "retry: 1000\n\n")
+        self.assertIn("event: order.status_changed", event)
+        payload = json.loads(event.split("data: ", 1)[1])
+        self.assertEqual(payload["order"]["id"], "own")
+        self.assertNotIn("operator_ids", payload)
+
+    def test_manager_receives_every_order(self):
+        manager = SimpleNamespace(id=1, role="manager", is_superuser=False)
+        _, event = self._receive(manager, _event("foreign", [8]))
+
+        self.assertIn('"foreign"', event)
+
+
+class PublishOrderEventTests(TestCase):
+    def test_event_is_published_after_commit_with_operator_audience(self):
+        operator = User.objects.create_user(username="operator", password="pass", role="operator")
+        order = Order.objects.create(number="000001", address="Test address", start_dt=timezone.now())
+        order.operators.set([operator])
+        broker = mock.Mock()
+
+        with mock.patch.object(realtime, "get_broker", return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                realtime.publish_order_event(order, realtime.ORDER_CREATED)
+                broker.publish.assert_not_called()
+
+        message = json.loads(broker.publish.call_args.args[1])
+        self.assertEqual(message["type"], "order.created")
+        self.assertEqual(message["operator_ids"], [operator.id])
@@ -7,6 +7,7 @@ from notifications.views import (
     DeviceTokenViewSet,
     NotificationPreferenceViewSet,
     NotificationSubscriptionViewSet,
+    order_events_stream,
 )
 
 router = DefaultRouter()
@@ -14,5 +15,8 @@ router.register(r"device-tokens", DeviceTokenViewSet, basename="device-token")
 router.register(r"subscriptions", NotificationSubscriptionViewSet, basename="subscription")
 router.register(r"preferences", NotificationPreferenceViewSet, basename="preference")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("stream/", order_events_stream, name="order-events-stream"),
+    *router.urls,
+]
 
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -12,6 +15,7 @@ from notifications.serializers import (
     NotificationPreferenceSerializer,
     NotificationSubscriptionSerializer,
 )
+from notifications.services.realtime import stream_order_events
 
 
 class DeviceTokenViewSet(ModelViewSet):
@@ -103,3 +107,37 @@ class NotificationPreferenceViewSet(ViewSet):
             ]
         )
 
+
+def _authenticate_stream(request):
+    """
+    Пользователь по JWT из заголовка Authorization или параметра token.
+
+    EventSource в браузере не умеет передавать заголовки, поэтому токен допускается в query.
+    """
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get("token", "").encode()
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+
+
+async def order_events_stream(request):
+    """SSE-поток событий заказов (создание, смена статуса, завершение, удаление)."""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Поток событий доступен только через ASGI (ringo_backend.asgi)"}, status=501)
+    user = await sync_to_async(_authenticate_stream)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Требуется аутентификация"}, status=401)
+
+    response = StreamingHttpResponse(stream_order_events(user), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx не должен буферизовать поток
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -8,6 +8,7 @@ from django.contrib import admin, messages
 from django.http import HttpResponse
 
 from finance.models import Invoice
+from finance.tasks import generate_invoice_pdfs
 from .models import Order, OrderItem, OrderStatus, OrderStatusLog, PhotoEvidence
 
 
@@ -89,12 +90,12 @@ class OrderAdmin(admin.ModelAdmin):
 
     @admin.action(description="Сгенерировать PDF для выбранных заказов")
     def generate_invoice_pdf(self, request, queryset):
-        generated = 0
+        invoice_ids = []
         for order in queryset:
-            invoice, _ = Invoice.objects.get_or_create(order=order, defaults={"number": f"INV-{order.number}"})
-            invoice.status = invoice.status or "sent"
-            invoice.pdf_url = invoice.pdf_url or f"https://example.com/invoices/{invoice.number}.pdf"
-            invoice.save()
-            generated += 1
-        self.message_user(request, f"Подготовлено {generated} PDF (заглушка)", messages.INFO)
+            invoice, _ = Invoice.objects.get_or_create(
+                order=order, defaults={"number": f"INV-{order.number}", "amount": order.total_amount}
+            )
+            invoice_ids.append(invoice.id)
+        generate_invoice_pdfs.delay(invoice_ids)
+        self.message_user(request, f"Поставлено в очередь {len(invoice_ids)} PDF", messages.INFO)
 
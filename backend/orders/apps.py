@@ -8,3 +8,6 @@ class OrdersConfig(AppConfig):
     name = "orders"
     verbose_name = "Orders"
 
+    def ready(self):
+        """Подключение сигналов при инициализации приложения"""
+        import orders.signals  # noqa: F401
@@ -0,0 +1,84 @@
+"""
+Замер списка заявок оператора при росте числа заказов.
+Использование: python manage.py benchmark_order_visibility --sizes 1000 10000 50000 [--page-size 20]
+
+Для каждого размера добавляет заказы (каждый десятый назначен оператору),
+прогоняет первую страницу списка оператора через тот же queryset, что и
+OrderViewSet, и печатает медиану времени. Все данные создаются в транзакции,
+которая откатывается в конце, поэтому команду можно запускать на копии
+рабочей БД. При исправных индексах время страницы почти не зависит от размера.
+"""
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderStatus
+from orders.services.visibility import visible_orders
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Замерить время списка заявок оператора при разном числе заказов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Число заказов")
+        parser.add_argument("--page-size", type=int, default=20, help="Размер страницы списка")
+        parser.add_argument("--repeat", type=int, default=20, help="Повторов на каждый размер")
+        parser.add_argument("--explain", action="store_true", help="Вывести план запроса для наибольшего размера")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        suffix = uuid.uuid4().hex[:8]
+        operator = User.objects.create_user(username=f"bench-operator-{suffix}", password=None, role="operator")
+        other = User.objects.create_user(username=f"bench-other-{suffix}", password=None, role="operator")
+        through = Order.operators.through
+        statuses = [OrderStatus.CREATED, OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED]
+        created = 0
+
+        for size in sorted(options["sizes"]):
+            orders = [
+                Order(
+                    number=f"B{suffix}-{index}",
+                    address="Benchmark",
+                    start_dt=timezone.now(),
+                    status=statuses[index % len(statuses)],
+                )
+                for index in range(created, size)
+            ]
+            Order.objects.bulk_create(orders, batch_size=1000)
+            through.objects.bulk_create(
+                [
+                    through(order_id=order.pk, user_id=(operator if index % 10 == 0 else other).pk)
+                    for index, order in enumerate(orders, start=created)
+                ],
+                batch_size=1000,
+            )
+            created = max(created, size)
+
+            queryset = visible_orders(Order.objects.order_by("-created_at"), operator)
+            queryset = queryset.filter(status=OrderStatus.IN_PROGRESS)
+            timings = []
+            for _ in range(max(options["repeat"], 1)):
+                started = time.perf_counter()
+                list(queryset[: options["page_size"]])
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f"{size:>8} заказов: медиана {statistics.median(timings):.2f} мс, max {max(timings):.2f} мс")
+
+        if options["explain"]:
+            self.stdout.write(queryset[: options["page_size"]].explain())
+        self.stdout.write(f"СУБД: {connection.vendor}; данные замера откатываются")
@@ -0,0 +1,65 @@
+"""
+Пересчёт снимков стоимости заказов (price_snapshot, total_amount) текущим движком расчёта.
+Использование: python manage.py reprice_orders --from 2025-01-01 --to 2025-01-31 [--status completed]
+
+Пересчитываются только заказы с позициями: итог считается по номенклатуре,
+как при завершении заявки. Цены позиций берутся из заказа (unit_price и
+metadata), ставки каталога не перечитываются — меняются только правила
+расчёта (ENGINE_VERSION, PricingConfig). Показатели отчётов завершённых заказов и кэш
+отчётов за затронутые дни обновляются.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from finance.reports import filter_range
+from finance.services.facts import refresh_orders_facts
+from finance.services.report_cache import invalidate_report_dates
+from orders.models import Order, OrderItem, OrderStatus
+from orders.services.pricing import ENGINE_VERSION, PricingConfig, reprice_orders
+
+
+class Command(BaseCommand):
+    help = "Пересчитать снимки стоимости заказов за период текущим движком расчёта (цены позиций из заказа)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="Дата создания заказа от (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Дата создания заказа до (YYYY-MM-DD, включительно)")
+        parser.add_argument(
+            "--status", action="append", choices=OrderStatus.values, help="Статус заказа (можно указать несколько раз)"
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Заказов в одной пачке")
+
+    def handle(self, *args, **options):
+        orders = filter_range(
+            Order.objects.filter(Exists(OrderItem.objects.filter(order=OuterRef("pk")))),
+            "created_at",
+            options["date_from"],
+            options["date_to"],
+        )
+        if options["status"]:
+            orders = orders.filter(status__in=options["status"])
+
+        config = PricingConfig.current()
+        total = orders.count()
+        self.stdout.write(f"Заказов к пересчёту: {total} (engine {ENGINE_VERSION}, config {config.version})")
+
+        batch_size = max(options["batch_size"], 1)
+        done = 0
+        last_pk = None
+        while True:
+            page = orders.order_by("pk")
+            if last_pk is not None:
+                page = page.filter(pk__gt=last_pk)
+            batch = list(page[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                reprice_orders(batch, config=config)
+                days = refresh_orders_facts(order for order in batch if order.status == OrderStatus.COMPLETED)
+            invalidate_report_dates(*days)
+            last_pk = batch[-1].pk
+            done += len(batch)
+            self.stdout.write(f"  {done}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано заказов: {done}"))
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_alter_order_status_alter_orderstatuslog_from_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='orders_order_sync_idx'),
+        ),
+        migrations.CreateModel(
+            name='OrderTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.UUIDField(help_text='ID удалённого заказа', verbose_name='ID заказа')),
+                ('number', models.CharField(blank=True, help_text='Номер удалённого заказа', max_length=32, verbose_name='Номер заказа')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, help_text='Дата и время удаления', verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый заказ',
+                'verbose_name_plural': 'Удалённые заказы',
+                'indexes': [models.Index(fields=['deleted_at', 'order_id'], name='orders_tomb_sync_idx')],
+            },
+        ),
+    ]
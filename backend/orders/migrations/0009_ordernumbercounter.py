@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+DEFAULT_SERIES = 'default'
+
+
+def seed_counter(apps, schema_editor):
+    """Продолжаем нумерацию с наибольшего числового номера существующих заказов."""
+    Order = apps.get_model('orders', 'Order')
+    OrderNumberCounter = apps.get_model('orders', 'OrderNumberCounter')
+    numbers = Order.objects.using(schema_editor.connection.alias).values_list('number', flat=True).iterator()
+    last = max((int(number) for number in numbers if number and number.isdigit()), default=0)
+    OrderNumberCounter.objects.using(schema_editor.connection.alias).update_or_create(
+        key=DEFAULT_SERIES, defaults={'value': last}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('key', models.CharField(help_text='Серия номеров (default или год)', max_length=16, primary_key=True, serialize=False, verbose_name='Серия')),
+                ('value', models.PositiveBigIntegerField(default=0, help_text='Последний выданный номер серии', verbose_name='Последний номер')),
+            ],
+            options={
+                'verbose_name': 'Счётчик номеров заказов',
+                'verbose_name_plural': 'Счётчики номеров заказов',
+            },
+        ),
+        migrations.RunPython(seed_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+# Таблица связи operators создаётся Django автоматически, поэтому индекс
+# (user_id, order_id) для EXISTS по оператору добавляется SQL-ом.
+OPERATORS_INDEX = "orders_order_operators_user_order_idx"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_ordernumbercounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='orders_order_status_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at'], name='orders_order_created_idx'),
+        ),
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {OPERATORS_INDEX} ON orders_order_operators (user_id, order_id);',
+            reverse_sql=f'DROP INDEX IF EXISTS {OPERATORS_INDEX};',
+        ),
+    ]
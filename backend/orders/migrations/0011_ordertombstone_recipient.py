@@ -0,0 +1,23 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0010_order_visibility_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordertombstone',
+            name='recipient',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Оператор, у которого заказ пропал из выборки; пусто — для полного доступа', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Получатель'),
+        ),
+        migrations.AddIndex(
+            model_name='ordertombstone',
+            index=models.Index(fields=['recipient', 'deleted_at', 'order_id'], name='orders_tomb_recipient_idx'),
+        ),
+    ]
@@ -113,12 +113,66 @@ class Order(TimeStampedModel):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["start_dt"]),
+            # Список заявок: фильтр по статусу с сортировкой по дате создания
+            models.Index(fields=["status", "-created_at"], name="orders_order_status_crt_idx"),
+            models.Index(fields=["-created_at"], name="orders_order_created_idx"),
+            # Курсор синхронизации (orders/changes/)
+            models.Index(fields=["updated_at", "id"], name="orders_order_sync_idx"),
         ]
 
     def __str__(self) -> str:
         return f"Заказ {self.number}"
 
 
+class OrderTombstone(models.Model):
+    """
+    Отметка об удалённом заказе для дельта-синхронизации клиентов.
+
+    Без получателя — удаление для ролей с полным доступом. С получателем —
+    заказ пропал из выборки этого оператора: удалён или снят с назначения.
+    """
+
+    order_id = models.UUIDField(verbose_name="ID заказа", help_text="ID удалённого заказа")
+    number = models.CharField(max_length=32, blank=True, verbose_name="Номер заказа", help_text="Номер удалённого заказа")
+    # Без ограничения FK: отметка может ссылаться на пользователя, удаляемого тем же каскадом
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Получатель",
+        help_text="Оператор, у которого заказ пропал из выборки; пусто — для полного доступа",
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата удаления", help_text="Дата и время удаления")
+
+    class Meta:
+        verbose_name = "Удалённый заказ"
+        verbose_name_plural = "Удалённые заказы"
+        indexes = [
+            models.Index(fields=["deleted_at", "order_id"], name="orders_tomb_sync_idx"),
+            models.Index(fields=["recipient", "deleted_at", "order_id"], name="orders_tomb_recipient_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Удалён заказ {self.number or self.order_id}"
+
+
+class OrderNumberCounter(models.Model):
+    """Счётчик номеров заказов (одна строка на серию: общая или по году)."""
+
+    key = models.CharField(max_length=16, primary_key=True, verbose_name="Серия", help_text="Серия номеров (default или год)")
+    value = models.PositiveBigIntegerField(default=0, verbose_name="Последний номер", help_text="Последний выданный номер серии")
+
+    class Meta:
+        verbose_name = "Счётчик номеров заказов"
+        verbose_name_plural = "Счётчики номеров заказов"
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.value}"
+
+
 class OrderItem(TimeStampedModel):
     class ItemType(models.TextChoices):
         EQUIPMENT = "equipment", "Техника"
@@ -9,12 +9,15 @@ from django.utils import timezone
 from drf_spectacular.utils import extend_schema_field, extend_schema_serializer
 from rest_framework import serializers
 
-from catalog.models import Equipment
 from crm.models import Client
 from users.models import User
 
 from .models import Order, OrderItem, OrderStatus, OrderStatusLog, PhotoEvidence
-from .services.pricing import calculate_order_total, _get_duration_hours, _round_half_hour
+from .services.items import create_order_items, missing_equipment_ids
+from .services.line_totals import calculate_line_total
+from .services.numbering import next_order_number
+from .services.preview import preview_snapshot
+from .services.pricing import calculate_order_total
 
 logger = logging.getLogger(__name__)
 
@@ -100,41 +103,39 @@ class OrderItemSerializer(serializers.ModelSerializer):
     
     def get_line_total(self, obj) -> Decimal:
         """Рассчитывает итоговую стоимость позиции с учетом смен, часов и скидки."""
-        metadata = obj.metadata or {}
-        discount = Decimal(str(obj.discount or 0))
-        tax_rate = Decimal(str(obj.tax_rate or 0))
-        
-        if obj.item_type == OrderItem.ItemType.EQUIPMENT:
-            shifts = Decimal(str(metadata.get("shifts", 0) or 0))
-            hours = Decimal(str(metadata.get("hours", 0) or 0))
-            daily_rate = Decimal(str(metadata.get("daily_rate", 0) or 0))
-            hourly_rate = Decimal(str(obj.unit_price or 0))
-            
-            # Рассчитываем стоимость: смены * daily_rate + часы * hourly_rate
-            shifts_cost = shifts * daily_rate if daily_rate > 0 else Decimal("0")
-            hours_cost = hours * hourly_rate
-            total_cost = shifts_cost + hours_cost
-            
-            # Применяем скидку (процент)
-            discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-            line_total = total_cost - discount_amount
-            
-            # Применяем налог
-            tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
-            return line_total + tax_amount
-        else:
-            # Для других типов позиций
-            quantity = Decimal(str(obj.quantity or 0))
-            unit_price = Decimal(str(obj.unit_price or 0))
-            total_cost = unit_price * quantity
-            
-            # Применяем скидку (процент)
-            discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-            line_total = total_cost - discount_amount
-            
-            # Применяем налог
-            tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
-            return line_total + tax_amount
+        return calculate_line_total(obj)
+
+
+def _user_brief(user: User) -> dict[str, Any]:
+    return {
+        "id": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "phone": user.phone,
+    }
+
+
+def _represent_relations(instance: Order, representation: dict[str, Any]) -> None:
+    """
+    Сериализует клиента, менеджера и оператора заказа.
+
+    Операторы читаются через all(), поэтому используют prefetch_related("operators")
+    и не порождают запросов на каждый заказ.
+    """
+    if instance.client:
+        representation["client"] = {
+            "id": instance.client.id,
+            "name": instance.client.name,
+            "phone": instance.client.phone,
+        }
+    if instance.manager:
+        representation["manager"] = _user_brief(instance.manager)
+    # Для обратной совместимости оставляем operator (первый из operators или старый operator)
+    operators = list(instance.operators.all())
+    if operators:
+        representation["operator"] = _user_brief(operators[0])
+    elif instance.operator:
+        representation["operator"] = _user_brief(instance.operator)
 
 
 @extend_schema_serializer(
@@ -225,50 +226,12 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def get_operators(self, obj):
         """Возвращает список операторов заказа."""
-        operators = obj.operators.all()
-        return [
-            {
-                "id": op.id,
-                "first_name": op.first_name,
-                "last_name": op.last_name,
-                "phone": op.phone,
-            }
-            for op in operators
-        ]
+        return [_user_brief(op) for op in obj.operators.all()]
     
     def to_representation(self, instance):
         """Переопределяем для правильной сериализации связанных объектов."""
         representation = super().to_representation(instance)
-        # Сериализуем связанные объекты
-        if instance.client:
-            representation["client"] = {
-                "id": instance.client.id,
-                "name": instance.client.name,
-                "phone": instance.client.phone,
-            }
-        if instance.manager:
-            representation["manager"] = {
-                "id": instance.manager.id,
-                "first_name": instance.manager.first_name,
-                "last_name": instance.manager.last_name,
-                "phone": instance.manager.phone,
-            }
-        # Для обратной совместимости оставляем operator (первый из operators или старый operator)
-        if instance.operators.exists():
-            first_operator = instance.operators.first()
-            representation["operator"] = {
-                "id": first_operator.id,
-                "first_name": first_operator.first_name,
-                "last_name": first_operator.last_name,
-                "phone": first_operator.phone,
-            }
-        elif instance.operator:
-            representation["operator"] = {
-                "id": instance.operator.id,
-                "first_name": instance.operator.first_name,
-                "last_name": instance.operator.last_name,
-                "phone": instance.operator.phone,
-            }
+        _represent_relations(instance, representation)
         return representation
 
     def validate_status(self, value: str) -> str:
@@ -284,11 +247,9 @@ class OrderSerializer(serializers.ModelSerializer):
         # Пустой список означает "удалить все items", а None означает "не трогать items"
         if isinstance(value, list) and len(value) == 0:
             return []  # Возвращаем пустой список как есть, чтобы отличить от None
-        # Валидируем только если есть элементы
-        for item in value:
-            if item["item_type"] == OrderItem.ItemType.EQUIPMENT and item.get("ref_id"):
-                if not Equipment.objects.filter(id=item["ref_id"]).exists():
-                    raise serializers.ValidationError("Equipment item not found")
+        # Валидируем только если есть элементы (вся техника проверяется одним запросом)
+        if missing_equipment_ids(value):
+            raise serializers.ValidationError("Equipment item not found")
         return value
 
     def create(self, validated_data: dict[str, Any]) -> Order:
@@ -350,7 +311,7 @@ class OrderSerializer(serializers.ModelSerializer):
                 # По умолчанию 0
                 order.total_amount = Decimal("0.00")
                 logger.info("Creating order with default total: 0.00")
-            order.save(update_fields=["total_amount"])
+            order.save(update_fields=["total_amount", "price_snapshot", "updated_at"])
             logger.info(f"Order created successfully: {order.id}")
             return order
         except Exception as e:
@@ -421,6 +382,7 @@ class OrderSerializer(serializers.ModelSerializer):
                 if operators is not None:
                     instance.operators.set(operators)
                 
+                update_fields = ["total_amount", "updated_at"]
                 # Обновляем items если они переданы
                 if items_data is not None and len(items_data) > 0:
                     # Сохраняем стоимость существующих items перед удалением
@@ -439,6 +401,7 @@ class OrderSerializer(serializers.ModelSerializer):
                     # Считаем только по номенклатуре, независимо от того, была ли примерная стоимость
                     instance.total_amount = new_items_total
                     logger.info(f"Adding nomenclature: removing estimated cost, using only items cost: {new_items_total}")
+                    update_fields.append("price_snapshot")
                 elif items_data is not None and len(items_data) == 0:
                     # Если передан пустой список items - удаляем все items, но сохраняем примерную стоимость
                     existing_items_total = calculate_order_total(instance) or Decimal("0.00")
@@ -489,7 +452,7 @@ class OrderSerializer(serializers.ModelSerializer):
                         instance.total_amount = existing_items_total
                         logger.info(f"Recalculating total from existing items: {instance.total_amount}")
                 
-                instance.save(update_fields=["total_amount"])
+                instance.save(update_fields=update_fields)
             logger.info(f"Order {instance.id} updated successfully")
             return instance
         except Exception as e:
@@ -499,93 +462,58 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def _upsert_items(self, order: Order, items_data: list[dict[str, Any]]) -> None:
         """Создает позиции заказа, правильно обрабатывая смены и часы для техники."""
-        for item in items_data:
-            item_data = item.copy()
-            # Для техники используем metadata с shifts и hours, если они указаны
-            if item_data.get("item_type") == OrderItem.ItemType.EQUIPMENT:
-                metadata = item_data.get("metadata", {})
-                if not isinstance(metadata, dict):
-                    metadata = {}
-                
-                shifts = Decimal(str(metadata.get("shifts", 0) or 0))
-                hours = Decimal(str(metadata.get("hours", 0) or 0))
-                
-                # Если указаны смены или часы в metadata, используем их
-                if shifts > 0 or hours > 0:
-                    # Получаем Equipment для получения daily_rate
-                    ref_id = item_data.get("ref_id")
-                    if ref_id:
-                        try:
-                            equipment = Equipment.objects.get(id=ref_id)
-                            # Сохраняем daily_rate в metadata если его там нет
-                            if "daily_rate" not in metadata and equipment.daily_rate:
-                                metadata["daily_rate"] = float(equipment.daily_rate)
-                            # Устанавливаем unit_price как hourly_rate
-                            item_data["unit_price"] = Decimal(str(equipment.hourly_rate or 0))
-                        except Equipment.DoesNotExist:
-                            logger.warning(f"Equipment with id {ref_id} not found")
-                    
-                    # Сохраняем shifts и hours в metadata
-                    metadata["shifts"] = float(shifts)
-                    metadata["hours"] = float(hours)
-                    item_data["metadata"] = metadata
-                    
-                    # quantity используется только для отображения, не для расчетов
-                    # Рассчитываем как сумму смен и часов для визуального представления
-                    quantity_for_display = shifts + hours
-                    item_data["quantity"] = Decimal(str(quantity_for_display))
-                    item_data["unit"] = "hour"  # Для совместимости
-                else:
-                    # Если нет metadata с shifts/hours, используем старую логику
-                    if order.start_dt and order.end_dt:
-                        duration_hours = _get_duration_hours(order)
-                        # Округляем до 0.5 часа
-                        item_data["quantity"] = _round_half_hour(duration_hours)
-                        item_data["unit"] = "hour"
-                    elif order.start_dt:
-                        # Если end_dt не указан, используем переданное quantity или 1
-                        item_data["quantity"] = item_data.get("quantity", Decimal("1.00"))
-                        item_data["unit"] = item_data.get("unit", "hour")
-            # Для услуг с billing_mode="per_hour" также рассчитываем из времени
-            elif item_data.get("item_type") == OrderItem.ItemType.SERVICE:
-                metadata = item_data.get("metadata", {})
-                if metadata.get("billing_mode") == "per_hour" and order.start_dt and order.end_dt:
-                    duration_hours = _get_duration_hours(order)
-                    item_data["quantity"] = _round_half_hour(duration_hours)
-            
-            OrderItem.objects.create(order=order, **item_data)
+        create_order_items(order, items_data)
 
     def _generate_order_number(self) -> str:
-        """Генерирует уникальный номер заявки, проверяя отсутствие дубликатов."""
-        max_attempts = 100  # Максимальное количество попыток для избежания бесконечного цикла
-        
-        for attempt in range(max_attempts):
-            # Получаем последнюю заявку по дате создания
-            last = Order.objects.order_by("-created_at").first()
-            next_seq = 1
-            
-            if last and last.number and last.number.isdigit():
-                next_seq = int(last.number) + 1
-            
-            # Генерируем номер
-            number = f"{next_seq:06d}"
-            
-            # Проверяем, существует ли уже заявка с таким номером
-            if not Order.objects.filter(number=number).exists():
-                logger.info(f"Generated unique order number: {number}")
-                return number
-            
-            # Если номер существует, пробуем следующий
-            logger.warning(f"Order number {number} already exists, trying next")
-            next_seq += 1
-        
-        # Если не удалось сгенерировать уникальный номер за 100 попыток,
-        # используем timestamp для гарантии уникальности
-        import time
-        timestamp = int(time.time())
-        fallback_number = f"{timestamp:010d}"[-6:]  # Последние 6 цифр timestamp
-        logger.warning(f"Could not generate sequential number, using fallback: {fallback_number}")
-        return fallback_number
+        """Выдаёт следующий номер заявки из счётчика в БД (без гонок и повторных попыток)."""
+        number = next_order_number()
+        logger.info(f"Generated unique order number: {number}")
+        return number
+
+
+class OrderListSerializer(serializers.ModelSerializer):
+    """
+    Компактное представление заказа для списка.
+
+    Без позиций, снимка расчёта и вложений; клиент, менеджер и операторы —
+    в том же кратком виде, что и в OrderSerializer. Рассчитан на queryset
+    с select_related("client", "manager", "operator") и prefetch_related("operators").
+    """
+
+    operators = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "number",
+            "client",
+            "address",
+            "geo_lat",
+            "geo_lng",
+            "start_dt",
+            "end_dt",
+            "description",
+            "status",
+            "manager",
+            "operator",
+            "operators",
+            "prepayment_amount",
+            "prepayment_status",
+            "total_amount",
+            "created_by",
+            "created_at",
+            "updated_at",
+        )
+        read_only_fields = fields
+
+    def get_operators(self, obj) -> list[dict[str, Any]]:
+        return [_user_brief(op) for op in obj.operators.all()]
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        _represent_relations(instance, representation)
+        return representation
 
 
 class OrderStatusSerializer(serializers.Serializer):
@@ -682,17 +610,19 @@ class OrderAttachmentSerializer(serializers.Serializer):
 
 class OrderPricePreviewSerializer(serializers.Serializer):
     items = OrderItemSerializer(many=True)
-
-    def create_snapshot(self) -> dict[str, Any]:
-        total = sum(
-            (
-                (item.get("unit_price") or 0)
-                * (item.get("quantity") or 1)
-                - (item.get("discount") or 0)
-            )
-            for item in self.validated_data["items"]
+    start_dt = serializers.DateTimeField(required=False, help_text="Дата начала для расчёта (по умолчанию из заявки)")
+    end_dt = serializers.DateTimeField(required=False, help_text="Дата окончания для расчёта (по умолчанию из заявки)")
+
+    def create_snapshot(self, order: Order) -> dict[str, Any]:
+        """Расчёт по ставкам из кэша справочника, без записи и без запросов к БД."""
+        snapshot = preview_snapshot(
+            order,
+            self.validated_data["items"],
+            start_dt=self.validated_data.get("start_dt"),
+            end_dt=self.validated_data.get("end_dt"),
         )
-        return {"items": self.validated_data["items"], "total": total}
+        # items и total - поля прежнего формата ответа, на них рассчитана мобильная форма
+        return {"items": self.validated_data["items"], "total": snapshot["summary"]["total"], **snapshot}
 
 
 class OrderStatusLogSerializer(serializers.ModelSerializer):
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from typing import Any, Iterator
+
+from django.db.models import QuerySet
+
+from orders.models import Order, OrderItem
+from orders.services.line_totals import MONEY_PRECISION, calculate_line_amounts
+
+# Размер пачки при чтении курсором (server-side cursor на PostgreSQL)
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_EXPORT_COLUMNS = (
+    ("number", "number"),
+    ("status", "status"),
+    ("created_at", "created_at"),
+    ("start_dt", "start_dt"),
+    ("end_dt", "end_dt"),
+    ("client", "client__name"),
+    ("address", "address"),
+    ("manager", "manager__username"),
+    ("total_amount", "total_amount"),
+    ("prepayment_amount", "prepayment_amount"),
+)
+
+ORDER_LINE_EXPORT_HEADERS = (
+    "order_number",
+    "order_status",
+    "order_created_at",
+    "client",
+    "item_type",
+    "name",
+    "quantity",
+    "unit",
+    "unit_price",
+    "discount",
+    "tax_rate",
+    "line_total",
+)
+
+
+def order_export_headers() -> list[str]:
+    return [header for header, _ in ORDER_EXPORT_COLUMNS]
+
+
+def iter_order_rows(orders: QuerySet[Order]) -> Iterator[tuple[Any, ...]]:
+    """Строки выгрузки заявок без загрузки моделей и prefetch-кэшей."""
+    fields = [field for _, field in ORDER_EXPORT_COLUMNS]
+    yield from orders.prefetch_related(None).values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def iter_order_line_rows(orders: QuerySet[Order]) -> Iterator[tuple[Any, ...]]:
+    """Строки выгрузки позиций заявок; стоимость считается по общей формуле line_totals."""
+    items = (
+        OrderItem.objects.filter(order__in=orders.prefetch_related(None).order_by().values("id"))
+        .order_by("order__created_at", "order_id", "id")
+        .values_list(
+            "order__number",
+            "order__status",
+            "order__created_at",
+            "order__client__name",
+            "item_type",
+            "name_snapshot",
+            "quantity",
+            "unit",
+            "unit_price",
+            "discount",
+            "tax_rate",
+            "metadata",
+        )
+    )
+    for row in items.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        *columns, metadata = row
+        item_type, quantity, unit_price, discount, tax_rate = columns[4], columns[6], columns[8], columns[9], columns[10]
+        amounts = calculate_line_amounts(item_type, quantity, unit_price, discount, tax_rate, metadata)
+        yield (*columns, amounts.line_total.quantize(MONEY_PRECISION))
@@ -0,0 +1,224 @@
+"""
+Пакетная запись позиций заявки.
+
+Справочные строки (Equipment, MaterialItem), на которые ссылаются позиции,
+берутся из catalog.cache (промахи догружаются одним запросом на тип),
+позиции собираются в памяти и пишутся одним bulk_create. post_save для созданных позиций отправляется вручную,
+чтобы аудит и другие подписчики видели их так же, как при save().
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Iterable
+
+from django.db.models.signals import post_save
+
+from catalog.cache import get_equipment_many, get_materials_many
+from catalog.models import Equipment, MaterialItem
+
+from ..models import Order, OrderItem
+from .pricing import _get_duration_hours, _round_half_hour
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogRefs:
+    """
+    Справочные строки, на которые ссылаются позиции, по id.
+
+    Вместо Equipment подходят записи catalog.rates.EquipmentRate (нужны только ставки).
+    """
+
+    equipment: dict[int, Equipment] = field(default_factory=dict)
+    materials: dict[int, MaterialItem] = field(default_factory=dict)
+
+
+def item_type_value(item_data: dict[str, Any]) -> str:
+    """item_type позиции строкой (в данных может быть enum или строка в любом регистре)."""
+    item_type = item_data.get("item_type")
+    if hasattr(item_type, "value"):
+        return item_type.value
+    return str(item_type).lower()
+
+
+def _ref_ids(items_data: Iterable[dict[str, Any]], item_type: str) -> set[int]:
+    return {item["ref_id"] for item in items_data if item_type_value(item) == item_type and item.get("ref_id")}
+
+
+def missing_equipment_ids(items_data: list[dict[str, Any]]) -> set[int]:
+    """id техники из позиций, которой нет в справочнике."""
+    ref_ids = _ref_ids(items_data, OrderItem.ItemType.EQUIPMENT.value)
+    return ref_ids - get_equipment_many(ref_ids).keys()
+
+
+def load_catalog_refs(items_data: list[dict[str, Any]]) -> CatalogRefs:
+    """Технику и материалы, на которые ссылаются позиции, берёт из catalog.cache (промахи - запрос на тип)."""
+    return CatalogRefs(
+        equipment=get_equipment_many(_ref_ids(items_data, OrderItem.ItemType.EQUIPMENT.value)),
+        materials=get_materials_many(_ref_ids(items_data, OrderItem.ItemType.MATERIAL.value)),
+    )
+
+
+def build_item(order: Order, item: dict[str, Any], refs: CatalogRefs) -> OrderItem:
+    """Позиция из данных OrderSerializer: смены и часы техники, время для почасовых услуг."""
+    item_data = item.copy()
+    # Для техники используем metadata с shifts и hours, если они указаны
+    if item_data.get("item_type") == OrderItem.ItemType.EQUIPMENT:
+        metadata = item_data.get("metadata", {})
+        if not isinstance(metadata, dict):
+            metadata = {}
+
+        shifts = Decimal(str(metadata.get("shifts", 0) or 0))
+        hours = Decimal(str(metadata.get("hours", 0) or 0))
+
+        # Если указаны смены или часы в metadata, используем их
+        if shifts > 0 or hours > 0:
+            ref_id = item_data.get("ref_id")
+            if ref_id:
+                equipment = refs.equipment.get(ref_id)
+                if equipment is None:
+                    logger.warning(f"Equipment with id {ref_id} not found")
+                else:
+                    # Сохраняем daily_rate в metadata если его там нет
+                    if "daily_rate" not in metadata and equipment.daily_rate:
+                        metadata["daily_rate"] = float(equipment.daily_rate)
+                    # Устанавливаем unit_price как hourly_rate
+                    item_data["unit_price"] = Decimal(str(equipment.hourly_rate or 0))
+
+            # Сохраняем shifts и hours в metadata
+            metadata["shifts"] = float(shifts)
+            metadata["hours"] = float(hours)
+            item_data["metadata"] = metadata
+
+            # quantity используется только для отображения, не для расчетов
+            item_data["quantity"] = Decimal(str(shifts + hours))
+            item_data["unit"] = "hour"  # Для совместимости
+        else:
+            # Если нет metadata с shifts/hours, используем старую логику
+            if order.start_dt and order.end_dt:
+                # Округляем до 0.5 часа
+                item_data["quantity"] = _round_half_hour(_get_duration_hours(order))
+                item_data["unit"] = "hour"
+            elif order.start_dt:
+                # Если end_dt не указан, используем переданное quantity или 1
+                item_data["quantity"] = item_data.get("quantity", Decimal("1.00"))
+                item_data["unit"] = item_data.get("unit", "hour")
+    # Для услуг с billing_mode="per_hour" также рассчитываем из времени
+    elif item_data.get("item_type") == OrderItem.ItemType.SERVICE:
+        metadata = item_data.get("metadata", {})
+        if metadata.get("billing_mode") == "per_hour" and order.start_dt and order.end_dt:
+            item_data["quantity"] = _round_half_hour(_get_duration_hours(order))
+
+    return OrderItem(order=order, **item_data)
+
+
+def _optional_decimal(value: Any) -> Decimal | None:
+    return Decimal(str(value)) if value is not None else None
+
+
+def build_completion_item(order: Order, item_data: dict[str, Any], refs: CatalogRefs) -> OrderItem | None:
+    """
+    Позиция из формы завершения заявки.
+
+    Название и цена техники и материалов берутся из справочника; позиции со
+    ссылкой на отсутствующую строку пропускаются (None).
+    """
+    item_type = item_type_value(item_data)
+
+    # Для техники берём данные из Equipment и введённые пользователем смены/часы
+    if item_type == OrderItem.ItemType.EQUIPMENT.value:
+        equipment = refs.equipment.get(item_data.get("ref_id"))
+        if equipment is None:
+            logger.warning(f"Equipment with id {item_data.get('ref_id')} not found, skipping item")
+            return None
+        metadata = item_data.get("metadata", {})
+        if not isinstance(metadata, dict):
+            metadata = {}
+        shifts = Decimal(str(metadata.get("shifts", 0) or 0))
+        hours = Decimal(str(metadata.get("hours", 0) or 0))
+        # ВАЖНО: quantity для техники НЕ преобразуем смены в часы - это сумма для отображения,
+        # расчёты идут через metadata (shifts, hours, daily_rate)
+        return OrderItem(
+            order=order,
+            item_type=OrderItem.ItemType.EQUIPMENT,
+            ref_id=item_data["ref_id"],
+            name_snapshot=equipment.name,
+            quantity=shifts + hours,
+            unit="hour",  # Единица для совместимости, но не используется для расчетов
+            unit_price=Decimal(str(equipment.hourly_rate or 0)),
+            tax_rate=Decimal(str(item_data.get("tax_rate", 0.0))),
+            discount=Decimal(str(item_data.get("discount", 0.0))),
+            fuel_expense=_optional_decimal(item_data.get("fuel_expense")),
+            repair_expense=_optional_decimal(item_data.get("repair_expense")),
+            metadata={
+                **metadata,
+                "shifts": float(shifts),
+                "hours": float(hours),
+                "daily_rate": float(equipment.daily_rate or 0),
+            },
+        )
+
+    # Для материалов (грунт, инструменты, навески) берём данные из MaterialItem
+    if item_type == OrderItem.ItemType.MATERIAL.value:
+        material = refs.materials.get(item_data.get("ref_id"))
+        if material is None:
+            logger.warning(f"MaterialItem with id {item_data.get('ref_id')} not found, skipping item")
+            return None
+        metadata = item_data.get("metadata", {})
+        if not isinstance(metadata, dict):
+            metadata = {}
+        # Категория материала нужна для правильного отображения
+        metadata["material_category"] = material.category
+        return OrderItem(
+            order=order,
+            item_type=OrderItem.ItemType.MATERIAL,
+            ref_id=item_data["ref_id"],
+            name_snapshot=material.name,
+            quantity=Decimal(str(item_data.get("quantity", 1.0))),
+            unit=material.unit,
+            unit_price=Decimal(str(material.price)),
+            tax_rate=Decimal(str(item_data.get("tax_rate", 0.0))),
+            discount=Decimal(str(item_data.get("discount", 0.0))),
+            metadata=metadata,
+        )
+
+    # Для других типов просто создаем позицию как есть
+    try:
+        item_type_enum = OrderItem.ItemType(item_type)
+    except ValueError:
+        logger.warning(f"Unknown item_type: {item_data.get('item_type')}, using EQUIPMENT")
+        item_type_enum = OrderItem.ItemType.EQUIPMENT
+    return OrderItem(
+        order=order,
+        item_type=item_type_enum,
+        ref_id=item_data.get("ref_id"),
+        name_snapshot=item_data.get("name_snapshot", "Не указано"),
+        quantity=Decimal(str(item_data.get("quantity", 1.0))),
+        unit=item_data.get("unit", "pcs"),
+        unit_price=Decimal(str(item_data.get("unit_price", 0.0))),
+        tax_rate=Decimal(str(item_data.get("tax_rate", 0.0))),
+        discount=Decimal(str(item_data.get("discount", 0.0))),
+        metadata=item_data.get("metadata", {}),
+    )
+
+
+def save_items(order: Order, items: list[OrderItem]) -> list[OrderItem]:
+    """Пишет позиции одним bulk_create и отправляет post_save для каждой (аудит, подписчики)."""
+    # Заявка могла быть загружена с prefetch_related("items"): иначе расчёт стоимости увидит старые позиции
+    getattr(order, "_prefetched_objects_cache", {}).pop("items", None)
+    if not items:
+        return []
+    created = OrderItem.objects.bulk_create(items)
+    using = OrderItem.objects.db
+    for item in created:
+        post_save.send(sender=OrderItem, instance=item, created=True, update_fields=None, raw=False, using=using)
+    return created
+
+
+def create_order_items(order: Order, items_data: list[dict[str, Any]]) -> list[OrderItem]:
+    """Создаёт позиции заявки из данных OrderSerializer."""
+    refs = load_catalog_refs(items_data)
+    return save_items(order, [build_item(order, item, refs) for item in items_data])
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Mapping
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Q, Value, When
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+from django.db.models.lookups import GreaterThan
+
+from orders.models import OrderItem
+
+DECIMAL_ZERO = Decimal("0.00")
+HUNDRED = Decimal("100")
+MONEY_PRECISION = Decimal("0.01")
+# Налог округляется половиной от нуля — так же, как ROUND(numeric, 2) в PostgreSQL
+MONEY_ROUNDING = ROUND_HALF_UP
+
+# Точность промежуточных вычислений в SQL-выражениях
+SQL_AMOUNT_FIELD = DecimalField(max_digits=20, decimal_places=4)
+SQL_METADATA_FIELD = DecimalField(max_digits=14, decimal_places=4)
+
+
+@dataclass(frozen=True)
+class LineAmounts:
+    """Составляющие стоимости позиции заявки."""
+
+    total_cost: Decimal
+    discount_amount: Decimal
+    tax_amount: Decimal
+    line_total: Decimal
+
+
+def metadata_decimal(metadata: Mapping[str, Any] | None, key: str) -> Decimal:
+    """Числовое значение из metadata позиции (пустые значения считаются нулём)."""
+    return Decimal(str((metadata or {}).get(key, 0) or 0))
+
+
+def equipment_usage(metadata: Mapping[str, Any] | None) -> tuple[Decimal, Decimal, Decimal]:
+    """Возвращает (смены, часы, daily_rate) из metadata позиции техники."""
+    return (
+        metadata_decimal(metadata, "shifts"),
+        metadata_decimal(metadata, "hours"),
+        metadata_decimal(metadata, "daily_rate"),
+    )
+
+
+def apply_discount_and_tax(total_cost: Decimal, discount: Decimal, tax_rate: Decimal) -> LineAmounts:
+    """Применяет процентную скидку и налог к базовой стоимости позиции."""
+    discount_amount = total_cost * (discount / HUNDRED) if discount > 0 else DECIMAL_ZERO
+    line_total = total_cost - discount_amount
+    tax_amount = (line_total * (tax_rate / HUNDRED)).quantize(MONEY_PRECISION, rounding=MONEY_ROUNDING)
+    return LineAmounts(
+        total_cost=total_cost,
+        discount_amount=discount_amount,
+        tax_amount=tax_amount,
+        line_total=line_total + tax_amount,
+    )
+
+
+def calculate_line_amounts(
+    item_type: str,
+    quantity: Decimal | None,
+    unit_price: Decimal | None,
+    discount: Decimal | None,
+    tax_rate: Decimal | None,
+    metadata: Mapping[str, Any] | None,
+) -> LineAmounts:
+    """
+    Единая формула стоимости позиции.
+
+    Для техники со сменами/часами в metadata: смены * daily_rate + часы * hourly_rate
+    (hourly_rate хранится в unit_price), для остальных позиций: цена * количество.
+    Затем применяются скидка и налог (в процентах).
+    """
+    unit_price = Decimal(str(unit_price or 0))
+    if item_type == OrderItem.ItemType.EQUIPMENT:
+        shifts, hours, daily_rate = equipment_usage(metadata)
+        if shifts > 0 or hours > 0:
+            shifts_cost = shifts * daily_rate if daily_rate > 0 else Decimal("0")
+            total_cost = shifts_cost + hours * unit_price
+            return apply_discount_and_tax(total_cost, Decimal(str(discount or 0)), Decimal(str(tax_rate or 0)))
+    total_cost = Decimal(str(quantity or 0)) * unit_price
+    return apply_discount_and_tax(total_cost, Decimal(str(discount or 0)), Decimal(str(tax_rate or 0)))
+
+
+def calculate_line_total(item: OrderItem) -> Decimal:
+    """Итоговая стоимость позиции заявки с учётом смен, часов, скидки и налога."""
+    return calculate_line_amounts(
+        item.item_type, item.quantity, item.unit_price, item.discount, item.tax_rate, item.metadata
+    ).line_total
+
+
+def equipment_hours(item_type: str, quantity: Decimal | None, metadata: Mapping[str, Any] | None) -> Decimal:
+    """Часы работы техники для статистики: часы из metadata, либо количество для старых позиций."""
+    shifts, hours, _ = equipment_usage(metadata)
+    if item_type == OrderItem.ItemType.EQUIPMENT and (shifts > 0 or hours > 0):
+        return hours
+    return Decimal(str(quantity or 0))
+
+
+# --- SQL-выражения той же формулы -------------------------------------------------
+
+
+def metadata_decimal_expression(key: str, prefix: str = ""):
+    """Числовое значение ключа metadata как выражение БД (NULL и пустая строка — ноль)."""
+    raw = NullIf(KeyTextTransform(key, f"{prefix}metadata"), Value(""))
+    return Coalesce(Cast(raw, SQL_METADATA_FIELD), Value(Decimal("0")), output_field=SQL_METADATA_FIELD)
+
+
+def has_equipment_usage_expression(prefix: str = "") -> Q:
+    """Условие «позиция техники со сменами или часами в metadata»."""
+    return Q(**{f"{prefix}item_type": OrderItem.ItemType.EQUIPMENT}) & (
+        Q(GreaterThan(metadata_decimal_expression("shifts", prefix), Value(Decimal("0"))))
+        | Q(GreaterThan(metadata_decimal_expression("hours", prefix), Value(Decimal("0"))))
+    )
+
+
+def line_total_expression(prefix: str = ""):
+    """
+    Выражение БД, повторяющее calculate_line_amounts(...).line_total.
+
+    prefix позволяет строить выражение от связанной модели (например, "items__").
+    """
+    shifts = metadata_decimal_expression("shifts", prefix)
+    hours = metadata_decimal_expression("hours", prefix)
+    daily_rate = metadata_decimal_expression("daily_rate", prefix)
+    unit_price = Coalesce(F(f"{prefix}unit_price"), Value(Decimal("0")), output_field=SQL_AMOUNT_FIELD)
+    quantity = Coalesce(F(f"{prefix}quantity"), Value(Decimal("0")), output_field=SQL_AMOUNT_FIELD)
+    discount = Greatest(
+        Coalesce(F(f"{prefix}discount"), Value(Decimal("0")), output_field=SQL_AMOUNT_FIELD),
+        Value(Decimal("0")),
+        output_field=SQL_AMOUNT_FIELD,
+    )
+    tax_rate = Coalesce(F(f"{prefix}tax_rate"), Value(Decimal("0")), output_field=SQL_AMOUNT_FIELD)
+
+    shifts_cost = Case(
+        When(GreaterThan(daily_rate, Value(Decimal("0"))), then=shifts * daily_rate),
+        default=Value(Decimal("0")),
+        output_field=SQL_AMOUNT_FIELD,
+    )
+    total_cost = Case(
+        When(has_equipment_usage_expression(prefix), then=shifts_cost + hours * unit_price),
+        default=quantity * unit_price,
+        output_field=SQL_AMOUNT_FIELD,
+    )
+    discounted = ExpressionWrapper(total_cost - total_cost * discount / Value(HUNDRED), output_field=SQL_AMOUNT_FIELD)
+    # ROUND(numeric, 2) округляет половину от нуля, как MONEY_ROUNDING в apply_discount_and_tax
+    tax_amount = Round(discounted * tax_rate / Value(HUNDRED), 2, output_field=SQL_AMOUNT_FIELD)
+    return ExpressionWrapper(discounted + tax_amount, output_field=SQL_AMOUNT_FIELD)
+
+
+def equipment_hours_expression(prefix: str = ""):
+    """Выражение БД, повторяющее equipment_hours(...)."""
+    return Case(
+        When(has_equipment_usage_expression(prefix), then=metadata_decimal_expression("hours", prefix)),
+        default=Coalesce(F(f"{prefix}quantity"), Value(Decimal("0")), output_field=SQL_AMOUNT_FIELD),
+        output_field=SQL_AMOUNT_FIELD,
+    )
@@ -0,0 +1,57 @@
+"""
+Выдача номеров заказов из счётчика в БД.
+
+Номер берётся одним атомарным upsert с RETURNING (PostgreSQL, SQLite 3.35+):
+параллельные создания сериализуются на строке счётчика и не получают
+одинаковых номеров. Для СУБД без RETURNING строка счётчика блокируется
+select_for_update внутри транзакции.
+
+Настройки (settings.ORDER_NUMBERS):
+    width     - ширина числовой части с ведущими нулями (6 -> "000042")
+    per_year  - отдельная серия на каждый год с префиксом "2025-"
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import OrderNumberCounter
+
+DEFAULT_SERIES = "default"
+
+
+def _config() -> dict:
+    return getattr(settings, "ORDER_NUMBERS", {})
+
+
+def _next_value(series: str) -> int:
+    using = router.db_for_write(OrderNumberCounter)
+    connection = connections[using]
+    if connection.features.can_return_columns_from_insert:
+        table, key, value = (
+            connection.ops.quote_name(name) for name in (OrderNumberCounter._meta.db_table, "key", "value")
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({key}, {value}) VALUES (%s, 1) "
+                f"ON CONFLICT ({key}) DO UPDATE SET {value} = {table}.{value} + 1 RETURNING {value}",
+                [series],
+            )
+            return cursor.fetchone()[0]
+
+    with transaction.atomic(using=using):
+        counter, _ = OrderNumberCounter.objects.using(using).select_for_update().get_or_create(key=series)
+        OrderNumberCounter.objects.using(using).filter(pk=counter.pk).update(value=F("value") + 1)
+        return counter.value + 1
+
+
+def next_order_number() -> str:
+    """Следующий свободный номер заказа."""
+    config = _config()
+    width = int(config.get("width", 6))
+    if config.get("per_year"):
+        year = timezone.localdate().year
+        return f"{year}-{_next_value(str(year)):0{width}d}"
+    return f"{_next_value(DEFAULT_SERIES):0{width}d}"
@@ -0,0 +1,83 @@
+"""
+Предпросмотр стоимости заказа в памяти.
+
+Позиции из формы собираются в несохранённые OrderItem с ценами из процессного
+кэша ставок (catalog.rates) и считаются тем же движком, что и сохранённые
+заказы. Ни сам расчёт, ни подстановка цен не обращаются к БД, пока кэш ставок
+не истёк.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from django.utils import timezone
+
+from catalog.rates import RateTable, get_rates
+
+from ..models import Order, OrderItem
+from .items import CatalogRefs, build_item, item_type_value
+from .pricing import PricingConfig, price_items
+
+
+def _with_catalog_defaults(item: dict[str, Any], rates: RateTable) -> dict[str, Any]:
+    """Подставляет название, единицу и цену из справочника там, где форма их не передала."""
+    ref_id = item.get("ref_id")
+    if not ref_id:
+        return item
+    item_type = item_type_value(item)
+    item_data = dict(item)
+    if item_type == OrderItem.ItemType.EQUIPMENT.value:
+        equipment = rates.equipment.get(ref_id)
+        if equipment is None:
+            return item_data
+        if not item_data.get("name_snapshot"):
+            item_data["name_snapshot"] = equipment.name
+        if item_data.get("unit_price") is None:
+            item_data["unit_price"] = equipment.hourly_rate
+        metadata = item_data.get("metadata")
+        if isinstance(metadata, dict) and "daily_rate" not in metadata and equipment.daily_rate:
+            item_data["metadata"] = {**metadata, "daily_rate": float(equipment.daily_rate)}
+        return item_data
+
+    table = {
+        OrderItem.ItemType.SERVICE.value: rates.services,
+        OrderItem.ItemType.MATERIAL.value: rates.materials,
+        OrderItem.ItemType.ATTACHMENT.value: rates.attachments,
+    }.get(item_type, {})
+    rate = table.get(ref_id)
+    if rate is None:
+        return item_data
+    if not item_data.get("name_snapshot"):
+        item_data["name_snapshot"] = rate.name
+    if not item_data.get("unit") and rate.unit:
+        item_data["unit"] = rate.unit
+    if item_data.get("unit_price") is None and rate.price is not None:
+        item_data["unit_price"] = rate.price
+    return item_data
+
+
+def preview_snapshot(
+    order: Order,
+    items_data: list[dict[str, Any]],
+    start_dt: datetime | None = None,
+    end_dt: datetime | None = None,
+    rates: RateTable | None = None,
+) -> dict[str, Any]:
+    """
+    Снимок расчёта для позиций формы без сохранения.
+
+    start_dt/end_dt из формы подменяют даты заказа только для расчёта;
+    переданный заказ не изменяется.
+    """
+    rates = rates or get_rates()
+    draft = Order(
+        start_dt=start_dt or order.start_dt,
+        end_dt=end_dt or order.end_dt,
+        prepayment_amount=order.prepayment_amount,
+        meta=order.meta,
+    )
+    refs = CatalogRefs(equipment=rates.equipment)
+    items = [build_item(draft, _with_catalog_defaults(item, rates), refs) for item in items_data]
+    _, snapshot = price_items(draft, items, PricingConfig.current(), timezone.now())
+    return snapshot
@@ -1,19 +1,25 @@
 from __future__ import annotations
 
-from __future__ import annotations
-
-from dataclasses import dataclass
+import hashlib
+from dataclasses import astuple, dataclass
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP, ROUND_UP
-from typing import Any
+from typing import Any, Iterable
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import prefetch_related_objects
+from django.dispatch import receiver
 from django.utils import timezone
 
 from orders.models import Order, OrderItem
+from orders.services.line_totals import apply_discount_and_tax, equipment_usage
 
 DECIMAL_ZERO = Decimal("0.00")
 
+# Версия формул расчёта: увеличивается при изменении логики, попадает в price_snapshot
+ENGINE_VERSION = 2
+
 
 @dataclass(frozen=True)
 class PricingConfig:
@@ -28,34 +34,70 @@ class PricingConfig:
             late_penalty_percent=Decimal(str(cfg.get("late_penalty_percent", "10"))),
         )
 
+    @classmethod
+    def current(cls) -> "PricingConfig":
+        """Конфигурация из настроек, один раз на процесс (сбрасывается при изменении PRICING_ENGINE)."""
+        global _current_config
+        if _current_config is None:
+            _current_config = cls.from_settings()
+        return _current_config
+
+    @property
+    def version(self) -> str:
+        """Короткий отпечаток параметров: по нему видно, с какими ставками построен снимок."""
+        return hashlib.md5(repr(astuple(self)).encode("utf-8"), usedforsecurity=False).hexdigest()[:12]
+
+
+_current_config: PricingConfig | None = None
+
+
+@receiver(setting_changed)
+def _reset_pricing_config(setting, **kwargs) -> None:
+    global _current_config
+    if setting == "PRICING_ENGINE":
+        _current_config = None
+
 
-def calculate_order_total(order: Order) -> Decimal:
+def calculate_order_total(order: Order, config: PricingConfig | None = None, now: datetime | None = None) -> Decimal:
     """
     Calculate order total with support for equipment hourly/daily billing, materials, services,
     attachments and automatic penalties for late completion.
+
+    Позиции читаются через order.items.all(), поэтому prefetch_related("items") избавляет от запроса.
     """
 
-    config = PricingConfig.from_settings()
+    config = config or PricingConfig.current()
+    now = now or timezone.now()
+    total, snapshot = price_items(order, order.items.all(), config, now)
+    order.price_snapshot = snapshot
+    order.total_amount = total
+    return total
+
+
+def price_items(
+    order: Order, items: Iterable[OrderItem], config: PricingConfig, now: datetime
+) -> tuple[Decimal, dict[str, Any]]:
+    """Итог и снимок расчёта для позиций заказа; чистая функция без обращений к БД."""
     positions: list[dict[str, Any]] = []
     subtotal = DECIMAL_ZERO
     tax_total = DECIMAL_ZERO
     discount_total = DECIMAL_ZERO
 
-    for item in order.items.all():
-        item_result = _calculate_item(order, item, config)
+    for item in items:
+        item_result = _calculate_item(order, item, config, now)
         positions.append(item_result)
         subtotal += item_result["line_total"]
         tax_total += item_result["tax_amount"]
         discount_total += item_result["discount_amount"]
 
-    late_discount = _calculate_late_penalty(order, subtotal, config)
+    late_discount = _calculate_late_penalty(order, subtotal, config, now)
     discount_total += late_discount
 
     total = subtotal + tax_total - discount_total
     prepayment = order.prepayment_amount or DECIMAL_ZERO
     balance = max(total - prepayment, DECIMAL_ZERO)
 
-    order.price_snapshot = {
+    snapshot = {
         "positions": [_serialize_position(p) for p in positions],
         "summary": {
             "subtotal": _to_money(subtotal),
@@ -66,13 +108,35 @@ def calculate_order_total(order: Order) -> Decimal:
             "prepayment": _to_money(prepayment),
             "balance": _to_money(balance),
         },
+        "engine_version": ENGINE_VERSION,
+        "config_version": config.version,
+        "generated_at": now.isoformat(),
     }
-    order.total_amount = total
-    order.price_snapshot["generated_at"] = timezone.now().isoformat()
-    return total
+    return total, snapshot
 
 
-def _calculate_item(order: Order, item: OrderItem, config: PricingConfig) -> dict[str, Any]:
+def reprice_orders(orders: Iterable[Order], config: PricingConfig | None = None) -> list[Order]:
+    """
+    Пересчитывает снимки стоимости пачки заказов.
+
+    Позиции всех заказов загружаются одним запросом, расчёт идёт с общими
+    конфигурацией и моментом времени, результат пишется одним bulk_update.
+    updated_at выставляется явно, чтобы изменения увидела дельта-синхронизация.
+    """
+    orders = list(orders)
+    if not orders:
+        return orders
+    config = config or PricingConfig.current()
+    now = timezone.now()
+    prefetch_related_objects(orders, "items")
+    for order in orders:
+        calculate_order_total(order, config=config, now=now)
+        order.updated_at = now
+    Order.objects.bulk_update(orders, ["price_snapshot", "total_amount", "updated_at"])
+    return orders
+
+
+def _calculate_item(order: Order, item: OrderItem, config: PricingConfig, now: datetime | None = None) -> dict[str, Any]:
     quantity = Decimal(item.quantity or 0)
     unit_price = Decimal(item.unit_price or 0)
     tax_rate = Decimal(item.tax_rate or 0)
@@ -83,9 +147,7 @@ def _calculate_item(order: Order, item: OrderItem, config: PricingConfig) -> dic
 
     if item.item_type == OrderItem.ItemType.EQUIPMENT:
         # Используем информацию о сменах и часах из metadata, если она есть
-        shifts = Decimal(str(metadata.get("shifts", 0)))
-        hours = Decimal(str(metadata.get("hours", 0)))
-        daily_rate = Decimal(str(metadata.get("daily_rate", 0)))
+        shifts, hours, daily_rate = equipment_usage(metadata)
         hourly_rate = unit_price  # unit_price уже содержит hourly_rate из Equipment
         
         if shifts > 0 or hours > 0:
@@ -109,19 +171,17 @@ def _calculate_item(order: Order, item: OrderItem, config: PricingConfig) -> dic
             # Используем просто сумму смен и часов для визуального представления
             effective_qty = shifts + hours  # Только для отображения, НЕ для расчетов!
             
-            # Применяем скидку (discount - это процент)
-            discount_amount = total_cost * (discount / Decimal("100")) if discount > 0 else Decimal("0")
-            line_total = total_cost - discount_amount
-            tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
+            # Применяем скидку (discount - это процент) и налог
+            amounts = apply_discount_and_tax(total_cost, discount, tax_rate)
             
             return {
                 "name": item.name_snapshot,
                 "type": item.item_type,
                 "quantity": effective_qty,  # Используется только для отображения, не для расчетов
                 "unit_price": hourly_rate,  # Базовое значение для отображения
-                "line_total": line_total + tax_amount,  # Правильно рассчитанная сумма
-                "tax_amount": tax_amount,
-                "discount_amount": discount_amount,
+                "line_total": amounts.line_total,  # Правильно рассчитанная сумма
+                "tax_amount": amounts.tax_amount,
+                "discount_amount": amounts.discount_amount,
                 "notes": billing_notes,
                 "metadata": {
                     "shifts": int(shifts),
@@ -132,7 +192,7 @@ def _calculate_item(order: Order, item: OrderItem, config: PricingConfig) -> dic
             }
         else:
             # Если нет информации о сменах, используем старую логику
-            duration_hours = _round_half_hour(_get_duration_hours(order))
+            duration_hours = _round_half_hour(_get_duration_hours(order, now))
             threshold = Decimal(config.equipment_daily_threshold_hours)
             if duration_hours >= threshold and daily_rate > 0:
                 days = _ceil(duration_hours / Decimal("24"))
@@ -148,7 +208,7 @@ def _calculate_item(order: Order, item: OrderItem, config: PricingConfig) -> dic
     elif item.item_type == OrderItem.ItemType.SERVICE:
         billing_mode = metadata.get("billing_mode", "fixed")
         if billing_mode == "per_hour":
-            effective_qty = _round_half_hour(_get_duration_hours(order))
+            effective_qty = _round_half_hour(_get_duration_hours(order, now))
             billing_notes = "Service per hour"
         else:
             billing_notes = "Fixed service"
@@ -156,27 +216,27 @@ def _calculate_item(order: Order, item: OrderItem, config: PricingConfig) -> dic
         billing_notes = metadata.get("note", item.item_type.title())
 
     effective_qty = max(effective_qty, DECIMAL_ZERO)
-    # Применяем скидку (discount - это процент)
-    discount_amount = (unit_price * effective_qty) * (discount / Decimal("100")) if discount > 0 else DECIMAL_ZERO
-    line_total = (unit_price * effective_qty) - discount_amount
-    tax_amount = (line_total * (tax_rate / Decimal("100"))).quantize(Decimal("0.01"))
+    # Применяем скидку (discount - это процент) и налог
+    amounts = apply_discount_and_tax(unit_price * effective_qty, discount, tax_rate)
 
     return {
         "name": item.name_snapshot,
         "type": item.item_type,
         "quantity": effective_qty,
         "unit_price": unit_price,
-        "line_total": line_total + tax_amount,
-        "tax_amount": tax_amount,
-        "discount_amount": discount_amount,
+        "line_total": amounts.line_total,
+        "tax_amount": amounts.tax_amount,
+        "discount_amount": amounts.discount_amount,
         "notes": billing_notes,
     }
 
 
-def _calculate_late_penalty(order: Order, subtotal: Decimal, config: PricingConfig) -> Decimal:
+def _calculate_late_penalty(
+    order: Order, subtotal: Decimal, config: PricingConfig, now: datetime | None = None
+) -> Decimal:
     if subtotal <= DECIMAL_ZERO:
         return DECIMAL_ZERO
-    if not _is_late(order):
+    if not _is_late(order, now):
         return DECIMAL_ZERO
     penalty = (subtotal * config.late_penalty_percent / Decimal("100")).quantize(Decimal("0.01"))
     return penalty
@@ -190,9 +250,9 @@ def _ceil(value: Decimal) -> Decimal:
     return value.quantize(Decimal("1"), rounding=ROUND_UP)
 
 
-def _get_duration_hours(order: Order) -> Decimal:
+def _get_duration_hours(order: Order, now: datetime | None = None) -> Decimal:
     start = order.start_dt
-    end = order.end_dt or timezone.now()
+    end = order.end_dt or now or timezone.now()
     delta = max((end - start).total_seconds(), 0)
     hours = Decimal(delta) / Decimal("3600")
     return hours
@@ -271,7 +331,7 @@ def _calculate_shifts_and_hours(start_dt: datetime, end_dt: datetime) -> tuple[D
     return shifts, remaining_hours
 
 
-def _is_late(order: Order) -> bool:
+def _is_late(order: Order, now: datetime | None = None) -> bool:
     meta = order.meta or {}
     if meta.get("is_delayed"):
         return True
@@ -281,7 +341,7 @@ def _is_late(order: Order) -> bool:
             planned_dt = datetime.fromisoformat(planned_end)
         except ValueError:
             return False
-        actual_end = order.end_dt or timezone.now()
+        actual_end = order.end_dt or now or timezone.now()
         return actual_end > planned_dt
     return False
 
@@ -0,0 +1,116 @@
+"""
+Дельта-синхронизация заказов по курсору (updated_at, id).
+
+Курсор указывает на последнюю отданную клиенту запись. Изменённые заказы и
+отметки об удалении (OrderTombstone) выбираются по составным индексам и
+сливаются в один поток, отсортированный по времени и id.
+
+Отметки фильтруются по роли так же, как заказы (visible_tombstones): оператор
+получает удаления своих заказов и снятия с назначения через operators. Смена
+устаревшего поля operator отметки не создаёт — оно заполняется только при
+создании заказа и дублируется в operators.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Order, OrderTombstone
+
+
+class Cursor(NamedTuple):
+    timestamp: datetime
+    id: uuid.UUID
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class ChangesPage:
+    orders: list[Order] = field(default_factory=list)
+    deleted: list[OrderTombstone] = field(default_factory=list)
+    cursor: Cursor | None = None
+    has_more: bool = False
+
+
+def _config() -> dict:
+    return getattr(settings, "ORDER_SYNC", {})
+
+
+def encode_cursor(cursor: Cursor | None) -> str | None:
+    if cursor is None:
+        return None
+    raw = f"{cursor.timestamp.isoformat()}|{cursor.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value: str | None) -> Cursor | None:
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        timestamp_raw, id_raw = raw.split("|", 1)
+        timestamp = parse_datetime(timestamp_raw)
+        if timestamp is None:
+            raise ValueError(timestamp_raw)
+        return Cursor(timestamp, uuid.UUID(id_raw))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(value) from exc
+
+
+def _after(queryset: QuerySet, time_field: str, id_field: str, cursor: Cursor | None) -> QuerySet:
+    if cursor is None:
+        return queryset
+    return queryset.filter(
+        Q(**{f"{time_field}__gt": cursor.timestamp})
+        | Q(**{time_field: cursor.timestamp, f"{id_field}__gt": cursor.id})
+    )
+
+
+def changes_since(
+    orders: QuerySet, tombstones: QuerySet, cursor: Cursor | None, limit: int | None = None
+) -> ChangesPage:
+    """
+    Заказы, изменённые после курсора, и отметки об удалении.
+
+    orders и tombstones уже ограничены выборкой пользователя.
+
+    Записи моложе lag_seconds не отдаются: транзакция, начатая раньше, может
+    закоммитить заказ с меньшим updated_at уже после того, как курсор ушёл вперёд.
+    """
+    limit = limit or int(_config().get("page_size", 200))
+    horizon = timezone.now() - timedelta(seconds=float(_config().get("lag_seconds", 2)))
+
+    changed = list(
+        _after(orders.filter(updated_at__lte=horizon), "updated_at", "id", cursor)
+        .order_by("updated_at", "id")[: limit + 1]
+    )
+    tombstones = list(
+        _after(tombstones.filter(deleted_at__lte=horizon), "deleted_at", "order_id", cursor)
+        .order_by("deleted_at", "order_id")[: limit + 1]
+    )
+
+    stream = sorted(
+        [(Cursor(order.updated_at, order.id), order) for order in changed]
+        + [(Cursor(tombstone.deleted_at, tombstone.order_id), tombstone) for tombstone in tombstones],
+        key=lambda entry: entry[0],
+    )
+    page = ChangesPage(cursor=cursor, has_more=len(stream) > limit)
+    for position, record in stream[:limit]:
+        if isinstance(record, Order):
+            page.orders.append(record)
+        else:
+            page.deleted.append(record)
+        page.cursor = position
+    return page
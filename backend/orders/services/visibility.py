@@ -0,0 +1,46 @@
+"""
+Какие заказы видит пользователь.
+
+Оператору доступны заказы, где он в operators или в устаревшем operator.
+Отметки об удалении он получает только адресованные ему: по заказам, которые
+были ему назначены на момент удаления, и по снятым с него назначениям.
+Назначение через operators проверяется коррелированным EXISTS по таблице
+связи (индекс user_id, order_id), а не JOIN: строки заказа не размножаются,
+DISTINCT не нужен, и PostgreSQL может идти по индексу (status, created_at)
+и останавливаться на размере страницы.
+"""
+from __future__ import annotations
+
+from django.db.models import Exists, OuterRef, Q, QuerySet
+
+from ..models import Order, OrderTombstone
+
+FULL_ACCESS_ROLES = ("admin", "manager")
+
+
+def assigned_to(user) -> Q:
+    """Условие "заказ назначен пользователю" (operators или устаревший operator)."""
+    assignments = Order.operators.through.objects.filter(order_id=OuterRef("pk"), user_id=user.pk)
+    return Q(Exists(assignments)) | Q(operator_id=user.pk)
+
+
+def visible_orders(queryset: QuerySet[Order], user) -> QuerySet[Order]:
+    """Ограничивает queryset заказами, доступными пользователю по роли."""
+    if not user.is_authenticated:
+        return queryset
+    if user.is_superuser or user.role in FULL_ACCESS_ROLES:
+        return queryset
+    if user.role == "operator":
+        return queryset.filter(assigned_to(user))
+    return queryset.none()
+
+
+def visible_tombstones(queryset: QuerySet[OrderTombstone], user) -> QuerySet[OrderTombstone]:
+    """Отметки об удалении, относящиеся к выборке пользователя (см. visible_orders)."""
+    if not user.is_authenticated:
+        return queryset.filter(recipient__isnull=True)
+    if user.is_superuser or user.role in FULL_ACCESS_ROLES:
+        return queryset.filter(recipient__isnull=True)
+    if user.role == "operator":
+        return queryset.filter(recipient=user)
+    return queryset.none()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Order, OrderTombstone
+
+Assignment = Order.operators.through
+
+
+def _assignee_ids(order: Order) -> set[int]:
+    ids = set(Assignment.objects.filter(order_id=order.pk).values_list("user_id", flat=True))
+    if order.operator_id:
+        ids.add(order.operator_id)
+    return ids
+
+
+@receiver(pre_delete, sender=Order)
+def remember_order_assignees(sender, instance: Order, **kwargs):
+    # К post_delete строки связи operators уже удалены каскадом
+    instance._tombstone_recipients = _assignee_ids(instance)
+
+
+@receiver(post_delete, sender=Order)
+def record_order_tombstone(sender, instance: Order, **kwargs):
+    """Оставляет отметку об удалении для клиентов, синхронизирующихся через orders/changes/."""
+    recipients = getattr(instance, "_tombstone_recipients", set())
+    OrderTombstone.objects.bulk_create(
+        OrderTombstone(order_id=instance.pk, number=instance.number, recipient_id=recipient_id)
+        for recipient_id in [None, *sorted(recipients)]
+    )
+
+
+@receiver(m2m_changed, sender=Assignment)
+def sync_order_assignments(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Изменение operators видно в orders/changes/: заказ получает новый updated_at,
+    а снятый оператор — отметку, что заказ пропал из его выборки.
+    """
+    if action == "pre_clear":
+        # При clear pk_set не передаётся: запоминаем связи до удаления
+        field = "order_id" if not reverse else "user_id"
+        instance._cleared_assignments = set(
+            Assignment.objects.filter(**{field: instance.pk}).values_list("order_id", "user_id")
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_clear":
+        pairs = getattr(instance, "_cleared_assignments", set())
+    elif reverse:
+        pairs = {(order_id, instance.pk) for order_id in pk_set or ()}
+    else:
+        pairs = {(instance.pk, user_id) for user_id in pk_set or ()}
+    if not pairs:
+        return
+
+    order_ids = {order_id for order_id, _ in pairs}
+    Order.objects.filter(pk__in=order_ids).update(updated_at=timezone.now())
+    if action == "post_add":
+        return
+
+    orders = {pk: (number, operator_id) for pk, number, operator_id in
+              Order.objects.filter(pk__in=order_ids).values_list("pk", "number", "operator_id")}
+    OrderTombstone.objects.bulk_create(
+        OrderTombstone(order_id=order_id, number=orders[order_id][0], recipient_id=user_id)
+        for order_id, user_id in sorted(pairs, key=str)
+        # Оператор в устаревшем operator продолжает видеть заказ
+        if order_id in orders and orders[order_id][1] != user_id
+    )
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from users.models import User
+
+
+@override_settings(ORDER_SYNC={"page_size": 200, "lag_seconds": 0})
+class OrderChangesTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def _create_order(self, number: str) -> Order:
+        return Order.objects.create(number=number, address="Test address", start_dt=timezone.now(), manager=self.manager)
+
+    def _changes(self, **params) -> dict:
+        response = self.api.get("/api/v1/orders/changes/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_returns_only_changes_and_tombstones_after_cursor(self):
+        first, second, third = (self._create_order(f"00000{i}") for i in range(1, 4))
+        initial = self._changes()
+        self.assertEqual([order["number"] for order in initial["results"]], ["000001", "000002", "000003"])
+
+        second.description = "Обновлено"
+        second.save()
+        self.api.post(f"/api/v1/orders/{third.id}/delete/")
+
+        delta = self._changes(since=initial["cursor"])
+        self.assertEqual([order["id"] for order in delta["results"]], [str(second.id)])
+        self.assertEqual([tombstone["id"] for tombstone in delta["deleted"]], [str(third.id)])
+        self.assertFalse(delta["has_more"])
+
+        self.assertEqual(self._changes(since=delta["cursor"])["results"], [])
+
+    def test_pages_through_changes_with_limit(self):
+        for i in range(5):
+            self._create_order(f"00000{i}")
+
+        seen, cursor = [], None
+        while True:
+            page = self._changes(limit=2, **({"since": cursor} if cursor else {}))
+            seen += [order["number"] for order in page["results"]]
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                break
+
+        self.assertEqual(seen, [f"00000{i}" for i in range(5)])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.api.get("/api/v1/orders/changes/", {"since": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_change_is_returned_after_cursor(self):
+        order = self._create_order("000001")
+        initial = self._changes()
+
+        response = self.api.patch(f"/api/v1/orders/{order.id}/status/", {"status": "APPROVED"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+        delta = self._changes(since=initial["cursor"])
+        self.assertEqual([(item["id"], item["status"]) for item in delta["results"]], [(str(order.id), "APPROVED")])
+
+    def test_operator_receives_only_own_tombstones(self):
+        operator = User.objects.create_user(username="operator", password="pass", role="operator")
+        own, foreign = self._create_order("000001"), self._create_order("000002")
+        own.operators.add(operator)
+        operator_api = APIClient()
+        operator_api.force_authenticate(operator)
+        initial = operator_api.get("/api/v1/orders/changes/").json()
+
+        self.api.post(f"/api/v1/orders/{own.id}/delete/")
+        self.api.post(f"/api/v1/orders/{foreign.id}/delete/")
+
+        delta = operator_api.get("/api/v1/orders/changes/", {"since": initial["cursor"]}).json()
+        self.assertEqual([tombstone["id"] for tombstone in delta["deleted"]], [str(own.id)])
+        manager_delta = self._changes(since=initial["cursor"])
+        self.assertEqual({tombstone["id"] for tombstone in manager_delta["deleted"]}, {str(own.id), str(foreign.id)})
+
+    def test_unassigned_operator_receives_tombstone(self):
+        operator = User.objects.create_user(username="operator", password="pass", role="operator")
+        order = self._create_order("000001")
+        order.operators.add(operator)
+        operator_api = APIClient()
+        operator_api.force_authenticate(operator)
+        initial = operator_api.get("/api/v1/orders/changes/").json()
+        self.assertEqual([item["id"] for item in initial["results"]], [str(order.id)])
+        manager_cursor = self._changes()["cursor"]
+
+        order.operators.remove(operator)
+
+        delta = operator_api.get("/api/v1/orders/changes/", {"since": initial["cursor"]}).json()
+        self.assertEqual(delta["results"], [])
+        self.assertEqual([tombstone["id"] for tombstone in delta["deleted"]], [str(order.id)])
+        # Для менеджера заказ не удалён, а изменён
+        manager_delta = self._changes(since=manager_cursor)
+        self.assertEqual([item["id"] for item in manager_delta["results"]], [str(order.id)])
+        self.assertEqual(manager_delta["deleted"], [])
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crm.models import Client
+from orders.models import Order, OrderItem
+from users.models import User
+
+
+class OrderConditionalGetTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        self.operator = User.objects.create_user(username="operator", password="pass", role="operator")
+        client = Client.objects.create(name="Client", phone="+1000000000")
+        self.order = Order.objects.create(
+            number="000001",
+            client=client,
+            address="Test address",
+            start_dt=timezone.now(),
+            manager=self.manager,
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+        self.url = f"/api/v1/orders/{self.order.pk}/"
+
+    def test_retrieve_returns_304_for_matching_etag(self):
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_related_changes_update_etag(self):
+        etag = self.api.get(self.url)["ETag"]
+
+        OrderItem.objects.create(
+            order=self.order, item_type=OrderItem.ItemType.SERVICE, name_snapshot="Service", unit_price=Decimal("10.00")
+        )
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        self.order.operators.add(self.operator)
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_changes_with_operators(self):
+        etag = self.api.get("/api/v1/orders/")["ETag"]
+        self.assertEqual(self.api.get("/api/v1/orders/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.order.operators.add(self.operator)
+        self.assertEqual(self.api.get("/api/v1/orders/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_changes_with_status(self):
+        etag = self.api.get("/api/v1/orders/")["ETag"]
+
+        response = self.api.patch(f"/api/v1/orders/{self.order.pk}/status/", {"status": "APPROVED"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.api.get("/api/v1/orders/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from catalog.models import Equipment
+from crm.models import Client
+from orders.models import Order, OrderItem
+from users.models import User
+
+
+class OrderItemIngestTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        self.equipment = [
+            Equipment.objects.create(code=f"EQ-{i}", name=f"Excavator {i}", hourly_rate=Decimal("100.00"))
+            for i in range(3)
+        ]
+        client = Client.objects.create(name="Client", phone="+1000000000")
+        self.order = Order.objects.create(
+            number="000001",
+            client=client,
+            address="Test address",
+            start_dt=timezone.now(),
+            manager=self.manager,
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def _items(self, count: int) -> list[dict]:
+        return [
+            {
+                "item_type": "equipment",
+                "ref_id": self.equipment[i % len(self.equipment)].id,
+                "name_snapshot": "Excavator",
+                "unit_price": "100.00",
+                "metadata": {"hours": 2},
+            }
+            for i in range(count)
+        ]
+
+    def _replace_items(self, count: int) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.patch(f"/api/v1/orders/{self.order.pk}/", {"items": self._items(count)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_replacing_items_query_count_does_not_grow_with_item_count(self):
+        # Первая замена: дальше обе замеряемые удаляют существующие позиции
+        self._replace_items(1)
+        small = self._replace_items(2)
+        large = self._replace_items(30)
+
+        self.assertEqual(small, large)
+        self.assertEqual(self.order.items.count(), 30)
+
+    def test_items_use_catalog_rates_and_update_total(self):
+        self._replace_items(2)
+
+        item = self.order.items.first()
+        self.assertEqual(item.unit_price, Decimal("100.00"))
+        self.assertEqual(item.quantity, Decimal("2.00"))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal("400.00"))
+
+    def test_unknown_equipment_is_rejected(self):
+        items = self._items(1)
+        items[0]["ref_id"] = 999999
+        response = self.api.patch(f"/api/v1/orders/{self.order.pk}/", {"items": items}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OrderItem.objects.filter(order=self.order).exists())
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.models import OrderNumberCounter
+from orders.services.numbering import next_order_number
+
+
+class OrderNumberAllocationTests(TestCase):
+    def test_numbers_are_sequential(self):
+        OrderNumberCounter.objects.update_or_create(key="default", defaults={"value": 41})
+
+        self.assertEqual(next_order_number(), "000042")
+        self.assertEqual(next_order_number(), "000043")
+        self.assertEqual(OrderNumberCounter.objects.get(key="default").value, 43)
+
+    def test_missing_series_starts_from_one(self):
+        OrderNumberCounter.objects.filter(key="default").delete()
+
+        self.assertEqual(next_order_number(), "000001")
+
+    @override_settings(ORDER_NUMBERS={"width": 4, "per_year": True})
+    def test_per_year_series_has_prefix(self):
+        year = timezone.localdate().year
+
+        self.assertEqual(next_order_number(), f"{year}-0001")
+        self.assertEqual(next_order_number(), f"{year}-0002")
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from crm.models import Client
+from orders.models import Order, OrderItem
+from users.models import User
+
+
+class OrderListQueryTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        self.operators = [
+            User.objects.create_user(username=f"operator{i}", password="pass", role="operator") for i in range(2)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def _create_orders(self, count: int) -> None:
+        for _ in range(count):
+            index = Order.objects.count()
+            client = Client.objects.create(name=f"Client {index}", phone=f"+1000000{index:03d}")
+            order = Order.objects.create(
+                number=f"{index:06d}",
+                client=client,
+                address="Test address",
+                start_dt=timezone.now(),
+                manager=self.manager,
+                operator=self.operators[0],
+            )
+            order.operators.set(self.operators)
+            OrderItem.objects.create(
+                order=order, item_type=OrderItem.ItemType.SERVICE, name_snapshot="Service", unit_price=Decimal("10.00")
+            )
+
+    def _count_list_queries(self) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get("/api/v1/orders/", {"page_size": 200})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self._create_orders(2)
+        small_page = self._count_list_queries()
+        self._create_orders(20)
+        large_page = self._count_list_queries()
+
+        self.assertEqual(small_page, large_page)
+
+    def test_list_uses_compact_representation(self):
+        self._create_orders(1)
+        order = self.api.get("/api/v1/orders/").json()["results"][0]
+
+        self.assertNotIn("items", order)
+        self.assertNotIn("price_snapshot", order)
+        self.assertEqual([op["id"] for op in order["operators"]], [op.id for op in self.operators])
+        self.assertEqual(order["operator"]["id"], self.operators[0].id)
+        self.assertEqual(order["client"]["name"], "Client 0")
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from catalog.models import Equipment
+from catalog.rates import get_rates, invalidate_rates
+from crm.models import Client
+from orders.models import Order
+from orders.services.preview import preview_snapshot
+from users.models import User
+
+
+class PricePreviewTests(TestCase):
+    def setUp(self):
+        invalidate_rates()
+        self.addCleanup(invalidate_rates)
+        self.manager = User.objects.create_user(username="manager", password="pass", role="manager")
+        self.equipment = Equipment.objects.create(code="EQ-1", name="Excavator", hourly_rate=Decimal("100.00"))
+        self.order = Order.objects.create(
+            number="000001",
+            client=Client.objects.create(name="Client", phone="+1000000000"),
+            address="Test address",
+            start_dt=timezone.now() - timedelta(hours=2),
+            manager=self.manager,
+        )
+        self.items = [{"item_type": "equipment", "ref_id": self.equipment.id, "metadata": {"hours": 3}}]
+
+    def test_preview_uses_cached_rates_without_queries(self):
+        get_rates()
+        with self.assertNumQueries(0):
+            snapshot = preview_snapshot(self.order, self.items)
+
+        self.assertEqual(snapshot["summary"]["total"], "300.00")
+        self.assertEqual(snapshot["positions"][0]["name"], "Excavator")
+
+    def test_catalog_change_invalidates_rates(self):
+        get_rates()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipment.hourly_rate = Decimal("200.00")
+            self.equipment.save()
+
+        self.assertEqual(preview_snapshot(self.order, self.items)["summary"]["total"], "600.00")
+
+    def test_preview_endpoint_does_not_save(self):
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        response = api.post(
+            f"/api/v1/orders/{self.order.pk}/calculate/preview/", {"items": self.items}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total"], "300.00")
+        self.assertFalse(self.order.items.exists())
@@ -3,13 +3,15 @@ from __future__ import annotations
 from datetime import timedelta
 from decimal import Decimal
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from catalog.models import Equipment
 from crm.models import Client
 from orders.models import Order, OrderItem
-from orders.services.pricing import calculate_order_total
+from orders.services.pricing import ENGINE_VERSION, PricingConfig, calculate_order_total, reprice_orders
 from users.models import User
 
 
@@ -18,11 +20,11 @@ class PricingEngineTests(TestCase):
         self.client_obj = Client.objects.create(name="ACME", phone="+1000000000")
         self.manager = User.objects.create_user(username="manager", password="pass")
 
-    def _create_order(self, hours: float = 4.0, **kwargs) -> Order:
+    def _create_order(self, hours: float = 4.0, number: str = "000001", **kwargs) -> Order:
         start = timezone.now() - timedelta(hours=hours)
         end = timezone.now()
         order = Order.objects.create(
-            number="000001",
+            number=number,
             client=self.client_obj,
             address="Test address",
             start_dt=start,
@@ -97,3 +99,39 @@ class PricingEngineTests(TestCase):
         self.assertEqual(summary["late_penalty"], "100.00")
         self.assertEqual(summary["discount_total"], "100.00")
 
+
+    def test_snapshot_is_stamped_with_engine_and_config_version(self):
+        order = self._create_order(hours=1)
+        calculate_order_total(order)
+
+        self.assertEqual(order.price_snapshot["engine_version"], ENGINE_VERSION)
+        self.assertEqual(order.price_snapshot["config_version"], PricingConfig.current().version)
+
+    def test_config_is_reloaded_when_settings_change(self):
+        default_version = PricingConfig.current().version
+        with override_settings(PRICING_ENGINE={"late_penalty_percent": "20"}):
+            self.assertEqual(PricingConfig.current().late_penalty_percent, Decimal("20"))
+            self.assertNotEqual(PricingConfig.current().version, default_version)
+        self.assertEqual(PricingConfig.current().version, default_version)
+
+    def test_reprice_orders_uses_constant_number_of_queries(self):
+        orders = []
+        for index in range(5):
+            order = self._create_order(hours=1, number=f"{index + 1:06d}")
+            OrderItem.objects.create(
+                order=order,
+                item_type=OrderItem.ItemType.SERVICE,
+                name_snapshot="Work",
+                unit_price=Decimal("100.00"),
+                quantity=Decimal(index + 1),
+            )
+            orders.append(order)
+
+        with CaptureQueriesContext(connection) as queries:
+            reprice_orders(Order.objects.filter(pk__in=[order.pk for order in orders]))
+        # Заказы, их позиции и один bulk_update
+        self.assertEqual(len(queries), 3)
+
+        totals = dict(Order.objects.values_list("number", "total_amount"))
+        self.assertEqual(totals["000003"], Decimal("300.00"))
+        self.assertEqual(Order.objects.get(number="000005").price_snapshot["summary"]["total"], "500.00")
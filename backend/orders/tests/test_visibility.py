@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from users.models import User
+
+
+class OperatorVisibilityTests(TestCase):
+    def setUp(self):
+        self.operator = User.objects.create_user(username="operator", password="pass", role="operator")
+        self.other = User.objects.create_user(username="other", password="pass", role="operator")
+        self.api = APIClient()
+        self.api.force_authenticate(self.operator)
+
+    def _order(self, number: str, **kwargs) -> Order:
+        return Order.objects.create(number=number, address="Test address", start_dt=timezone.now(), **kwargs)
+
+    def test_operator_sees_assigned_orders_once(self):
+        both = self._order("000001", operator=self.operator)
+        both.operators.set([self.operator, self.other])
+        legacy = self._order("000002", operator=self.operator)
+        assigned = self._order("000003")
+        assigned.operators.set([self.operator])
+        self._order("000004", operator=self.other).operators.set([self.other])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get("/api/v1/orders/")
+
+        numbers = sorted(order["number"] for order in response.json()["results"])
+        self.assertEqual(numbers, [both.number, legacy.number, assigned.number])
+        self.assertFalse(any("DISTINCT" in query["sql"] for query in queries))
+
+    def test_status_filter_applies_to_operator(self):
+        self._order("000001", operator=self.operator, status="COMPLETED")
+        self._order("000002", operator=self.operator)
+
+        response = self.api.get("/api/v1/orders/", {"status": "COMPLETED"})
+
+        self.assertEqual([order["number"] for order in response.json()["results"]], ["000001"])
@@ -8,34 +8,66 @@ from typing import Any
 import boto3
 from botocore.exceptions import BotoCoreError, NoCredentialsError
 from django.db import models, transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
 from django.utils import timezone
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
 from audit.models import AuditAction
-from audit.permissions import IsOwnerOrManager
+from audit.permissions import IsManagerOrAdmin, IsOwnerOrManager
 from audit.services import log_action
-from catalog.models import Equipment
+from catalog.cache import get_equipment_many
+from finance.exporters import STREAMING_FORMATS, streaming_export_response
 from finance.models import Expense, Invoice, SalaryRecord
-from finance.tasks import generate_invoice_pdf
+from finance.reports import filter_range
+from finance.services.facts import refresh_order_facts, remove_order_facts
+from finance.services.report_cache import invalidate_order_reports, invalidate_report_dates
+from finance.services.receipts import ensure_receipt, receipt_hash
+from finance.tasks import generate_invoice_pdf, generate_order_receipt
+from notifications.services.realtime import (
+    ORDER_COMPLETED,
+    ORDER_CREATED,
+    ORDER_DELETED,
+    ORDER_STATUS_CHANGED,
+    publish_order_event,
+)
 from notifications.tasks import notify_order_created, notify_order_status_changed
-from .models import Order, OrderItem, OrderStatus, OrderStatusLog, PhotoEvidence
+from ringo_backend.conditional import ConditionalGetMixin, queryset_version
+from .models import Order, OrderItem, OrderStatus, OrderStatusLog, OrderTombstone, PhotoEvidence
 from .serializers import (
     OrderAttachmentSerializer,
     OrderCompleteSerializer,
+    OrderListSerializer,
     OperatorSalariesUpdateSerializer,
     OrderPricePreviewSerializer,
     OrderSerializer,
     OrderStatusLogSerializer,
     OrderStatusSerializer,
 )
+from .services.exports import (
+    ORDER_LINE_EXPORT_HEADERS,
+    iter_order_line_rows,
+    iter_order_rows,
+    order_export_headers,
+)
+from .services.items import build_completion_item, load_catalog_refs, save_items
 from .services.pricing import calculate_order_total
+from .services.sync import InvalidCursor, changes_since, decode_cursor, encode_cursor
+from .services.visibility import visible_orders, visible_tombstones
 
 logger = logging.getLogger(__name__)
 
 
+def _related_aggregate(model, aggregate) -> Subquery:
+    """Агрегат по строкам, связанным с заказом, как подзапрос (без размножения строк заказа)."""
+    return Subquery(
+        model.objects.filter(order=OuterRef("pk")).order_by().values("order").annotate(value=aggregate).values("value")
+    )
+
+
 @extend_schema_view(
     list=extend_schema(
         summary="Список заявок",
@@ -68,34 +100,34 @@ logger = logging.getLogger(__name__)
         tags=["Orders"],
     ),
 )
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.select_related("client", "manager", "operator").prefetch_related("items", "status_logs")
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.select_related("client", "manager", "operator").prefetch_related("items", "operators")
     serializer_class = OrderSerializer
     permission_classes = [IsOwnerOrManager]
+
+    def get_serializer_class(self):
+        # Список отдаёт компактное представление без позиций и снимка расчёта
+        if self.action in ("list", "changes"):
+            return OrderListSerializer
+        return super().get_serializer_class()
     
     def perform_update(self, serializer: OrderSerializer) -> None:
         """Обработка обновления заявки с логированием ошибок"""
         try:
             instance = serializer.instance
             old_status = instance.status if instance else None
+            old_start_dt = instance.start_dt if instance else None
             
             # Сохраняем изменения
             order = serializer.save()
             
-            # Логируем изменение статуса, если оно произошло
+            # Завершённые заявки участвуют в отчётах - пересчитываем их показатели
+            if order.status == OrderStatus.COMPLETED or old_status == OrderStatus.COMPLETED:
+                refresh_order_facts(order)
+                invalidate_report_dates(order.created_at, order.start_dt, old_start_dt)
             if old_status and order.status != old_status:
-                log_action(
-                    actor=self.request.user,
-                    action=AuditAction.STATUS_CHANGE,
-                    entity_type="Order",
-                    entity_id=str(order.id),
-                    payload={
-                        "from_status": old_status,
-                        "to_status": order.status,
-                    },
-                    ip_address=self._get_client_ip(),
-                    user_agent=self.request.META.get("HTTP_USER_AGENT", ""),
-                    request_id=getattr(self.request, "request_id", None),
+                publish_order_event(
+                    order, ORDER_COMPLETED if order.status == OrderStatus.COMPLETED else ORDER_STATUS_CHANGED
                 )
         except Exception as e:
             logger.error(f"Error updating order: {e}", exc_info=True)
@@ -113,25 +145,74 @@ class OrderViewSet(viewsets.ModelViewSet):
             # Для остальных ошибок возвращаем успешный ответ, но логируем
             # Это позволит сохранить изменения даже если есть незначительные ошибки
 
+    def get_list_version(self, queryset):
+        # Операторы входят в представление списка, но их изменение не трогает updated_at заказа
+        operators = Order.operators.through.objects.filter(order__in=queryset.values("pk")).aggregate(
+            count=Count("pk"), ids=Sum("user_id")
+        )
+        return queryset_version(queryset), operators["count"], operators["ids"]
+
+    def get_etag_object(self):
+        # Одна строка без prefetch: версии позиций и операторов считаются подзапросами
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .annotate(
+                items_updated=_related_aggregate(OrderItem, Max("updated_at")),
+                items_count=_related_aggregate(OrderItem, Count("pk")),
+                operators_count=_related_aggregate(Order.operators.through, Count("pk")),
+                operators_ids=_related_aggregate(Order.operators.through, Sum("user_id")),
+                status_logs_count=_related_aggregate(OrderStatusLog, Count("pk")),
+            )
+        )
+        obj = get_object_or_404(queryset, pk=self.kwargs["pk"])
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_object_version(self, obj):
+        return (
+            obj.updated_at,
+            obj.items_updated,
+            obj.items_count,
+            obj.operators_count,
+            obj.operators_ids,
+            obj.status_logs_count,
+        )
+
+    def get_retrieve_object(self, etag_object):
+        return self.get_object()
+
+    def perform_destroy(self, instance: Order) -> None:
+        self._destroy_order(instance)
+
+    def _destroy_order(self, order: Order) -> None:
+        """Удаление заявки (DELETE и /delete/): с расходами, зарплатами и показателями отчётов."""
+        with transaction.atomic():
+            # Удаляем расходы, привязанные к этой заявке, чтобы они не учитывались в отчетах
+            # Расходы удаляются вместе с заявкой, так как они были созданы для этой заявки
+            Expense.objects.filter(order=order).delete()
+
+            # Удаляем зарплаты, привязанные к этой заявке, чтобы они не учитывались в отчетах
+            SalaryRecord.objects.filter(order=order).delete()
+
+            # Убираем заявку из предрасчитанных показателей отчётов
+            remove_order_facts(order)
+
+            # Событие собирается до удаления (нужны операторы), отправляется после коммита
+            publish_order_event(order, ORDER_DELETED)
+
+            # Полностью удаляем заявку из базы данных
+            # CASCADE удалит все связанные записи (items, status_logs, photos и т.д.)
+            order.delete()
+
+            # Инвалидируем кэш отчетов за период удалённой заявки
+            transaction.on_commit(lambda: invalidate_order_reports(order))
+
     def get_queryset(self):
         qs = super().get_queryset()
-        user = self.request.user
-
-        # Фильтрация по ролям
-        if user.is_authenticated:
-            if user.role == "admin" or user.is_superuser:
-                # Админ видит всё
-                pass
-            elif user.role == "manager":
-                # Менеджер видит все заявки (как администратор)
-                pass
-            elif user.role == "operator":
-                # Оператор видит только назначенные ему заявки (из operators или старый operator)
-                from django.db.models import Q
-                qs = qs.filter(Q(operators=user) | Q(operator=user)).distinct()
-            else:
-                # Остальные не видят ничего
-                qs = qs.none()
+
+        # Фильтрация по ролям: админ и менеджер видят всё, оператор - назначенные ему заявки
+        qs = visible_orders(qs, self.request.user)
 
         # Исключаем заявки со статусом DELETED (если они еще есть в БД)
         # DELETED статус больше не поддерживается, но могут быть старые записи
@@ -140,24 +221,21 @@ class OrderViewSet(viewsets.ModelViewSet):
         status_param = self.request.query_params.get("status")
         if status_param:
             qs = qs.filter(status=status_param)
+
+        if self.action in ("list", "changes"):
+            # Позиции в списке не нужны: оставляем только операторов (один запрос на страницу)
+            qs = qs.prefetch_related(None).prefetch_related("operators")
+        elif self.action == "calculate_preview":
+            # Предпросмотр считает позиции из формы: связанные строки заявки не нужны
+            qs = qs.prefetch_related(None)
         return qs
 
     def perform_create(self, serializer: OrderSerializer) -> None:
         try:
             order = serializer.save()
-            # Логирование создания заказа
-            log_action(
-                actor=self.request.user,
-                action=AuditAction.CREATE,
-                entity_type="Order",
-                entity_id=str(order.id),
-                payload={"number": order.number, "status": order.status, "total_amount": str(order.total_amount)},
-                ip_address=self._get_client_ip(),
-                user_agent=self.request.META.get("HTTP_USER_AGENT", ""),
-                request_id=getattr(self.request, "request_id", None),
-            )
             # Уведомление о создании заказа
             notify_order_created.delay(str(order.id))
+            publish_order_event(order, ORDER_CREATED)
         except Exception as e:
             logger.error(f"Error creating order: {e}", exc_info=True)
             logger.error(f"Request data: {self.request.data}")
@@ -185,22 +263,20 @@ class OrderViewSet(viewsets.ModelViewSet):
             self._validate_status_transition(order.status, target_status)
         except ValueError as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        old_status = order.status
         OrderStatusLog.objects.create(
             order=order,
-            from_status=order.status,
+            from_status=old_status,
             to_status=target_status,
             actor=request.user,
             comment=serializer.validated_data.get("comment", ""),
             attachment_url=serializer.validated_data.get("attachment_url", ""),
         )
-        old_status = order.status
         order.status = target_status
         # end_dt устанавливается только при завершении через /complete/
-        order.save(update_fields=["status"])
+        order.save(update_fields=["status", "updated_at"])
         
-        # Финансовые записи создаются только при завершении через /complete/
-        
-        # Логирование изменения статуса
+        # Логирование изменения статуса (IP, user agent и request_id — из контекста запроса)
         log_action(
             actor=request.user,
             action=AuditAction.STATUS_CHANGE,
@@ -211,11 +287,11 @@ class OrderViewSet(viewsets.ModelViewSet):
                 "to_status": target_status,
                 "comment": serializer.validated_data.get("comment", ""),
             },
-            ip_address=self._get_client_ip(),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
-            request_id=getattr(request, "request_id", None),
         )
+        
+        # Финансовые записи создаются только при завершении через /complete/
         # Уведомление об изменении статуса
+        publish_order_event(order, ORDER_STATUS_CHANGED)
         notify_order_status_changed.delay(
             str(order.id),
             target_status,
@@ -251,7 +327,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Unable to generate upload URL"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         key = signed["fields"]["key"]
         order.attachments.append({"key": key, "uploaded_by": request.user.id})
-        order.save(update_fields=["attachments"])
+        order.save(update_fields=["attachments", "updated_at"])
         # Логирование загрузки файла
         log_action(
             actor=request.user,
@@ -259,15 +335,12 @@ class OrderViewSet(viewsets.ModelViewSet):
             entity_type="Order",
             entity_id=str(order.id),
             payload={"file_name": serializer.validated_data["file_name"], "s3_key": key},
-            ip_address=self._get_client_ip(),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
-            request_id=getattr(request, "request_id", None),
         )
         return Response(signed)
 
     @extend_schema(
         summary="Предпросмотр расчёта стоимости",
-        description="Рассчитать стоимость заявки без сохранения. Возвращает snapshot с детализацией.",
+        description="Рассчитать стоимость заявки без сохранения. Возвращает snapshot с детализацией. Ставки берутся из кэша справочника.",
         request=OrderPricePreviewSerializer,
         responses={
             200: {"description": "Snapshot расчёта стоимости"},
@@ -279,7 +352,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         order = self.get_object()
         serializer = OrderPricePreviewSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        snapshot = serializer.create_snapshot()
+        snapshot = serializer.create_snapshot(order)
         return Response(snapshot)
 
     @extend_schema(
@@ -340,134 +413,20 @@ class OrderViewSet(viewsets.ModelViewSet):
                     # Удаляем старые items, если есть
                     order.items.all().delete()
                     
-                    # Добавляем новые items из формы завершения
+                    # Добавляем новые items из формы завершения: справочник читается
+                    # одним запросом на тип, позиции пишутся одним bulk_create
+                    refs = load_catalog_refs(items_data)
+                    new_items = []
                     for item_data in items_data:
                         try:
-                            # Нормализуем item_type для сравнения (может быть строкой или enum)
-                            item_type = item_data.get("item_type")
-                            if isinstance(item_type, OrderItem.ItemType):
-                                item_type_str = item_type.value
-                            elif hasattr(item_type, 'value'):
-                                item_type_str = item_type.value
-                            else:
-                                item_type_str = str(item_type).lower()
-                            
-                            # Для техники получаем данные из Equipment и используем введенные пользователем смены/часы
-                            if item_type_str == "equipment":
-                                try:
-                                    equipment = Equipment.objects.get(id=item_data["ref_id"])
-                                    
-                                    # Получаем смены и часы из metadata (введенные пользователем)
-                                    metadata = item_data.get("metadata", {})
-                                    if not isinstance(metadata, dict):
-                                        metadata = {}
-                                    shifts = Decimal(str(metadata.get("shifts", 0) or 0))
-                                    hours = Decimal(str(metadata.get("hours", 0) or 0))
-                                    
-                                    # Сохраняем информацию о сменах и часах в metadata
-                                    item_data["metadata"] = {
-                                        **metadata,
-                                        "shifts": float(shifts),
-                                        "hours": float(hours),
-                                        "daily_rate": float(equipment.daily_rate or 0),
-                                    }
-                                    
-                                    # Устанавливаем обязательные поля с правильными типами
-                                    # ВАЖНО: quantity для техники НЕ преобразуем смены в часы!
-                                    # Используем сумму смен и часов только для визуального представления
-                                    # Реальные расчеты выполняются через metadata (shifts, hours, daily_rate)
-                                    # и line_total из сериализатора
-                                    quantity_for_display = shifts + hours  # Просто сумма, не преобразование!
-                                    
-                                    # Получаем расходы на топливо для данной техники
-                                    fuel_expense = item_data.get("fuel_expense")
-                                    fuel_expense_decimal = None
-                                    if fuel_expense is not None:
-                                        fuel_expense_decimal = Decimal(str(fuel_expense))
-                                    
-                                    # Получаем расходы на ремонт техники
-                                    repair_expense = item_data.get("repair_expense")
-                                    repair_expense_decimal = None
-                                    if repair_expense is not None:
-                                        repair_expense_decimal = Decimal(str(repair_expense))
-                                    
-                                    OrderItem.objects.create(
-                                        order=order,
-                                        item_type=OrderItem.ItemType.EQUIPMENT,
-                                        ref_id=item_data["ref_id"],
-                                        name_snapshot=equipment.name,
-                                        quantity=Decimal(str(quantity_for_display)),
-                                        unit="hour",  # Единица для совместимости, но не используется для расчетов
-                                        unit_price=Decimal(str(equipment.hourly_rate or 0)),
-                                        tax_rate=Decimal(str(item_data.get("tax_rate", 0.0))),
-                                        discount=Decimal(str(item_data.get("discount", 0.0))),
-                                        fuel_expense=fuel_expense_decimal,
-                                        repair_expense=repair_expense_decimal,
-                                        metadata=item_data["metadata"],
-                                    )
-                                except Equipment.DoesNotExist:
-                                    logger.warning(f"Equipment with id {item_data.get('ref_id')} not found, skipping item")
-                                    continue
-                                except Exception as e:
-                                    logger.error(f"Error creating equipment item: {e}", exc_info=True)
-                                    raise
-                            # Для материалов (грунт, инструменты, навески) получаем данные из MaterialItem
-                            elif item_type_str == "material":
-                                try:
-                                    from catalog.models import MaterialItem
-                                    material = MaterialItem.objects.get(id=item_data["ref_id"])
-                                    
-                                    # Сохраняем категорию материала в metadata для правильного отображения
-                                    metadata = item_data.get("metadata", {})
-                                    if not isinstance(metadata, dict):
-                                        metadata = {}
-                                    metadata["material_category"] = material.category
-                                    
-                                    # Устанавливаем обязательные поля с правильными типами
-                                    OrderItem.objects.create(
-                                        order=order,
-                                        item_type=OrderItem.ItemType.MATERIAL,
-                                        ref_id=item_data["ref_id"],
-                                        name_snapshot=material.name,
-                                        quantity=Decimal(str(item_data.get("quantity", 1.0))),
-                                        unit=material.unit,
-                                        unit_price=Decimal(str(material.price)),
-                                        tax_rate=Decimal(str(item_data.get("tax_rate", 0.0))),
-                                        discount=Decimal(str(item_data.get("discount", 0.0))),
-                                        metadata=metadata,
-                                    )
-                                except MaterialItem.DoesNotExist:
-                                    logger.warning(f"MaterialItem with id {item_data.get('ref_id')} not found, skipping item")
-                                    continue
-                                except Exception as e:
-                                    logger.error(f"Error creating material item: {e}", exc_info=True)
-                                    raise
-                            else:
-                                # Для других типов (если есть) просто создаем как есть
-                                item_type_enum = OrderItem.ItemType.EQUIPMENT  # По умолчанию
-                                if isinstance(item_data.get("item_type"), str):
-                                    try:
-                                        item_type_enum = OrderItem.ItemType(item_data["item_type"])
-                                    except (ValueError, KeyError):
-                                        logger.warning(f"Unknown item_type: {item_data.get('item_type')}, using EQUIPMENT")
-                                
-                                # Устанавливаем значения по умолчанию для обязательных полей
-                                OrderItem.objects.create(
-                                    order=order,
-                                    item_type=item_type_enum,
-                                    ref_id=item_data.get("ref_id"),
-                                    name_snapshot=item_data.get("name_snapshot", "Не указано"),
-                                    quantity=Decimal(str(item_data.get("quantity", 1.0))),
-                                    unit=item_data.get("unit", "pcs"),
-                                    unit_price=Decimal(str(item_data.get("unit_price", 0.0))),
-                                    tax_rate=Decimal(str(item_data.get("tax_rate", 0.0))),
-                                    discount=Decimal(str(item_data.get("discount", 0.0))),
-                                    metadata=item_data.get("metadata", {}),
-                                )
+                            item = build_completion_item(order, item_data, refs)
                         except Exception as e:
                             logger.error(f"Error processing item: {item_data}, error: {e}", exc_info=True)
                             # Продолжаем обработку других items, но логируем ошибку
                             continue
+                        if item is not None:
+                            new_items.append(item)
+                    save_items(order, new_items)
                     
                     # Если items были добавлены, пересчитываем стоимость по номенклатуре
                     if len(items_data) > 0:
@@ -485,7 +444,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 # Обновляем статус
                 old_status = order.status
                 order.status = OrderStatus.COMPLETED
-                order.save(update_fields=["end_dt", "status", "total_amount"])
+                order.save(update_fields=["end_dt", "status", "total_amount", "price_snapshot", "updated_at"])
                 
                 # Логируем изменение статуса
                 OrderStatusLog.objects.create(
@@ -496,9 +455,6 @@ class OrderViewSet(viewsets.ModelViewSet):
                     comment=serializer.validated_data.get("comment", ""),
                 )
                 
-                # Создаем финансовые записи
-                self._create_financial_records(order, serializer.validated_data, request.user)
-                
                 # Логирование в аудит
                 log_action(
                     actor=request.user,
@@ -511,17 +467,25 @@ class OrderViewSet(viewsets.ModelViewSet):
                         "comment": serializer.validated_data.get("comment", ""),
                         "total_amount": str(order.total_amount),
                     },
-                    ip_address=self._get_client_ip(),
-                    user_agent=request.META.get("HTTP_USER_AGENT", ""),
-                    request_id=getattr(request, "request_id", None),
                 )
                 
+                # Создаем финансовые записи
+                self._create_financial_records(order, serializer.validated_data, request.user)
+                
+                # Обновляем предрасчитанные показатели отчётов
+                refresh_order_facts(order)
+                
                 # Уведомление о завершении заявки
                 notify_order_status_changed.delay(str(order.id), old_status, OrderStatus.COMPLETED)
+                publish_order_event(order, ORDER_COMPLETED)
                 
-                # Очищаем кэш отчетов для обновления данных на главном экране
-                from finance.api import clear_reports_cache
-                clear_reports_cache()
+                # Чек строится фоном один раз; GET receipt отдаёт сохранённый файл
+                order_id = str(order.id)
+                transaction.on_commit(lambda: generate_order_receipt.delay(order_id))
+                
+                # Инвалидируем кэш отчетов за период заявки для обновления данных на главном экране.
+                # После коммита: иначе параллельный запрос успеет закэшировать отчёт без этой заявки
+                transaction.on_commit(lambda: invalidate_order_reports(order))
         except Exception as e:
             logger.error(f"Error completing order {order.id}: {e}", exc_info=True)
             return Response(
@@ -556,7 +520,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         order = self.get_object()
         serializer = OperatorSalariesUpdateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self._create_financial_records(order, serializer.validated_data, request.user)
+        with transaction.atomic():
+            self._create_financial_records(order, serializer.validated_data, request.user)
+            refresh_order_facts(order)
+        invalidate_order_reports(order)
         return Response({"detail": "Salaries updated"}, status=status.HTTP_200_OK)
     
     @extend_schema(
@@ -572,7 +539,6 @@ class OrderViewSet(viewsets.ModelViewSet):
     def get_receipt(self, request, pk=None):
         """Генерирует PDF чек для завершенной заявки."""
         from django.http import HttpResponse
-        from finance.exporters import generate_order_receipt_pdf
         
         # Получаем заказ (get_object() использует queryset с оптимизацией)
         order = self.get_object()
@@ -583,9 +549,17 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        etag = f'"{receipt_hash(order)}"'
+        if etag in [tag.strip() for tag in request.META.get("HTTP_IF_NONE_MATCH", "").split(",")]:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            return response
+        
         try:
-            # Генерируем PDF
-            pdf_content = generate_order_receipt_pdf(order)
+            # Отдаём сохранённый чек; генерируем только если снимок расчёта изменился
+            receipt = ensure_receipt(order)
+            with receipt.pdf_file.open("rb") as pdf_file:
+                pdf_content = pdf_file.read()
             
             if not pdf_content or len(pdf_content) == 0:
                 logger.error(f"Generated PDF is empty for order {order.id}")
@@ -607,6 +581,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
             response["Content-Disposition"] = f'attachment; filename="{filename}"; filename*=UTF-8\'\'{encoded_filename}'
             response["Content-Length"] = str(len(pdf_content))
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"
             return response
         except ValueError as e:
             # ValueError - это наши кастомные ошибки с понятными сообщениями
@@ -624,6 +600,66 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @extend_schema(
+        summary="Выгрузка заявок",
+        description=(
+            "Потоковая выгрузка списка заявок (CSV/XLSX) с фильтрами status, from, to. "
+            "Параметр lines=1 выгружает позиции заявок. Требуется роль Manager/Admin."
+        ),
+        tags=["Orders"],
+    )
+    @action(detail=False, methods=["get"], url_path="export", permission_classes=[IsManagerOrAdmin])
+    def export(self, request):
+        """Выгружает заявки или их позиции потоком, не собирая файл в памяти воркера."""
+        export_format = request.query_params.get("export", "csv")
+        if export_format not in STREAMING_FORMATS:
+            return Response(
+                {"detail": f"Поддерживаемые форматы: {', '.join(STREAMING_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        orders = filter_range(
+            self.get_queryset(), "created_at", request.query_params.get("from"), request.query_params.get("to")
+        )
+        if request.query_params.get("lines") in ("1", "true"):
+            return streaming_export_response(
+                ORDER_LINE_EXPORT_HEADERS, iter_order_line_rows(orders), export_format, "order-lines"
+            )
+        return streaming_export_response(order_export_headers(), iter_order_rows(orders), export_format, "orders")
+
+    @extend_schema(
+        summary="Изменения заявок",
+        description=(
+            "Заявки, изменённые после курсора since, и ID удалённых заявок. "
+            "Курсор следующего запроса возвращается в поле cursor; без since отдаются все заявки по порядку изменения."
+        ),
+        parameters=[
+            OpenApiParameter("since", str, description="Курсор из предыдущего ответа"),
+            OpenApiParameter("limit", int, description="Максимум записей в ответе"),
+        ],
+        tags=["Orders"],
+    )
+    @action(detail=False, methods=["get"], url_path="changes")
+    def changes(self, request):
+        """Дельта-синхронизация: стоимость запроса зависит от числа изменений, а не от размера списка."""
+        try:
+            cursor = decode_cursor(request.query_params.get("since"))
+            limit = max(0, min(int(request.query_params.get("limit") or 0), 1000)) or None
+        except (InvalidCursor, ValueError):
+            return Response({"detail": "Некорректный курсор или limit"}, status=status.HTTP_400_BAD_REQUEST)
+
+        tombstones = visible_tombstones(OrderTombstone.objects.all(), request.user)
+        page = changes_since(self.get_queryset(), tombstones, cursor, limit)
+        return Response(
+            {
+                "results": OrderListSerializer(page.orders, many=True, context=self.get_serializer_context()).data,
+                "deleted": [
+                    {"id": str(tombstone.order_id), "deleted_at": tombstone.deleted_at} for tombstone in page.deleted
+                ],
+                "cursor": encode_cursor(page.cursor),
+                "has_more": page.has_more,
+            }
+        )
+
     @action(detail=True, methods=["post"], url_path="generate_invoice")
     def generate_invoice(self, request, pk=None):
         order = self.get_object()
@@ -654,59 +690,18 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Сохраняем информацию для логирования перед удалением
-        order_id = str(order.id)
+        # Номер нужен для ответа после удаления
         order_number = order.number
-        old_status = order.status
         
-        # Логирование в аудит перед удалением
-        log_action(
-            actor=request.user,
-            action=AuditAction.DELETE,
-            entity_type="Order",
-            entity_id=order_id,
-            payload={
-                "order_number": order_number,
-                "status": old_status,
-                "comment": f"Заявка {order_number} полностью удалена из базы данных",
-            },
-            ip_address=self._get_client_ip(),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
-            request_id=getattr(request, "request_id", None),
-        )
-        
-        # Удаляем расходы, привязанные к этой заявке, чтобы они не учитывались в отчетах
-        # Расходы удаляются вместе с заявкой, так как они были созданы для этой заявки
-        from finance.models import Expense, SalaryRecord
-        Expense.objects.filter(order=order).delete()
-        
-        # Удаляем зарплаты, привязанные к этой заявке, чтобы они не учитывались в отчетах
-        SalaryRecord.objects.filter(order=order).delete()
-        
-        # Полностью удаляем заявку из базы данных
-        # CASCADE удалит все связанные записи (items, status_logs, photos и т.д.)
-        order.delete()
-        
-        # Очищаем кэш отчетов для обновления данных
-        from finance.api import clear_reports_cache
-        clear_reports_cache()
+        self._destroy_order(order)
         
         return Response(
             {"detail": f"Заявка {order_number} успешно удалена из базы данных"},
             status=status.HTTP_200_OK
         )
 
-    def _get_client_ip(self) -> str | None:
-        """Получение IP адреса клиента"""
-        x_forwarded_for = self.request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            return x_forwarded_for.split(",")[0].strip()
-        return self.request.META.get("REMOTE_ADDR")
-
     def _create_financial_records(self, order: Order, validated_data: dict[str, Any], user) -> None:
         """Создает или обновляет финансовые записи (расходы и зарплату) для заявки."""
-        from decimal import Decimal
-        from django.db import transaction
         from users.models import User
         
         with transaction.atomic():
@@ -768,37 +763,37 @@ class OrderViewSet(viewsets.ModelViewSet):
             
             # Создаем расходы на топливо и ремонт для каждой техники отдельно
             # Проходим по всем позициям техники и создаем расходы для каждой
-            equipment_items = order.items.filter(item_type=OrderItem.ItemType.EQUIPMENT)
+            equipment_items = [
+                item for item in order.items.filter(item_type=OrderItem.ItemType.EQUIPMENT) if item.ref_id
+            ]
+            equipment_by_id = get_equipment_many(item.ref_id for item in equipment_items)
             for item in equipment_items:
-                if not item.ref_id:
-                    continue
-                try:
-                    equipment = Equipment.objects.get(id=item.ref_id)
-                    # Создаем расходы на топливо
-                    if item.fuel_expense and item.fuel_expense > 0:
-                        Expense.objects.create(
-                            order=order,
-                            equipment=equipment,
-                            category="fuel",
-                            amount=item.fuel_expense,
-                            date=timezone.now().date(),
-                            comment=f"Расходы на топливо для техники {equipment.name} (заказ {order.number})",
-                            reported_by=user,
-                        )
-                    # Создаем расходы на ремонт
-                    if item.repair_expense and item.repair_expense > 0:
-                        Expense.objects.create(
-                            order=order,
-                            equipment=equipment,
-                            category="repair",
-                            amount=item.repair_expense,
-                            date=timezone.now().date(),
-                            comment=f"Расходы на ремонт техники {equipment.name} (заказ {order.number})",
-                            reported_by=user,
-                        )
-                except Equipment.DoesNotExist:
+                equipment = equipment_by_id.get(item.ref_id)
+                if equipment is None:
                     logger.warning(f"Equipment with id {item.ref_id} not found for expense")
                     continue
+                # Создаем расходы на топливо
+                if item.fuel_expense and item.fuel_expense > 0:
+                    Expense.objects.create(
+                        order=order,
+                        equipment=equipment,
+                        category="fuel",
+                        amount=item.fuel_expense,
+                        date=timezone.now().date(),
+                        comment=f"Расходы на топливо для техники {equipment.name} (заказ {order.number})",
+                        reported_by=user,
+                    )
+                # Создаем расходы на ремонт
+                if item.repair_expense and item.repair_expense > 0:
+                    Expense.objects.create(
+                        order=order,
+                        equipment=equipment,
+                        category="repair",
+                        amount=item.repair_expense,
+                        date=timezone.now().date(),
+                        comment=f"Расходы на ремонт техники {equipment.name} (заказ {order.number})",
+                        reported_by=user,
+                    )
 
     def _validate_status_transition(self, current: str, new: str) -> None:
         """Валидация перехода статуса. Завершение (COMPLETED) должно происходить через endpoint /complete/"""
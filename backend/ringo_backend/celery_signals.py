@@ -3,23 +3,61 @@ Celery signals для сбора Prometheus метрик задач.
 """
 from __future__ import annotations
 
+import logging
+import os
 import time
+
 from celery.signals import (
+    before_task_publish,
+    celeryd_init,
     task_prerun,
     task_postrun,
     task_failure,
     task_success,
     task_retry,
+    worker_process_shutdown,
+    worker_ready,
 )
+from django.conf import settings
 
+from ringo_backend import request_context
 from ringo_backend.prometheus import (
     celery_tasks_total,
     celery_task_duration_seconds,
+    mark_process_dead,
+    prepare_multiprocess_dir,
+    process_registry,
 )
 
+logger = logging.getLogger(__name__)
+
 
 # Глобальный словарь для хранения времени начала выполнения задач
 _task_start_times = {}
+# Токены контекста запроса, восстановленного из заголовков задачи
+_task_context_tokens = {}
+
+
+@before_task_publish.connect
+def propagate_request_context(sender=None, headers=None, **kwargs):
+    """Передаём request_id и пользователя запроса в заголовках задачи."""
+    if headers is not None:
+        for name, value in request_context.task_headers().items():
+            headers.setdefault(name, value)
+
+
+@task_prerun.connect
+def restore_request_context(sender=None, task_id=None, task=None, **kwargs):
+    """Восстанавливаем контекст запроса, из которого была поставлена задача."""
+    if task is not None:
+        _task_context_tokens[task_id] = request_context.activate(request_context.context_from_task(task.request))
+
+
+@task_postrun.connect
+def reset_request_context(sender=None, task_id=None, **kwargs):
+    token = _task_context_tokens.pop(task_id, None)
+    if token is not None:
+        request_context.deactivate(token)
 
 
 @task_prerun.connect
@@ -65,3 +103,29 @@ def task_retry_handler(sender=None, **kwargs):
     task_name = sender.name if sender else "unknown"
     celery_tasks_total.labels(task_name=task_name, status="retry").inc()
 
+
+
+@celeryd_init.connect
+def reset_multiprocess_metrics(**kwargs):
+    """Очищаем каталог метрик прошлого запуска до форка дочерних процессов."""
+    prepare_multiprocess_dir()
+
+
+@worker_ready.connect
+def start_metrics_server(**kwargs):
+    """Отдаём метрики всех дочерних процессов воркера на PROMETHEUS["celery_metrics_port"]."""
+    port = int(getattr(settings, "PROMETHEUS", {}).get("celery_metrics_port") or 0)
+    if not port:
+        return
+    from prometheus_client import start_http_server
+
+    try:
+        start_http_server(port, registry=process_registry())
+    except OSError as exc:
+        logger.warning("Failed to start Celery metrics server on port %s: %s", port, exc)
+
+
+@worker_process_shutdown.connect
+def forget_worker_process(pid=None, **kwargs):
+    """Live-gauge завершившегося дочернего процесса больше не учитываются."""
+    mark_process_dead(pid or os.getpid())
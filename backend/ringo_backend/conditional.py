@@ -0,0 +1,111 @@
+"""
+Условные GET-запросы: слабые ETag и ответ 304 до сериализации.
+
+ETag строится из дешёвой «версии» данных (updated_at, количества строк,
+версии кэша отчёта), которая считается агрегатным запросом вместо загрузки
+и сериализации объектов.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def weak_etag(*parts: Any) -> str:
+    digest = hashlib.md5(repr(parts).encode("utf-8"), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag: str) -> bool:
+    """Слабое сравнение If-None-Match (RFC 9110): префикс W/ не учитывается."""
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    expected = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == expected for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag: str):
+    if 200 <= response.status_code < 300 or response.status_code == status.HTTP_304_NOT_MODIFIED:
+        response["ETag"] = etag
+        # Данные зависят от пользователя (роль фильтрует заказы)
+        patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+def queryset_version(queryset, field: str = "updated_at", related: tuple[str, ...] = ()) -> tuple:
+    """
+    Версия набора строк: последнее изменение и количество (ловит и удаления).
+
+    related — пути к updated_at связанных объектов, попадающих в ответ (например, "category__updated_at").
+    """
+    aggregates = {"last": Max(field), "count": Count("pk")}
+    aggregates.update({f"related_{index}": Max(path) for index, path in enumerate(related)})
+    aggregate = queryset.order_by().aggregate(**aggregates)
+    return tuple(aggregate[name] for name in aggregates)
+
+
+def object_version(obj, field: str = "updated_at", related: tuple[str, ...] = ()) -> tuple:
+    values = [getattr(obj, field, None)]
+    for path in related:
+        value = obj
+        for attr in path.split("__"):
+            value = getattr(value, attr, None) if value is not None else None
+        values.append(value)
+    return tuple(values)
+
+
+class ConditionalGetMixin:
+    """
+    ETag и 304 для list/retrieve у ModelViewSet.
+
+    Версия списка по умолчанию — (max(updated_at), count) отфильтрованного queryset,
+    объекта — его updated_at; etag_related добавляет updated_at связанных объектов.
+    Наследники уточняют get_list_version/get_object_version.
+    """
+
+    etag_related: tuple[str, ...] = ()
+
+    def _etag_scope(self) -> tuple:
+        user = getattr(self.request, "user", None)
+        return (self.request.get_full_path(), getattr(user, "pk", None))
+
+    def get_list_version(self, queryset) -> Any:
+        return queryset_version(queryset, related=self.etag_related)
+
+    def get_object_version(self, obj) -> Any:
+        return object_version(obj, related=self.etag_related)
+
+    def get_etag_object(self):
+        """Объект для расчёта версии (права проверяются здесь же)."""
+        return self.get_object()
+
+    def get_retrieve_object(self, etag_object):
+        """Объект для сериализации; наследник с облегчённым get_etag_object загружает полный."""
+        return etag_object
+
+    def list(self, request, *args, **kwargs):
+        etag = weak_etag(self._etag_scope(), self.get_list_version(self.filter_queryset(self.get_queryset())))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return with_etag(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag_object = self.get_etag_object()
+        etag = weak_etag(self._etag_scope(), self.get_object_version(etag_object))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        serializer = self.get_serializer(self.get_retrieve_object(etag_object))
+        return with_etag(Response(serializer.data), etag)
@@ -1,9 +1,28 @@
 """
-Health check endpoint для мониторинга состояния API.
-Используется в load balancer, CI/CD и системах мониторинга.
+Health check endpoints для мониторинга состояния API.
+Используются в load balancer, CI/CD и системах мониторинга.
+
+    /api/live/    - процесс жив и отвечает; без обращений к БД, Redis и Celery
+    /api/ready/   - готовность принимать трафик: БД, Redis (брокер) и Celery
+    /api/health/  - то же, что /api/ready/ (для существующих проверок)
+
+Проверки готовности выполняются параллельно с таймаутом HEALTH_CHECKS["timeout"]
+фоновым потоком процесса раз в HEALTH_CHECKS["interval"] секунд; запрос
+отдаёт последний результат. Опрос воркеров Celery - широковещательный ping,
+поэтому он повторяется не чаще HEALTH_CHECKS["celery_interval"] секунд и не
+влияет на итоговый статус.
 """
 from __future__ import annotations
 
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable
+
+from django.conf import settings
 from django.db import connection
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
@@ -12,78 +31,186 @@ from django.views.decorators.cache import never_cache
 import redis
 from celery import current_app
 
+logger = logging.getLogger(__name__)
+
+SERVICE = {"service": "ringo-backend", "version": "1.0.0"}
+
+
+def _config() -> dict:
+    return getattr(settings, "HEALTH_CHECKS", {})
+
+
+# --- проверки -------------------------------------------------------------------
+
+
+def check_database() -> dict[str, Any]:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    finally:
+        # Поток проверок долгоживущий: соединение закрывается по тем же правилам, что после запроса
+        connection.close_if_unusable_or_obsolete()
+    return {"status": "healthy"}
+
+
+_redis_lock = threading.Lock()
+_redis_client: redis.Redis | None = None
+
+
+def redis_client() -> redis.Redis:
+    """Клиент брокера с общим пулом соединений процесса."""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                timeout = float(_config().get("timeout", 2.0))
+                _redis_client = redis.Redis.from_url(
+                    current_app.conf.broker_url, socket_connect_timeout=timeout, socket_timeout=timeout
+                )
+    return _redis_client
+
+
+def check_redis() -> dict[str, Any]:
+    if not current_app.conf.broker_url.startswith(("redis://", "rediss://", "unix://")):
+        return {"status": "unknown", "message": "Non-redis broker"}
+    redis_client().ping()
+    return {"status": "healthy"}
+
+
+def check_celery() -> dict[str, Any]:
+    replies = current_app.control.ping(timeout=float(_config().get("timeout", 2.0)) / 2)
+    if replies:
+        return {"status": "healthy", "active_workers": len(replies)}
+    return {"status": "warning", "message": "No active workers"}
+
+
+# Проверка -> влияет ли её сбой на готовность
+CRITICAL_CHECKS: dict[str, bool] = {"database": True, "redis": True, "celery": False}
+
+
+# --- кэш готовности ---------------------------------------------------------------
+
+
+class Readiness:
+    """Последний результат проверок готовности и фоновый поток, который его обновляет."""
+
+    def __init__(self, checks: dict[str, Callable[[], dict[str, Any]]]):
+        self.checks = checks
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._refresher: threading.Thread | None = None
+        self._pid: int | None = None
+        self.snapshot: dict[str, Any] | None = None
+        self.checked_at = 0.0
+        self._celery: tuple[float, dict[str, Any]] | None = None
+        # Незавершённая проверка не запускается повторно: потоки не копятся за зависшей зависимостью
+        self._inflight: dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # После fork (gunicorn) потоки родителя не существуют: запускаем свои
+        if self._pid == os.getpid() and self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._refresher is not None and self._refresher.is_alive():
+                return
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=len(self.checks), thread_name_prefix="readiness-check")
+            self._refresher = threading.Thread(target=self._run, name="readiness-refresher", daemon=True)
+            self._refresher.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Readiness refresh failed")
+            time.sleep(float(_config().get("interval", 5.0)))
+
+    def _should_run(self, name: str) -> bool:
+        if name != "celery":
+            return True
+        if not _config().get("celery", True):
+            return False
+        interval = float(_config().get("celery_interval", 60.0))
+        return self._celery is None or time.monotonic() - self._celery[0] >= interval
+
+    def refresh(self) -> dict[str, Any]:
+        """
+        Выполняет проверки параллельно и сохраняет результат.
+
+        Проверка, не завершившаяся с прошлого раза, не перезапускается: её ждут до
+        нового дедлайна и при необходимости снова отдают как таймаут.
+        """
+        executor = self._executor or ThreadPoolExecutor(max_workers=len(self.checks))
+        self._executor = executor
+        timeout = float(_config().get("timeout", 2.0))
+        futures: dict[str, Future] = {}
+        with self._inflight_lock:
+            for name, check in self.checks.items():
+                if not self._should_run(name):
+                    continue
+                future = self._inflight.get(name)
+                if future is None or future.done():
+                    future = self._inflight[name] = executor.submit(check)
+                futures[name] = future
+        deadline = time.monotonic() + timeout
+
+        results: dict[str, dict[str, Any]] = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                results[name] = {"status": "unhealthy", "error": f"timeout after {timeout}s"}
+            except Exception as exc:
+                results[name] = {"status": "unhealthy", "error": str(exc)}
+        if "celery" in results:
+            self._celery = (time.monotonic(), results["celery"])
+        elif self._celery is not None:
+            results["celery"] = self._celery[1]
+
+        healthy = all(
+            result["status"] != "unhealthy" for name, result in results.items() if CRITICAL_CHECKS.get(name, True)
+        )
+        snapshot = {"status": "healthy" if healthy else "unhealthy", **SERVICE, "checks": results}
+        self.snapshot, self.checked_at = snapshot, time.monotonic()
+        return snapshot
+
+    def current(self) -> dict[str, Any]:
+        """Последний результат; синхронная проверка, если его нет или фоновый поток отстал."""
+        self._ensure_started()
+        max_age = float(_config().get("interval", 5.0)) * 3
+        if self.snapshot is None or time.monotonic() - self.checked_at > max_age:
+            return self.refresh()
+        return self.snapshot
+
+
+readiness = Readiness({"database": check_database, "redis": check_redis, "celery": check_celery})
+
+
+# --- endpoints ------------------------------------------------------------------------
+
 
 @never_cache
-@require_http_methods(["GET"])
-def health_check(request):
+@require_http_methods(["GET", "HEAD"])
+def liveness_check(request):
+    """Процесс отвечает на запросы. Внешние зависимости не проверяются."""
+    return JsonResponse({"status": "alive", **SERVICE})
+
+
+@never_cache
+@require_http_methods(["GET", "HEAD"])
+def readiness_check(request):
     """
-    Health check endpoint.
-    
+    Готовность к трафику (результат фоновых проверок не старше нескольких секунд).
+
     Returns:
-        - 200 OK: Все системы работают
+        - 200 OK: БД и Redis доступны
         - 503 Service Unavailable: Проблемы с зависимостями
     """
-    status = {
-        "status": "healthy",
-        "service": "ringo-backend",
-        "version": "1.0.0",
-    }
-    
-    checks = {}
-    overall_healthy = True
-    
-    # Проверка базы данных
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-        checks["database"] = {"status": "healthy"}
-    except Exception as e:
-        checks["database"] = {"status": "unhealthy", "error": str(e)}
-        overall_healthy = False
-    
-    # Проверка Redis (Celery broker)
-    try:
-        broker_url = current_app.conf.broker_url
-        if broker_url.startswith("redis://"):
-            # Извлекаем параметры подключения из URL
-            import urllib.parse
-            parsed = urllib.parse.urlparse(broker_url)
-            redis_client = redis.Redis(
-                host=parsed.hostname or "localhost",
-                port=parsed.port or 6379,
-                db=int(parsed.path.lstrip("/")) if parsed.path else 0,
-                socket_connect_timeout=2,
-            )
-            redis_client.ping()
-            checks["redis"] = {"status": "healthy"}
-        else:
-            checks["redis"] = {"status": "unknown", "message": "Non-redis broker"}
-    except Exception as e:
-        checks["redis"] = {"status": "unhealthy", "error": str(e)}
-        overall_healthy = False
-    
-    # Проверка Celery workers
-    try:
-        inspect = current_app.control.inspect()
-        active_workers = inspect.active()
-        if active_workers:
-            checks["celery"] = {
-                "status": "healthy",
-                "active_workers": len(active_workers),
-            }
-        else:
-            checks["celery"] = {"status": "warning", "message": "No active workers"}
-    except Exception as e:
-        checks["celery"] = {"status": "unhealthy", "error": str(e)}
-        # Не считаем это критичным для health check
-        # overall_healthy = False
-    
-    status["checks"] = checks
-    
-    if not overall_healthy:
-        status["status"] = "unhealthy"
-        return JsonResponse(status, status=503)
-    
-    return JsonResponse(status, status=200)
+    snapshot = readiness.current()
+    return JsonResponse(snapshot, status=200 if snapshot["status"] == "healthy" else 503)
+
 
+health_check = readiness_check
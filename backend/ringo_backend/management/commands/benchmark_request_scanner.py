@@ -0,0 +1,71 @@
+"""
+Микробенчмарк сканера параметров запроса.
+Использование: python manage.py benchmark_request_scanner [--iterations 5000]
+
+Сравнивает накладные расходы на запрос прежней схемы (три middleware, каждое
+значение по каждому шаблону отдельно, разбор request.POST для любого POST) и
+RequestScannerMiddleware на одинаковом наборе запросов. Параметры url/link/...
+в наборе не используются: DNS-запросы SSRF-проверки в замер не входят.
+"""
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from ringo_backend.middleware.security import SCAN_RULES, RequestScannerMiddleware
+
+LEGACY_PATTERNS = [re.compile(pattern, re.IGNORECASE) for _, _, pattern in SCAN_RULES]
+
+
+def _ok(request):
+    return HttpResponse()
+
+
+def legacy_scan(request) -> None:
+    """Проверки прежних SQLInjection- и XSSProtectionMiddleware."""
+    for params in (request.GET, request.POST if request.method == "POST" else {}):
+        for value in params.values():
+            for pattern in LEGACY_PATTERNS:
+                pattern.search(value)
+
+
+class Command(BaseCommand):
+    help = "Сравнить накладные расходы сканера параметров до и после"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000, help="Повторов набора запросов")
+
+    def _requests(self):
+        factory = RequestFactory()
+        description = "Аренда экскаватора на 3 дня, выезд на объект в пригороде " * 4
+        return [
+            factory.get("/api/v1/orders/", {"search": "Иванов", "status": "COMPLETED", "page": "2"}),
+            factory.get("/api/v1/reports/summary/", {"from": "2025-01-01", "to": "2025-01-31"}),
+            factory.post(
+                "/api/v1/orders/", data={"address": "ул. Ленина, 1", "description": description},
+                content_type="application/json",
+            ),
+            factory.get("/admin/orders/order/", {"q": "000123", "status__exact": "CREATED"}),
+            factory.post("/admin/orders/order/1/change/", {"description": description, "address": "ул. Ленина, 1"}),
+            factory.get("/admin/orders/order/", {"q": "x" * 5000}),
+        ]
+
+    def _measure(self, handler, requests, iterations: int) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for request in requests:
+                handler(request)
+        return (time.perf_counter() - started) / (iterations * len(requests)) * 1_000_000
+
+    def handle(self, *args, **options):
+        iterations = max(options["iterations"], 1)
+        scanner = RequestScannerMiddleware(_ok)
+        # Разбор GET/POST кэшируется в запросе: замер показывает стоимость проверок, а не разбора
+        legacy = self._measure(legacy_scan, self._requests(), iterations)
+        current = self._measure(scanner, self._requests(), iterations)
+
+        self.stdout.write(f"До:    {legacy:.1f} мкс на запрос")
+        self.stdout.write(f"После: {current:.1f} мкс на запрос")
+        self.stdout.write(self.style.SUCCESS(f"Ускорение: x{legacy / current:.1f}"))
@@ -7,9 +7,7 @@ from .audit_log import AuditLogMiddleware
 try:
     from .security import (
         IPAllowlistMiddleware,
-        SQLInjectionProtectionMiddleware,
-        XSSProtectionMiddleware,
-        SSRFProtectionMiddleware,
+        RequestScannerMiddleware,
     )
 except ImportError as e:
     import logging
@@ -18,6 +16,7 @@ except ImportError as e:
 
 try:
     from .metrics import PrometheusMetricsMiddleware
+    from .query_profiler import QueryProfilerMiddleware
 except ImportError as e:
     import logging
     logger = logging.getLogger(__name__)
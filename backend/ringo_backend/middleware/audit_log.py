@@ -6,12 +6,16 @@ from typing import Callable
 
 from django.http import HttpRequest, HttpResponse
 
+from audit.buffer import audit_request_scope
+
 logger = logging.getLogger("audit")
 
 
 class AuditLogMiddleware:
     """
     Lightweight middleware that logs basic request metadata for audit purposes.
+
+    Записи AuditLog, созданные за время запроса, пишутся одним пакетом в конце запроса.
     """
 
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
@@ -19,7 +23,8 @@ class AuditLogMiddleware:
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
         start = time.monotonic()
-        response = self.get_response(request)
+        with audit_request_scope():
+            response = self.get_response(request)
         duration_ms = (time.monotonic() - start) * 1000
         user = getattr(request, "user", None)
         logger.info(
@@ -1,11 +1,22 @@
 """
 Middleware для сбора Prometheus метрик HTTP запросов.
+
+Метка endpoint - имя маршрута (view_name) или его шаблон, а не путь запроса:
+идентификаторы заказов в URL не порождают новые временные ряды. Число
+различных endpoint ограничено HTTP_METRICS["max_endpoints"]; всё сверх
+лимита попадает в OVERFLOW_ENDPOINT. Запросы, не сопоставленные ни с
+одним маршрутом (404 и т.п.), считаются под UNMATCHED_ENDPOINT.
+
+Это единственный источник HTTP-метрик: middleware django_prometheus не
+подключены, иначе каждый запрос учитывался бы дважды.
 """
 from __future__ import annotations
 
+import threading
 import time
 from typing import Callable
 
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
 from ringo_backend.prometheus import (
     http_requests_total,
@@ -13,6 +24,57 @@ from ringo_backend.prometheus import (
     errors_total,
 )
 
+UNMATCHED_ENDPOINT = "<unmatched>"
+OVERFLOW_ENDPOINT = "<other>"
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+def _config() -> dict:
+    return getattr(settings, "HTTP_METRICS", {})
+
+
+def route_label(request: HttpRequest) -> str:
+    """Имя или шаблон маршрута запроса ("orders-detail", "api/v1/health/")."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNMATCHED_ENDPOINT
+    return match.view_name or match.route or UNMATCHED_ENDPOINT
+
+
+class _EndpointRegistry:
+    """Ограничивает число различных значений метки endpoint."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seen: set[str] = set()
+
+    def label(self, endpoint: str, limit: int) -> str:
+        if endpoint in self._seen:
+            return endpoint
+        with self._lock:
+            if endpoint in self._seen:
+                return endpoint
+            if len(self._seen) >= limit:
+                return OVERFLOW_ENDPOINT
+            self._seen.add(endpoint)
+            return endpoint
+
+    def clear(self) -> None:
+        with self._lock:
+            self._seen.clear()
+
+
+endpoints = _EndpointRegistry()
+
+
+def metric_endpoint(request: HttpRequest) -> str | None:
+    """Метка endpoint для метрик запроса; None - запрос не учитывается (exclude_endpoints)."""
+    config = _config()
+    endpoint = route_label(request)
+    if endpoint in config.get("exclude_endpoints", ()):
+        return None
+    return endpoints.label(endpoint, int(config.get("max_endpoints", 200)))
+
 
 class PrometheusMetricsMiddleware:
     """
@@ -23,41 +85,40 @@ class PrometheusMetricsMiddleware:
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        start_time = time.time()
-        
+        start_time = time.perf_counter()
+
         # Получаем response
         response = self.get_response(request)
-        
+
         # Вычисляем длительность запроса
-        duration = time.time() - start_time
-        
-        # Извлекаем endpoint (без query параметров)
-        endpoint = request.path
-        if len(endpoint) > 100:  # Ограничиваем длину для метрик
-            endpoint = endpoint[:100]
-        
+        duration = time.perf_counter() - start_time
+
+        # Маршрут известен только после resolve (внутри get_response)
+        endpoint = metric_endpoint(request)
+        if endpoint is None:
+            return response
+
         # Метки для метрик
-        method = request.method
+        method = request.method if request.method in KNOWN_METHODS else "OTHER"
         status_code = str(response.status_code)
-        
+
         # Записываем метрики
         http_requests_total.labels(
             method=method,
             endpoint=endpoint,
             status_code=status_code,
         ).inc()
-        
+
         http_request_duration_seconds.labels(
             method=method,
             endpoint=endpoint,
         ).observe(duration)
-        
+
         # Записываем ошибки
         if response.status_code >= 400:
             errors_total.labels(
                 error_type=f"http_{response.status_code}",
                 endpoint=endpoint,
             ).inc()
-        
-        return response
 
+        return response
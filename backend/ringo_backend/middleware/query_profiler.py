@@ -0,0 +1,124 @@
+"""
+Профилирование SQL-запросов HTTP-запроса.
+
+На время запроса на все соединения ставится connection.execute_wrapper:
+каждый запрос замеряется (db_query_duration_seconds по типу операции), а его
+"форма" (SQL без значений, IN-списки свёрнуты) считается. Если одна форма
+повторилась не меньше SQL_PROFILER["n_plus_one_threshold"] раз - это
+признак N+1: пишется предупреждение в лог и db_n_plus_one_total.
+
+Число запросов на запрос экспортируется гистограммой db_queries_per_request
+с той же ограниченной меткой endpoint, что и HTTP-метрики. При
+SQL_PROFILER["headers"] ответ получает X-DB-Queries и Server-Timing.
+Запросы, выполненные при отдаче streaming-ответа, не учитываются.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Callable
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from ringo_backend.middleware.metrics import metric_endpoint
+from ringo_backend.prometheus import db_n_plus_one_total, db_queries_per_request, db_query_duration_seconds
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_OPERATIONS = frozenset({"select", "insert", "update", "delete"})
+
+
+def _config() -> dict:
+    return getattr(settings, "SQL_PROFILER", {})
+
+
+def query_shape(sql: str) -> str:
+    """SQL без конкретных значений: запросы, отличающиеся только параметрами, совпадают."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _PLACEHOLDER_LIST.sub("(%s...)", shape)
+
+
+def query_operation(sql: str) -> str:
+    operation = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ""
+    return operation if operation in _OPERATIONS else "other"
+
+
+class QueryStats:
+    """Запросы одного HTTP-запроса; вызывается как execute_wrapper."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            self.shapes[query_shape(sql)] += 1
+            db_query_duration_seconds.labels(operation=query_operation(sql)).observe(duration)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Формы запросов, выполненные не меньше threshold раз (самые частые первыми)."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class QueryProfilerMiddleware:
+    """
+    Считает и замеряет SQL-запросы каждого HTTP-запроса, ищет N+1.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        config = _config()
+        if not config.get("enabled", True):
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        endpoint = metric_endpoint(request)
+        if endpoint is None:
+            return response
+        db_queries_per_request.labels(endpoint=endpoint).observe(stats.count)
+
+        repeated = stats.repeated(int(config.get("n_plus_one_threshold", 10)))
+        if repeated:
+            shape, count = repeated[0]
+            db_n_plus_one_total.labels(endpoint=endpoint).inc()
+            logger.warning(
+                "Possible N+1: %s executed %s similar queries (%s total) on %s %s: %s",
+                endpoint,
+                count,
+                stats.count,
+                request.method,
+                request.path,
+                shape[:500],
+            )
+
+        if config.get("headers", False):
+            response["X-DB-Queries"] = str(stats.count)
+            timing = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+            existing = response.get("Server-Timing")
+            response["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+            if repeated:
+                response["X-DB-Repeated-Queries"] = str(repeated[0][1])
+        return response
@@ -5,10 +5,15 @@ from typing import Callable
 
 from django.http import HttpRequest, HttpResponse
 
+from ringo_backend import request_context
+
 
 class RequestIDMiddleware:
     """
     Ensures every request/response has an X-Request-ID header for correlation.
+
+    На время запроса устанавливает request_context: его читают сигналы аудита,
+    публикация задач Celery и фильтр логирования.
     """
 
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
@@ -17,7 +22,8 @@ class RequestIDMiddleware:
     def __call__(self, request: HttpRequest) -> HttpResponse:
         request_id = request.headers.get("X-Request-ID", uuid.uuid4().hex)
         request.request_id = request_id
-        response = self.get_response(request)
+        with request_context.bind(request_context.context_from_request(request, request_id)):
+            response = self.get_response(request)
         response["X-Request-ID"] = request_id
         return response
 
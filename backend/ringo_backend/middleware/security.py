@@ -5,12 +5,16 @@ from __future__ import annotations
 
 import re
 import logging
+import socket
+import urllib.parse
 from typing import Callable
 from ipaddress import ip_address, ip_network
 
 from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
 from django.conf import settings
 
+from ringo_backend.prometheus import security_scanner_matches_total
+
 logger = logging.getLogger("security")
 
 
@@ -105,106 +109,85 @@ class IPAllowlistMiddleware:
         return self.get_response(request)
 
 
-class SQLInjectionProtectionMiddleware:
-    """
-    Middleware для базовой защиты от SQL injection атак.
+# Правила сканера параметров: (имя, действие, шаблон). "block" - ответ 403,
+# "log" - только предупреждение в лог.
+SCAN_RULES: list[tuple[str, str, str]] = [
+    # XSS
+    ("xss_script", "block", r"<script[^>]*>.*?</script>"),
+    ("xss_javascript_url", "block", r"javascript:"),
+    ("xss_event_handler", "block", r"on\w+\s*="),  # onclick=, onerror=, etc.
+    ("xss_iframe", "block", r"<iframe[^>]*>"),
+    ("xss_object", "block", r"<object[^>]*>"),
+    ("xss_embed", "block", r"<embed[^>]*>"),
+    # SQL injection
+    ("sql_union_select", "log", r"\bUNION\b.*\bSELECT\b"),
+    ("sql_select_from", "log", r"\bSELECT\b.*\bFROM\b"),
+    ("sql_insert_into", "log", r"\bINSERT\b.*\bINTO\b"),
+    ("sql_delete_from", "log", r"\bDELETE\b.*\bFROM\b"),
+    ("sql_drop_table", "log", r"\bDROP\b.*\bTABLE\b"),
+    ("sql_update_set", "log", r"\bUPDATE\b.*\bSET\b"),
+    ("sql_exec", "log", r"\bEXEC\b|\bEXECUTE\b"),
+    ("sql_comment", "log", r"\b--\s|\b#\s"),  # SQL комментарии
+    ("sql_or_tautology", "log", r"\bOR\b\s+\d+\s*=\s*\d+"),
+    ("sql_and_tautology", "log", r"\bAND\b\s+\d+\s*=\s*\d+"),
+    ("sql_suspicious_char", "log", r"'|\"|;|\\"),  # Подозрительные символы
+]
+
+# Признаки, без которых не срабатывает ни одно правило: "<" (теги), "=" (обработчики
+# событий и тавтологии), "--"/"#" (комментарии), кавычки, ";", "\\", javascript:
+# и ключевые слова SQL. При изменении SCAN_RULES список нужно держать надмножеством.
+SCAN_TRIGGERS = (
+    r"""[<=#'";\\]|--|javascript:"""
+    r"|\b(?:UNION|SELECT|INSERT|DELETE|DROP|UPDATE|EXEC|EXECUTE)\b"
+)
+
+# Параметры, которые могут содержать URL (проверка SSRF)
+URL_PARAMS = ("url", "link", "redirect", "callback", "webhook")
+
+FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+
+
+class RequestScanner:
     """
+    Проверяет значения параметров по SCAN_RULES.
 
-    # Паттерны для обнаружения SQL injection попыток
-    SQL_INJECTION_PATTERNS = [
-        r"(\bUNION\b.*\bSELECT\b)",
-        r"(\bSELECT\b.*\bFROM\b)",
-        r"(\bINSERT\b.*\bINTO\b)",
-        r"(\bDELETE\b.*\bFROM\b)",
-        r"(\bDROP\b.*\bTABLE\b)",
-        r"(\bUPDATE\b.*\bSET\b)",
-        r"(\bEXEC\b|\bEXECUTE\b)",
-        r"(\b--\s|\b#\s)",  # SQL комментарии
-        r"(\bOR\b\s+\d+\s*=\s*\d+)",
-        r"(\bAND\b\s+\d+\s*=\s*\d+)",
-        r"('|\"|;|\\)",  # Подозрительные символы
-    ]
-
-    def __init__(self, get_response: Callable):
-        self.get_response = get_response
-        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.SQL_INJECTION_PATTERNS]
-
-    def __call__(self, request: HttpRequest) -> HttpResponse:
-        # Проверяем query параметры и body
-        suspicious_strings = []
-
-        # Проверяем GET параметры
-        for key, value in request.GET.items():
-            if isinstance(value, str):
-                for pattern in self.patterns:
-                    if pattern.search(value):
-                        suspicious_strings.append(f"GET[{key}]={value[:50]}")
-
-        # Проверяем POST данные
-        if request.method == "POST":
-            for key, value in request.POST.items():
-                if isinstance(value, str):
-                    for pattern in self.patterns:
-                        if pattern.search(value):
-                            suspicious_strings.append(f"POST[{key}]={value[:50]}")
-
-        if suspicious_strings:
-            logger.warning(
-                "Potential SQL injection attempt detected",
-                extra={
-                    "ip": request.META.get("REMOTE_ADDR", ""),
-                    "path": request.path,
-                    "suspicious": suspicious_strings,
-                    "user_agent": request.META.get("HTTP_USER_AGENT", ""),
-                },
-            )
-            # В production можно вернуть 403, но для начала логируем
-            # return HttpResponseForbidden("Invalid request")
-
-        return self.get_response(request)
-
-
-class XSSProtectionMiddleware:
-    """
-    Middleware для базовой защиты от XSS атак.
+    Значение проходит один поиск по SCAN_TRIGGERS - общей альтернации
+    признаков всех правил; подавляющее большинство значений на этом
+    заканчивается. Правила по отдельности проверяются только для значений
+    с признаком. Единая альтернация самих правил в re медленнее отдельных
+    поисков: она теряет оптимизацию по литеральному префиксу.
     """
 
-    XSS_PATTERNS = [
-        r"<script[^>]*>.*?</script>",
-        r"javascript:",
-        r"on\w+\s*=",  # onclick=, onerror=, etc.
-        r"<iframe[^>]*>",
-        r"<object[^>]*>",
-        r"<embed[^>]*>",
-    ]
-
-    def __init__(self, get_response: Callable):
-        self.get_response = get_response
-        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.XSS_PATTERNS]
-
-    def __call__(self, request: HttpRequest) -> HttpResponse:
-        # Проверяем query параметры
-        for key, value in request.GET.items():
-            if isinstance(value, str):
-                for pattern in self.patterns:
-                    if pattern.search(value):
-                        logger.warning(
-                            "Potential XSS attempt detected",
-                            extra={
-                                "ip": request.META.get("REMOTE_ADDR", ""),
-                                "path": request.path,
-                                "parameter": key,
-                                "value": value[:100],
-                            },
-                        )
-                        return HttpResponseForbidden("Invalid request")
-
-        return self.get_response(request)
-
-
-class SSRFProtectionMiddleware:
+    def __init__(self, rules: list[tuple[str, str, str]] = SCAN_RULES, max_length: int = 4096):
+        self.triggers = re.compile(SCAN_TRIGGERS, re.IGNORECASE)
+        # Блокирующие правила проверяются первыми
+        ordered = sorted(rules, key=lambda rule: rule[1] != "block")
+        self.rules = [(name, action, re.compile(pattern, re.IGNORECASE)) for name, action, pattern in ordered]
+        self.max_length = max_length
+
+    def scan(self, value: str) -> tuple[str | None, list[str]]:
+        """Возвращает (блокирующее правило или None, сработавшие правила для лога)."""
+        value = value[: self.max_length]
+        if not self.triggers.search(value):
+            return None, []
+        logged: list[str] = []
+        for name, action, pattern in self.rules:
+            if pattern.search(value):
+                if action == "block":
+                    return name, logged
+                logged.append(name)
+        return None, logged
+
+
+class RequestScannerMiddleware:
     """
-    Middleware для защиты от SSRF (Server-Side Request Forgery) атак.
+    Middleware для базовой защиты от XSS, SQL injection и SSRF.
+
+    Параметры GET и POST (только формы urlencoded: тело JSON и multipart не
+    разбирается) проверяются RequestScanner, значения длиннее
+    REQUEST_SCANNER["max_value_length"] проверяются по началу. Пути из
+    REQUEST_SCANNER["trusted_prefixes"] (JSON API, данные валидирует DRF)
+    по шаблонам не проверяются; SSRF-параметры проверяются везде.
     """
 
     # Запрещенные IP адреса (внутренние сети)
@@ -220,6 +203,9 @@ class SSRFProtectionMiddleware:
 
     def __init__(self, get_response: Callable):
         self.get_response = get_response
+        config = getattr(settings, "REQUEST_SCANNER", {})
+        self.scanner = RequestScanner(max_length=int(config.get("max_value_length", 4096)))
+        self.trusted_prefixes = tuple(config.get("trusted_prefixes", ()))
 
     def _is_forbidden_ip(self, ip_str: str) -> bool:
         """Проверяет, является ли IP адрес запрещенным (внутренним)."""
@@ -232,41 +218,85 @@ class SSRFProtectionMiddleware:
             return False
         return False
 
+    def _resolves_to_internal(self, value: str) -> str | None:
+        """IP внутренней сети, в который разрешается hostname из URL, или None."""
+        try:
+            hostname = urllib.parse.urlparse(value).hostname
+            if hostname:
+                ip = socket.gethostbyname(hostname)
+                if self._is_forbidden_ip(ip):
+                    return ip
+        except (socket.gaierror, ValueError, UnicodeError):
+            pass
+        return None
+
+    def _params(self, request: HttpRequest):
+        yield "GET", request.GET
+        # request.POST читаем только для форм: JSON и multipart разбирает DRF
+        if request.method == "POST" and request.content_type == FORM_CONTENT_TYPE:
+            yield "POST", request.POST
+
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        # Проверяем параметры, которые могут содержать URL
-        url_params = ["url", "link", "redirect", "callback", "webhook"]
-
-        for param in url_params:
-            value = request.GET.get(param) or request.POST.get(param)
-            if value:
-                # Извлекаем hostname из URL
-                import urllib.parse
-
-                try:
-                    parsed = urllib.parse.urlparse(value)
-                    hostname = parsed.hostname
-                    if hostname:
-                        # Проверяем IP адрес
-                        import socket
-
-                        try:
-                            ip = socket.gethostbyname(hostname)
-                            if self._is_forbidden_ip(ip):
-                                logger.warning(
-                                    "Potential SSRF attempt detected",
-                                    extra={
-                                        "ip": request.META.get("REMOTE_ADDR", ""),
-                                        "path": request.path,
-                                        "parameter": param,
-                                        "url": value[:100],
-                                        "resolved_ip": ip,
-                                    },
-                                )
-                                return HttpResponseForbidden("Invalid request")
-                        except socket.gaierror:
-                            pass
-                except Exception:
-                    pass
+        scan_values = not (self.trusted_prefixes and request.path.startswith(self.trusted_prefixes))
+        suspicious: dict[str, list[str]] = {}
+
+        for source, params in self._params(request):
+            for key, value in params.items():
+                if not isinstance(value, str) or not value:
+                    continue
+                if key in URL_PARAMS:
+                    resolved_ip = self._resolves_to_internal(value)
+                    if resolved_ip:
+                        logger.warning(
+                            "Potential SSRF attempt detected",
+                            extra={
+                                "ip": request.META.get("REMOTE_ADDR", ""),
+                                "path": request.path,
+                                "parameter": key,
+                                "url": value[:100],
+                                "resolved_ip": resolved_ip,
+                                "rule": "ssrf_internal_host",
+                            },
+                        )
+                        security_scanner_matches_total.labels(rule="ssrf_internal_host", action="block").inc()
+                        return HttpResponseForbidden("Invalid request")
+                if not scan_values:
+                    continue
+
+                blocked, logged = self.scanner.scan(value)
+                if blocked and source == "POST":
+                    # Как и раньше, XSS блокируется только в query-параметрах; в формах - в лог
+                    logged, blocked = [blocked, *logged], None
+                if blocked:
+                    logger.warning(
+                        "Potential XSS attempt detected",
+                        extra={
+                            "ip": request.META.get("REMOTE_ADDR", ""),
+                            "path": request.path,
+                            "parameter": key,
+                            "value": value[:100],
+                            "rule": blocked,
+                        },
+                    )
+                    security_scanner_matches_total.labels(rule=blocked, action="block").inc()
+                    return HttpResponseForbidden("Invalid request")
+                if logged:
+                    suspicious[f"{source}[{key}]={value[:50]}"] = logged
+
+        if suspicious:
+            rules = sorted({rule for matched in suspicious.values() for rule in matched})
+            for rule in rules:
+                security_scanner_matches_total.labels(rule=rule, action="log").inc()
+            logger.warning(
+                "Potential SQL injection attempt detected",
+                extra={
+                    "ip": request.META.get("REMOTE_ADDR", ""),
+                    "path": request.path,
+                    "suspicious": list(suspicious),
+                    "rules": rules,
+                    "user_agent": request.META.get("HTTP_USER_AGENT", ""),
+                },
+            )
+            # В production можно вернуть 403, но для начала логируем
 
         return self.get_response(request)
-
@@ -1,12 +1,36 @@
 """
 Prometheus metrics для мониторинга приложения.
+
+Под gunicorn и в Celery prefork метрики пишутся каждым процессом. Если задан
+PROMETHEUS_MULTIPROC_DIR, prometheus_client хранит значения в mmap-файлах
+этого каталога, а /metrics суммирует их по всем процессам сервиса
+(MultiProcessCollector). Каталог очищается при старте мастер-процесса
+(gunicorn.conf.py, celeryd_init) и должен быть своим у каждого сервиса.
+
+celery_queue_length и db_connections_active - не счётчики процессов, а
+снимок состояния: их считают коллекторы при каждом scrape (длины списков
+Redis для очередей Celery и число соединений в pg_stat_activity).
 """
 from __future__ import annotations
 
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
+import logging
+import os
+from pathlib import Path
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from django.conf import settings
+from django.db import connection
 from django.http import HttpResponse
 from django.views.decorators.http import require_http_methods
 
+logger = logging.getLogger(__name__)
+
+# Разделитель и шаги приоритетов транспорта Redis в kombu: задачи с
+# приоритетом лежат в отдельных списках "<queue>\x06\x16<step>"
+KOMBU_PRIORITY_SEPARATOR = "\x06\x16"
+KOMBU_PRIORITY_STEPS = (0, 3, 6, 9)
+
 
 # Метрики для HTTP запросов
 http_requests_total = Counter(
@@ -36,18 +60,7 @@ celery_task_duration_seconds = Histogram(
     buckets=[1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0],
 )
 
-celery_queue_length = Gauge(
-    "celery_queue_length",
-    "Number of tasks in Celery queue",
-    ["queue_name"],
-)
-
 # Метрики для базы данных
-db_connections_active = Gauge(
-    "db_connections_active",
-    "Number of active database connections",
-)
-
 db_query_duration_seconds = Histogram(
     "db_query_duration_seconds",
     "Database query duration in seconds",
@@ -55,6 +68,19 @@ db_query_duration_seconds = Histogram(
     buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0],
 )
 
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "Number of SQL queries per HTTP request",
+    ["endpoint"],
+    buckets=[0, 1, 2, 5, 10, 20, 50, 100, 200, 500],
+)
+
+db_n_plus_one_total = Counter(
+    "db_n_plus_one_total",
+    "HTTP requests that repeated one query shape at least SQL_PROFILER n_plus_one_threshold times",
+    ["endpoint"],
+)
+
 # Метрики для бизнес-логики
 orders_created_total = Counter(
     "orders_created_total",
@@ -73,6 +99,27 @@ invoices_generated_total = Counter(
     "Total number of invoices generated",
 )
 
+# Метрики для кэша отчётов
+report_cache_requests_total = Counter(
+    "report_cache_requests_total",
+    "Report cache lookups by result (hit, stale, miss)",
+    ["report", "result"],
+)
+
+report_regeneration_duration_seconds = Histogram(
+    "report_regeneration_duration_seconds",
+    "Report generation duration in seconds",
+    ["report", "mode"],
+    buckets=[0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0],
+)
+
+# Срабатывания правил сканера параметров запроса (middleware.security)
+security_scanner_matches_total = Counter(
+    "security_scanner_matches_total",
+    "Request parameters matched by security scanner rules",
+    ["rule", "action"],
+)
+
 # Метрики для ошибок
 errors_total = Counter(
     "errors_total",
@@ -81,6 +128,115 @@ errors_total = Counter(
 )
 
 
+# --- мультипроцессный режим -----------------------------------------------------
+
+
+def multiprocess_dir() -> str | None:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def prepare_multiprocess_dir() -> None:
+    """Удаляет файлы прошлых запусков (вызывается в мастер-процессе до форка)."""
+    path = multiprocess_dir()
+    if not path:
+        return
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.db"):
+        stale.unlink(missing_ok=True)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Убирает live-gauge завершившегося процесса; его счётчики остаются в сумме."""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
+
+
+def process_registry() -> CollectorRegistry:
+    """Реестр с метриками всех процессов сервиса (или текущего, без multiprocess)."""
+    if not multiprocess_dir():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+# --- коллекторы состояния ----------------------------------------------------------
+
+
+def celery_queues() -> list[str]:
+    """Очереди из CELERY_TASK_ROUTES и очередь по умолчанию."""
+    queues = {getattr(settings, "CELERY_TASK_DEFAULT_QUEUE", "celery")}
+    for route in getattr(settings, "CELERY_TASK_ROUTES", {}).values():
+        if isinstance(route, dict) and route.get("queue"):
+            queues.add(route["queue"])
+    return sorted(queues)
+
+
+class CeleryQueueCollector:
+    """Длина очередей Celery в брокере Redis (с учётом списков приоритетов)."""
+
+    def __init__(self, broker_url: str | None = None):
+        self.broker_url = broker_url
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+
+            url = self.broker_url or getattr(settings, "CELERY_BROKER_URL", "")
+            self._client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        return self._client
+
+    def collect(self):
+        url = self.broker_url or getattr(settings, "CELERY_BROKER_URL", "")
+        if not url.startswith(("redis://", "rediss://", "unix://")):
+            return
+        family = GaugeMetricFamily("celery_queue_length", "Number of tasks in Celery queue", labels=["queue_name"])
+        queues = celery_queues()
+        try:
+            pipeline = self._redis().pipeline(transaction=False)
+            for queue in queues:
+                for step in KOMBU_PRIORITY_STEPS:
+                    pipeline.llen(queue if step == 0 else f"{queue}{KOMBU_PRIORITY_SEPARATOR}{step}")
+            lengths = pipeline.execute()
+        except Exception as exc:
+            logger.warning("Failed to read Celery queue lengths: %s", exc)
+            return
+        steps = len(KOMBU_PRIORITY_STEPS)
+        for index, queue in enumerate(queues):
+            family.add_metric([queue], sum(lengths[index * steps:(index + 1) * steps]))
+        yield family
+
+
+class DatabaseConnectionsCollector:
+    """Число соединений с базой приложения по данным PostgreSQL (все процессы и хосты)."""
+
+    def collect(self):
+        if connection.vendor != "postgresql":
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT state, count(*) FROM pg_stat_activity WHERE datname = current_database() GROUP BY state"
+                )
+                rows = cursor.fetchall()
+        except Exception as exc:
+            logger.warning("Failed to read database connections: %s", exc)
+            return
+        family = GaugeMetricFamily(
+            "db_connections_active", "Number of database connections by state", labels=["state"]
+        )
+        for state, count in rows:
+            family.add_metric([state or "unknown"], count)
+        yield family
+
+
+state_registry = CollectorRegistry(auto_describe=False)
+state_registry.register(CeleryQueueCollector())
+state_registry.register(DatabaseConnectionsCollector())
+
+
 @require_http_methods(["GET"])
 def metrics_view(request):
     """
@@ -88,7 +244,6 @@ def metrics_view(request):
     Доступ: /metrics
     """
     return HttpResponse(
-        generate_latest(),
+        generate_latest(process_registry()) + generate_latest(state_registry),
         content_type="text/plain; version=0.0.4; charset=utf-8",
     )
-
@@ -0,0 +1,124 @@
+"""
+Контекст текущего запроса (contextvars).
+
+Устанавливается RequestIDMiddleware и читается сигналами аудита, Celery
+(заголовки задач) и фильтром логирования. Работает одинаково в WSGI, ASGI
+и внутри задач Celery.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from django.http import HttpRequest
+
+# Имена заголовков сообщений Celery с контекстом запроса
+REQUEST_ID_HEADER = "x_request_id"
+ACTOR_ID_HEADER = "x_actor_id"
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    request_id: str | None = None
+    ip_address: str | None = None
+    user_agent: str | None = None
+    # Пользователь аутентифицируется DRF уже внутри view, поэтому читаем его из запроса лениво
+    request: HttpRequest | None = None
+    actor_id: int | None = None
+
+    @property
+    def user(self) -> Any | None:
+        user = getattr(self.request, "user", None)
+        if user is not None and getattr(user, "is_authenticated", False):
+            return user
+        return None
+
+    def get_actor_id(self) -> int | None:
+        user = self.user
+        return user.pk if user is not None else self.actor_id
+
+    def get_role(self) -> str | None:
+        return getattr(self.user, "role", None)
+
+
+EMPTY_CONTEXT = RequestContext()
+
+_current: contextvars.ContextVar[RequestContext] = contextvars.ContextVar("request_context", default=EMPTY_CONTEXT)
+
+
+def get_context() -> RequestContext:
+    return _current.get()
+
+
+def get_client_ip(request: HttpRequest) -> str | None:
+    """IP клиента с учётом X-Forwarded-For."""
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if x_forwarded_for:
+        return x_forwarded_for.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+def context_from_request(request: HttpRequest, request_id: str) -> RequestContext:
+    return RequestContext(
+        request_id=request_id,
+        ip_address=get_client_ip(request),
+        user_agent=request.META.get("HTTP_USER_AGENT", ""),
+        request=request,
+    )
+
+
+@contextmanager
+def bind(context: RequestContext) -> Iterator[RequestContext]:
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def activate(context: RequestContext) -> contextvars.Token:
+    """Устанавливает контекст без контекстного менеджера (для пар сигналов Celery)."""
+    return _current.set(context)
+
+
+def deactivate(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def task_headers() -> dict[str, Any]:
+    """Заголовки для публикуемой задачи Celery."""
+    context = get_context()
+    headers = {}
+    if context.request_id:
+        headers[REQUEST_ID_HEADER] = context.request_id
+    actor_id = context.get_actor_id()
+    if actor_id is not None:
+        headers[ACTOR_ID_HEADER] = actor_id
+    return headers
+
+
+def context_from_task(task_request: Any) -> RequestContext:
+    return RequestContext(
+        request_id=getattr(task_request, REQUEST_ID_HEADER, None),
+        actor_id=getattr(task_request, ACTOR_ID_HEADER, None),
+    )
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет в записи лога request_id, user_id, role и ip, если их не передали через extra."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = get_context()
+        defaults = {
+            "request_id": context.request_id,
+            "user_id": context.get_actor_id(),
+            "role": context.get_role(),
+            "ip": context.ip_address,
+        }
+        for name, value in defaults.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, value if value is not None else "-")
+        return True
@@ -46,16 +46,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "django_prometheus.middleware.PrometheusBeforeMiddleware",  # Prometheus metrics
-    "ringo_backend.middleware.metrics.PrometheusMetricsMiddleware",  # Custom Prometheus metrics
+    "ringo_backend.middleware.metrics.PrometheusMetricsMiddleware",  # Prometheus HTTP metrics (единственный источник)
+    "ringo_backend.middleware.query_profiler.QueryProfilerMiddleware",  # SQL-запросы на запрос, поиск N+1
     "ringo_backend.middleware.security.IPAllowlistMiddleware",  # IP allowlist для admin
-    "ringo_backend.middleware.security.SQLInjectionProtectionMiddleware",  # SQL injection protection
-    "ringo_backend.middleware.security.XSSProtectionMiddleware",  # XSS protection
-    "ringo_backend.middleware.security.SSRFProtectionMiddleware",  # SSRF protection
+    "ringo_backend.middleware.security.RequestScannerMiddleware",  # XSS / SQL injection / SSRF protection
     "django.middleware.security.SecurityMiddleware",
     "django.middleware.gzip.GZipMiddleware",  # Сжатие ответов для ускорения загрузки
     "corsheaders.middleware.CorsMiddleware",
-    "django_prometheus.middleware.PrometheusAfterMiddleware",  # Prometheus metrics
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -345,9 +342,13 @@ CELERY_WORKER_AUTOSCALER_MAX = int(__import__("os").environ.get("CELERY_WORKER_A
 
 # Celery Task Routing
 CELERY_TASK_ROUTES = {
+    # Пакетный рендеринг PDF запускает пул процессов: его обслуживает воркер --pool=solo (celery-pdf),
+    # дочерние процессы prefork-воркера демонические и своих процессов создавать не могут
+    "finance.tasks.generate_invoice_pdfs": {"queue": "pdf"},
     "finance.tasks.*": {"queue": "finance"},
     "notifications.tasks.*": {"queue": "notifications"},
     "orders.tasks.*": {"queue": "orders"},
+    "audit.tasks.*": {"queue": "audit"},
 }
 
 # Celery Task Priorities
@@ -411,6 +412,9 @@ LOG_RETENTION_DAYS = int(__import__("os").environ.get("LOG_RETENTION_DAYS", "90"
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "request_context": {"()": "ringo_backend.request_context.RequestContextFilter"},
+    },
     "formatters": {
         "console": {
             "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -430,10 +434,12 @@ LOGGING = {
         "audit": {
             "class": "logging.StreamHandler",
             "formatter": "audit",
+            "filters": ["request_context"],
         },
         "security": {
             "class": "logging.StreamHandler",
             "formatter": "secure",
+            "filters": ["request_context"],
         },
     },
     "root": {
@@ -454,6 +460,44 @@ LOGGING = {
     },
 }
 
+# Prometheus: порт, на котором Celery worker отдаёт метрики своих процессов
+# (0 - не отдавать). Мультипроцессный режим включается переменной окружения
+# PROMETHEUS_MULTIPROC_DIR (см. ringo_backend.prometheus)
+PROMETHEUS = {
+    "celery_metrics_port": int(__import__("os").environ.get("CELERY_METRICS_PORT", 0)),
+}
+
+# Проверки готовности (ringo_backend.health): период фонового обновления,
+# таймаут одной проверки и как часто опрашивать воркеров Celery (секунды)
+HEALTH_CHECKS = {
+    "interval": float(__import__("os").environ.get("HEALTH_CHECK_INTERVAL", 5)),
+    "timeout": float(__import__("os").environ.get("HEALTH_CHECK_TIMEOUT", 2)),
+    "celery": True,
+    "celery_interval": 60,
+}
+
+# Сканер параметров запроса (ringo_backend.middleware.security): сколько символов
+# значения проверять и пути JSON API, которые проверяет DRF (там только SSRF)
+REQUEST_SCANNER = {
+    "max_value_length": 4096,
+    "trusted_prefixes": ("/api/v1/",),
+}
+
+# HTTP-метрики Prometheus: метка endpoint - имя маршрута, не больше max_endpoints
+# различных значений (остальное - "<other>"); exclude_endpoints не учитываются
+HTTP_METRICS = {
+    "max_endpoints": int(__import__("os").environ.get("HTTP_METRICS_MAX_ENDPOINTS", 200)),
+    "exclude_endpoints": ("prometheus_metrics",),
+}
+
+# Профилирование SQL (ringo_backend.middleware.query_profiler): метрики пишутся
+# всегда при enabled, заголовки X-DB-Queries/Server-Timing - только при headers
+SQL_PROFILER = {
+    "enabled": __import__("os").environ.get("SQL_PROFILER_ENABLED", "true").lower() == "true",
+    "headers": __import__("os").environ.get("SQL_PROFILER_HEADERS", "false").lower() == "true",
+    "n_plus_one_threshold": int(__import__("os").environ.get("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", 10)),
+}
+
 PRICING_ENGINE = {
     "equipment_daily_threshold_hours": int(
         __import__("os").environ.get("PRICING_EQUIP_THRESHOLD", 8)
@@ -463,6 +507,72 @@ PRICING_ENGINE = {
     ),
 }
 
+REPORTS_CACHE = {
+    # TTL отчётов, затрагивающих текущий месяц, и отчётов за прошедшие месяцы (секунды)
+    "current_timeout": int(__import__("os").environ.get("REPORTS_CACHE_CURRENT_TIMEOUT", 60)),
+    "historical_timeout": int(__import__("os").environ.get("REPORTS_CACHE_HISTORICAL_TIMEOUT", 6 * 60 * 60)),
+    # Последнее значение отчёта отдаётся, пока фоновая задача строит новое
+    "stale_timeout": int(__import__("os").environ.get("REPORTS_CACHE_STALE_TIMEOUT", 24 * 60 * 60)),
+    "lock_timeout": 120,
+    "lock_wait": 5,
+}
+
+# Push-события заказов (SSE /api/v1/notifications/stream/, только под ASGI)
+REALTIME = {
+    # redis — fan-out между воркерами через pub/sub, memory — в пределах процесса (тесты, разработка)
+    "backend": __import__("os").environ.get("REALTIME_BACKEND", "redis"),
+    "url": __import__("os").environ.get("REALTIME_REDIS_URL", ""),
+    "channel": "ringo:orders",
+    "keepalive_seconds": 15,
+    "retry_ms": 5000,
+}
+
+# Дельта-синхронизация заказов (orders/changes/)
+ORDER_SYNC = {
+    "page_size": 200,
+    # Записи моложе этого окна не отдаются, чтобы курсор не обогнал незакоммиченные транзакции
+    "lag_seconds": 2,
+}
+
+# Ставки справочника в памяти процесса для предпросмотра стоимости (секунды)
+CATALOG_RATES = {
+    "ttl": int(__import__("os").environ.get("CATALOG_RATES_TTL", 300)),
+}
+
+# Кэш справочника (catalog.cache): TTL в общем кэше, размер LRU процесса,
+# как часто процесс перечитывает версии справочника (секунды)
+CATALOG_CACHE = {
+    "timeout": 60 * 60,
+    "local_size": 2048,
+    "version_check_interval": 1.0,
+}
+
+# Номера заказов: ширина числовой части и отдельная серия на год ("2025-000001")
+ORDER_NUMBERS = {
+    "width": 6,
+    "per_year": __import__("os").environ.get("ORDER_NUMBERS_PER_YEAR", "false").lower() == "true",
+}
+
+AUDIT_CAPTURE = {
+    "exclude_apps": ["admin", "auth", "contenttypes", "sessions", "audit"],
+    "exclude_fields": ["created_at", "updated_at", "last_login"],
+    # Настройки по моделям: {"orders.Order": {"enabled": True, "fields": [...], "exclude": [...]}}
+    "models": {},
+}
+
+# Запись AuditLog: пакетами после коммита; в режиме async пакеты пишет Celery
+AUDIT_WRITER = {
+    "mode": __import__("os").environ.get("AUDIT_WRITER_MODE", "sync"),
+    "batch_size": 500,
+}
+
+INVOICE_RENDERING = {
+    # Процессов WeasyPrint для пакетного рендеринга (в prefork-воркере Celery рендер идёт в самом воркере)
+    "workers": int(__import__("os").environ.get("INVOICE_RENDER_WORKERS", 4)),
+    # Общие CSS-файлы, компилируются один раз на процесс
+    "stylesheets": [],
+}
+
 APP_CONFIG = {
     "company_name": __import__("os").environ.get("COMPANY_NAME", "Ringo Uchet"),
     "company_address": __import__("os").environ.get("COMPANY_ADDRESS", "Россия"),
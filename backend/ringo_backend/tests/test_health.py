@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import threading
+
+import json
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ringo_backend.health import Readiness, liveness_check
+
+
+@override_settings(HEALTH_CHECKS={"interval": 60, "timeout": 0.2, "celery": True, "celery_interval": 60})
+class ReadinessTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = {"database": 0, "redis": 0, "celery": 0}
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def _check(self, name, result=None, hang=False):
+        def check():
+            self.calls[name] += 1
+            if hang:
+                self.release.wait(5)
+            return result or {"status": "healthy"}
+
+        return check
+
+    def test_liveness_does_no_io(self):
+        response = liveness_check(RequestFactory().get("/api/live/"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["status"], "alive")
+
+    def test_hung_check_times_out(self):
+        readiness = Readiness(
+            {"database": self._check("database"), "redis": self._check("redis", hang=True), "celery": self._check("celery")}
+        )
+
+        snapshot = readiness.refresh()
+
+        self.assertEqual(snapshot["status"], "unhealthy")
+        self.assertIn("timeout", snapshot["checks"]["redis"]["error"])
+        self.assertEqual(snapshot["checks"]["database"]["status"], "healthy")
+
+    def test_celery_is_not_critical_and_polled_rarely(self):
+        readiness = Readiness(
+            {
+                "database": self._check("database"),
+                "redis": self._check("redis"),
+                "celery": self._check("celery", {"status": "unhealthy", "error": "down"}),
+            }
+        )
+
+        readiness.refresh()
+        snapshot = readiness.refresh()
+
+        self.assertEqual(snapshot["status"], "healthy")
+        self.assertEqual(snapshot["checks"]["celery"]["status"], "unhealthy")
+        self.assertEqual(self.calls, {"database": 2, "redis": 2, "celery": 1})
+
+    def test_hung_check_is_not_resubmitted(self):
+        readiness = Readiness(
+            {"database": self._check("database"), "redis": self._check("redis", hang=True), "celery": self._check("celery")}
+        )
+
+        readiness.refresh()
+        snapshot = readiness.refresh()
+
+        self.assertIn("timeout", snapshot["checks"]["redis"]["error"])
+        self.assertEqual(self.calls["redis"], 1)
+        self.assertEqual(self.calls["database"], 2)
+
+        self.release.set()
+        readiness._inflight["redis"].result(timeout=1)
+        snapshot = readiness.refresh()
+
+        self.assertEqual(snapshot["checks"]["redis"]["status"], "healthy")
+        self.assertEqual(self.calls["redis"], 2)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import uuid
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import Resolver404, resolve
+
+from ringo_backend.middleware import metrics
+from ringo_backend.prometheus import http_requests_total
+
+
+def _resolving_view(request):
+    try:
+        request.resolver_match = resolve(request.path_info)
+    except Resolver404:
+        return HttpResponse(status=404)
+    return HttpResponse()
+
+
+class RouteLabelTests(SimpleTestCase):
+    def setUp(self):
+        metrics.endpoints.clear()
+        self.addCleanup(metrics.endpoints.clear)
+        self.middleware = metrics.PrometheusMetricsMiddleware(_resolving_view)
+        self.factory = RequestFactory()
+
+    def _count(self, endpoint: str, status_code: str = "200") -> float:
+        return http_requests_total.labels(method="GET", endpoint=endpoint, status_code=status_code)._value.get()
+
+    def test_order_ids_share_one_series(self):
+        before = self._count("orders-detail")
+        for _ in range(3):
+            self.middleware(self.factory.get(f"/api/v1/orders/{uuid.uuid4()}/"))
+
+        self.assertEqual(self._count("orders-detail") - before, 3)
+
+    def test_unresolved_paths_are_grouped(self):
+        before = self._count(metrics.UNMATCHED_ENDPOINT, "404")
+        self.middleware(self.factory.get(f"/no-such-page/{uuid.uuid4()}"))
+
+        self.assertEqual(self._count(metrics.UNMATCHED_ENDPOINT, "404") - before, 1)
+
+    @override_settings(HTTP_METRICS={"max_endpoints": 1})
+    def test_endpoints_over_limit_go_to_overflow(self):
+        self.middleware(self.factory.get(f"/api/v1/orders/{uuid.uuid4()}/"))
+        before = self._count(metrics.OVERFLOW_ENDPOINT)
+        self.middleware(self.factory.get("/api/v1/orders/"))
+
+        self.assertEqual(self._count(metrics.OVERFLOW_ENDPOINT) - before, 1)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ringo_backend.prometheus import KOMBU_PRIORITY_SEPARATOR, CeleryQueueCollector, celery_queues
+
+
+class _FakePipeline:
+    def __init__(self, lengths: dict[str, int]):
+        self.lengths = lengths
+        self.keys: list[str] = []
+
+    def llen(self, key: str) -> None:
+        self.keys.append(key)
+
+    def execute(self) -> list[int]:
+        return [self.lengths.get(key, 0) for key in self.keys]
+
+
+@override_settings(
+    CELERY_TASK_DEFAULT_QUEUE="default",
+    CELERY_TASK_ROUTES={"finance.tasks.*": {"queue": "finance"}, "orders.tasks.*": {"queue": "orders"}},
+)
+class CeleryQueueCollectorTests(SimpleTestCase):
+    def test_queues_come_from_routes(self):
+        self.assertEqual(celery_queues(), ["default", "finance", "orders"])
+
+    def test_lengths_include_priority_lists(self):
+        pipeline = _FakePipeline({"finance": 2, f"finance{KOMBU_PRIORITY_SEPARATOR}6": 3, "orders": 1})
+        collector = CeleryQueueCollector("redis://localhost:6379/0")
+        client = mock.Mock()
+        client.pipeline.return_value = pipeline
+        collector._client = client
+
+        (family,) = list(collector.collect())
+
+        lengths = {sample.labels["queue_name"]: sample.value for sample in family.samples}
+        self.assertEqual(lengths, {"default": 0, "finance": 5, "orders": 1})
+
+    def test_broker_errors_skip_the_metric(self):
+        collector = CeleryQueueCollector("redis://localhost:6379/0")
+        collector._client = mock.Mock(**{"pipeline.side_effect": ConnectionError("down")})
+
+        self.assertEqual(list(collector.collect()), [])
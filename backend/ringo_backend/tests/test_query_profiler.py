@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ringo_backend.middleware.query_profiler import QueryProfilerMiddleware, query_shape
+from users.models import User
+
+
+def _list_view(request):
+    list(User.objects.all())
+    return HttpResponse()
+
+
+def _n_plus_one_view(request):
+    for user in User.objects.all():
+        User.objects.filter(pk=user.pk).exists()
+    return HttpResponse()
+
+
+@override_settings(SQL_PROFILER={"enabled": True, "headers": True, "n_plus_one_threshold": 3})
+class QueryProfilerTests(TestCase):
+    def setUp(self):
+        for index in range(4):
+            User.objects.create_user(username=f"user{index}", password="pass")
+        self.factory = RequestFactory()
+
+    def test_query_shape_ignores_values(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (%s...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id IN (%s)"), query_shape("SELECT * FROM t WHERE id IN (%s, %s)")
+        )
+
+    def test_headers_report_query_count(self):
+        response = QueryProfilerMiddleware(_list_view)(self.factory.get("/api/v1/users/"))
+
+        self.assertEqual(response["X-DB-Queries"], "1")
+        self.assertTrue(response["Server-Timing"].startswith("db;dur="))
+        self.assertNotIn("X-DB-Repeated-Queries", response)
+
+    def test_repeated_queries_are_reported(self):
+        with self.assertLogs("ringo_backend.middleware.query_profiler", "WARNING") as logs:
+            response = QueryProfilerMiddleware(_n_plus_one_view)(self.factory.get("/api/v1/users/"))
+
+        self.assertEqual(response["X-DB-Queries"], "5")
+        self.assertEqual(response["X-DB-Repeated-Queries"], "4")
+        self.assertIn("Possible N+1", logs.output[0])
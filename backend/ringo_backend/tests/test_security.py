@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from urllib.parse import urlencode
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ringo_backend.middleware.security import SCAN_RULES, RequestScanner, RequestScannerMiddleware
+
+SAMPLES = {
+    "xss_script": "<script>alert(1)</script>",
+    "xss_javascript_url": "javascript:alert(1)",
+    "xss_event_handler": "x onerror=alert(1)",
+    "xss_iframe": "<iframe src=x>",
+    "xss_object": "<object data=x>",
+    "xss_embed": "<embed src=x>",
+    "sql_union_select": "1 UNION ALL SELECT password",
+    "sql_select_from": "select name from users",
+    "sql_insert_into": "insert into users",
+    "sql_delete_from": "delete from users",
+    "sql_drop_table": "drop table users",
+    "sql_update_set": "update users set role",
+    "sql_exec": "exec xp_cmdshell",
+    "sql_comment": "admin-- ",
+    "sql_or_tautology": "x or 1=1",
+    "sql_and_tautology": "x and 2 = 2",
+    "sql_suspicious_char": "O'Brien",
+}
+
+
+def _ok(request):
+    return HttpResponse()
+
+
+class RequestScannerTests(SimpleTestCase):
+    def test_every_rule_passes_the_trigger_prefilter(self):
+        scanner = RequestScanner()
+        self.assertEqual(set(SAMPLES), {name for name, _, _ in SCAN_RULES})
+        for rule, value in SAMPLES.items():
+            blocked, logged = scanner.scan(value)
+            self.assertIn(rule, [blocked, *logged], value)
+
+    def test_plain_values_do_not_match(self):
+        scanner = RequestScanner()
+        for value in ("Иванов Пётр", "2025-01-01", "экскаватор, 3 дня", "select"):
+            self.assertEqual(scanner.scan(value), (None, []))
+
+    def test_values_are_capped(self):
+        self.assertEqual(RequestScanner(max_length=10).scan("x" * 20 + "<script>1</script>"), (None, []))
+
+
+@override_settings(REQUEST_SCANNER={"max_value_length": 4096, "trusted_prefixes": ("/api/v1/",)})
+class RequestScannerMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = RequestScannerMiddleware(_ok)
+
+    def test_xss_in_query_is_blocked_with_rule(self):
+        with self.assertLogs("security", "WARNING") as logs:
+            response = self.middleware(self.factory.get("/admin/", {"q": "<script>x</script>"}))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(logs.records[0].rule, "xss_script")
+
+    def test_sql_in_form_is_logged_not_blocked(self):
+        with self.assertLogs("security", "WARNING") as logs:
+            response = self.middleware(
+                self.factory.post(
+                    "/admin/login/", urlencode({"username": "x' or 1=1"}), content_type="application/x-www-form-urlencoded"
+                )
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(logs.records[0].rules, ["sql_or_tautology", "sql_suspicious_char"])
+
+    def test_trusted_api_paths_and_json_bodies_are_not_scanned(self):
+        with self.assertNoLogs("security", "WARNING"):
+            api_get = self.middleware(self.factory.get("/api/v1/orders/", {"search": "<script>x</script>"}))
+            json_post = self.middleware(
+                self.factory.post("/admin/", data={"q": "<script>x</script>"}, content_type="application/json")
+            )
+
+        self.assertEqual(api_get.status_code, 200)
+        self.assertEqual(json_post.status_code, 200)
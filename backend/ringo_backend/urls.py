@@ -4,7 +4,7 @@ from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
-from ringo_backend.health import health_check
+from ringo_backend.health import health_check, liveness_check, readiness_check
 from ringo_backend.prometheus import metrics_view
 
 # Импортируем admin.py для отключения токенов в админке
@@ -20,7 +20,9 @@ admin.site.index_title = "Панель управления"
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    # Health check endpoint для load balancer и мониторинга
+    # Health check endpoints: live - процесс отвечает, ready - зависимости доступны (для load balancer)
+    path("api/live/", liveness_check, name="liveness_check"),
+    path("api/ready/", readiness_check, name="readiness_check"),
     path("api/health/", health_check, name="health_check"),
     # Prometheus metrics endpoint
     path("metrics", metrics_view, name="prometheus_metrics"),
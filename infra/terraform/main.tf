@@ -161,7 +161,7 @@ resource "digitalocean_loadbalancer" "ringo_lb" {
   healthcheck {
     port     = 8000
     protocol = "http"
-    path     = "/api/health/"
+    path     = "/api/ready/"
   }
   
   droplet_ids = digitalocean_droplet.ringo_api[*].id